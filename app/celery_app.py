@@ -15,15 +15,15 @@ def make_celery():
     celery.conf.task_routes = {
         'app.tasks.scrape_all_urls': {'queue': 'scraping_queue'},
         'app.tasks.scrape_text_from_page_task': {'queue': 'scraping_queue'},
+        'scrape_hiring_cafe_location': {'queue': 'scraping_queue'},
+        'generate_document': {'queue': 'documents_queue'},
+        'cleanup_generated_documents': {'queue': 'documents_queue'},  # runs where the files are
         # Add other ScrapingBee-involved tasks as needed
     }
-    celery.conf.worker_pool_args = {
-        'scraping_queue': {'concurrency': 5}
-    }
+    # Concurrency for scraping_queue is set on its own worker (see startprod.sh / startcelerydev.sh).
+    # Provider quotas (Azure OpenAI RPM/TPM, ScrapingBee credits) are enforced cluster-wide by
+    # app/rate_limiter.py rather than by per-worker Celery rate_limit annotations.
     celery.conf.task_default_retry_delay = 60  # seconds
-    celery.conf.task_annotations = {
-        '*': {'rate_limit': '10/s'}  # Adjust as needed for non-scraping tasks
-    }
     celery.conf.beat_schedule = {
         # 'run-main-workflow-daily': {
         #     'task': 'app.tasks.main_workflow',
@@ -35,19 +35,37 @@ def make_celery():
         },
         'scrape_hiring_cafe':{
         'task': 'scrape_hiring_cafe',
-        'schedule': 1440.0, # Run every 4 hours
+        'schedule': 300.0, # Scheduler tick: scrapes only the locations that are due (app/scrape_scheduler.py)
         },
         'process-job-fits-every-hour': {
         'task': 'process_all_users_job_preferences',
         'schedule': 3600.0,  # Every hour
         },
-        'remove-duplicate-embeddings': {
-        'task': 'remove_duplicate_embeddings',
-        'schedule': 1800.0,  # Run every half hour
+        'cleanup-generated-documents-hourly': {
+        'task': 'cleanup_generated_documents',
+        'schedule': 3600.0,  # Every hour
+        },
+        'prune-scrape-archive-daily': {
+        'task': 'prune_scrape_archive',
+        'schedule': 86400.0,  # Every 24 hours
+        },
+        'cleanup-payload-store-hourly': {
+        'task': 'cleanup_payload_store',
+        'schedule': 3600.0,  # Every hour
+        },
+        'report-cache-stats-hourly': {
+        'task': 'report_cache_stats',
+        'schedule': 3600.0,  # Every hour
+        },
+        'rebuild-seen-jobs-daily': {
+        'task': 'rebuild_seen_jobs',
+        'schedule': 86400.0,  # Every 24 hours
         },
-        'remove_duplicate_jobs': {
-        'task': 'remove_duplicate_jobs',
-        'schedule': 1800.0,  # Run every half hour
+        # Duplicates are dropped at ingestion (seen-jobs filter and near-duplicate index), so the
+        # remove_duplicate_embeddings / remove_duplicate_jobs sweeps are no longer scheduled
+        'rebuild-near-duplicate-index-weekly': {
+        'task': 'rebuild_near_duplicate_index',
+        'schedule': 604800.0,  # Every 7 days
         }
     }
     celery.conf.timezone = 'UTC'
@@ -0,0 +1,156 @@
+# app/company_metadata.py
+
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from .extensions import config, logger, supabase, llm_client, llm_model_name
+from .llm_cache import cached_chat_completion, LocalLRUCache
+from .llm_extraction import run_extraction_batch
+
+# Company metadata lives in the Supabase `company_metadata` table
+# (supabase/migrations/20261019000100_company_metadata.sql), keyed by normalized_name.
+# Each process also keeps the rows it has seen most recently in memory.
+COMPANY_METADATA_TABLE = 'company_metadata'
+COMPANY_METADATA_MEMO_MAX_ENTRIES = config('COMPANY_METADATA_MEMO_MAX_ENTRIES', default=5000, cast=int)
+# Off: addresses are looked up when a cover letter first needs them, not for every company ingested
+COMPANY_METADATA_AT_INGESTION = config('COMPANY_METADATA_AT_INGESTION', default=False, cast=bool)
+COMPANY_ADDRESS_MODEL = llm_model_name
+
+COMPANY_ADDRESS_PROMPT = """
+Provide the formatted U.S. address for the following company for use in a cover letter.
+The address should be in the following format:
+
+Company Name
+Street Address
+City, State ZIP Code
+
+If you do not know the address for this company, or if there are too many companies with the same name, output only the name of the company and nothing else in this format:
+
+Company Name
+    """
+
+# Legal suffixes dropped so "Acme, Inc." and "ACME Inc" share one entry
+COMPANY_SUFFIX_PATTERN = re.compile(
+    r"\b(incorporated|inc|llc|l\.l\.c|ltd|limited|corp|corporation|co|company|plc|gmbh|lp|llp|pc|pllc)\b\.?$"
+)
+
+_metadata = LocalLRUCache(COMPANY_METADATA_MEMO_MAX_ENTRIES)
+
+
+def normalize_company_name(name):
+    """Lowercases, strips punctuation and trailing legal suffixes, and collapses whitespace."""
+    if not name:
+        return ''
+    normalized = re.sub(r"[^\w\s&]", " ", str(name).lower())
+    normalized = " ".join(normalized.split())
+    while True:
+        stripped = COMPANY_SUFFIX_PATTERN.sub('', normalized).strip()
+        if stripped == normalized or not stripped:
+            return normalized
+        normalized = stripped
+
+
+def _remember(rows):
+    for row in rows:
+        _metadata.set(row['normalized_name'], row)
+
+
+def prefetch_company_metadata(companies: Iterable[str]) -> List[str]:
+    """
+    Loads stored metadata for many companies with one query and keeps it in memory.
+
+    :return: the normalised names that have no stored metadata yet.
+    """
+    names = {normalize_company_name(company) for company in companies if company}
+    names.discard('')
+    # Tracked here rather than re-read from the memo, which may already have evicted some of the rows
+    found = {name for name in names if _metadata.get(name) is not None}
+    wanted = [name for name in names if name not in found]
+    if wanted:
+        try:
+            rows = supabase.table(COMPANY_METADATA_TABLE).select('*').in_('normalized_name', wanted).execute().data or []
+            _remember(rows)
+            found.update(row['normalized_name'] for row in rows)
+        except Exception as e:
+            logger.warning(f"Unable to prefetch company metadata for {len(wanted)} companies: {e}")
+    return [name for name in names if name not in found]
+
+
+def get_company_metadata(company) -> Optional[Dict]:
+    """Returns the stored metadata row for a company, or None when it has never been looked up."""
+    name = normalize_company_name(company)
+    if not name:
+        return None
+    metadata = _metadata.get(name)
+    if metadata is None:
+        prefetch_company_metadata([company])
+        metadata = _metadata.get(name)
+    return metadata
+
+
+def save_company_metadata(company, **fields):
+    row = {
+        'normalized_name': normalize_company_name(company),
+        'name': company,
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+        **fields
+    }
+    _remember([row])
+    try:
+        supabase.table(COMPANY_METADATA_TABLE).upsert(row, on_conflict='normalized_name').execute()
+    except Exception as e:
+        logger.warning(f"Unable to store company metadata for {company}: {e}")
+    return row
+
+
+def get_company_address(company, client=None):
+    """Mailing address block for a company: stored metadata first, the model only on the first lookup."""
+    metadata = get_company_metadata(company)
+    if metadata and metadata.get('address'):
+        return metadata['address']
+
+    response = cached_chat_completion(
+        client or llm_client,
+        model=COMPANY_ADDRESS_MODEL,
+        messages=[
+            {"role": "system", "content": COMPANY_ADDRESS_PROMPT},
+            {"role": "user", "content": f"Company Name: {company}"}
+        ],
+        temperature=0,
+        cache=True
+    )
+    address = response.choices[0].message.content
+    save_company_metadata(company, address=address)
+    return address
+
+
+def resolve_company_addresses(companies: Iterable[str]):
+    """
+    Bulk path for ingestion: prefetches the stored metadata, then looks up the companies seen
+    for the first time concurrently and stores their addresses.
+    """
+    by_name = {}
+    for company in companies:
+        if company and normalize_company_name(company):
+            by_name.setdefault(normalize_company_name(company), company)
+
+    missing = prefetch_company_metadata(by_name.values())
+    if not missing:
+        return 0
+
+    companies_to_resolve = [by_name[name] for name in missing]
+    addresses = run_extraction_batch(
+        [f"Company Name: {company}" for company in companies_to_resolve],
+        COMPANY_ADDRESS_MODEL,
+        system_prompt=COMPANY_ADDRESS_PROMPT,
+        temperature=0,
+        max_tokens=200,
+        parse=lambda content: content
+    )
+    resolved = 0
+    for company, address in zip(companies_to_resolve, addresses):
+        if address:
+            save_company_metadata(company, address=address)
+            resolved += 1
+    logger.info(f"Resolved company metadata for {resolved}/{len(companies_to_resolve)} new companies.")
+    return resolved
@@ -0,0 +1,177 @@
+# app/document_cache.py
+
+import hashlib
+import json
+import os
+import time
+from redis.exceptions import RedisError
+from .extensions import config, logger, supabase, redis_client
+
+DOCUMENT_CACHE_ENABLED = config('DOCUMENT_CACHE_ENABLED', default=True, cast=bool)
+# Retention for generated files: anything older than this is removed, then the oldest files
+# go until the directory is under the size cap
+DOCUMENT_RETENTION_DAYS = config('DOCUMENT_RETENTION_DAYS', default=14, cast=int)
+DOCUMENT_STORAGE_MAX_MB = config('DOCUMENT_STORAGE_MAX_MB', default=1024, cast=int)
+# Bump when the prompts or assembly code change in a way that should invalidate stored documents
+DOCUMENT_GENERATOR_VERSION = '4'
+
+CACHE_PREFIX = 'doccache:'
+CACHE_STATS_KEY = 'doccache:stats'
+
+# Only the profile fields that end up in a document take part in the fingerprint
+PROFILE_FIELDS = 'real_name,postnomial,phone,email,current_city,current_state,preferred_roles_responsibilities'
+PROFILE_TABLES = ('work_experience', 'education', 'certifications')
+# The job_postings columns a document is written from
+JOB_FIELDS = ('job_title', 'company', 'job_description', 'digest')
+
+_template_fingerprints = {}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def profile_fingerprint(user_id):
+    """Hash of the user's profile rows used for document generation; changes whenever the user edits them."""
+    profile = {
+        'user_job_preferences': supabase.table('user_job_preferences').select(PROFILE_FIELDS).eq('user_id', user_id).execute().data
+    }
+    for table in PROFILE_TABLES:
+        rows = supabase.table(table).select('*').eq('profile_id', user_id).execute().data or []
+        profile[table] = sorted(rows, key=lambda row: str(row.get('id')))
+    return _sha256(json.dumps(profile, sort_keys=True, default=str).encode('utf-8'))
+
+
+def template_fingerprint(template_path):
+    """Hash of a template file, recomputed only when the file changes on disk."""
+    mtime = os.path.getmtime(template_path)
+    cached = _template_fingerprints.get(template_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(template_path, 'rb') as f:
+        fingerprint = _sha256(f.read())
+    _template_fingerprints[template_path] = (mtime, fingerprint)
+    return fingerprint
+
+
+def job_fingerprint(job_data):
+    """Hash of the job content a document is written from, so an edited posting or digest gets a new document."""
+    content = {field: job_data.get(field) for field in JOB_FIELDS}
+    return _sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8'))
+
+
+def document_cache_key(user_id, job_id, doc_type, template_path, profile_fp, job_fp):
+    """
+    :param profile_fp: profile_fingerprint(user_id), computed once per request and passed along
+    :param job_fp: job_fingerprint() of the job_postings row
+    """
+    version = _sha256(
+        f"{profile_fp}:{job_fp}:{template_fingerprint(template_path)}:{DOCUMENT_GENERATOR_VERSION}".encode('utf-8')
+    )
+    return f"{CACHE_PREFIX}{user_id}:{job_id}:{doc_type}:{version[:32]}"
+
+
+def _record(field):
+    try:
+        redis_client.hincrby(CACHE_STATS_KEY, field, 1)
+    except RedisError:
+        pass
+
+
+def get_cached_document(key, output_dir, user_id):
+    """Returns the filename of a stored document for this key, or None."""
+    if not DOCUMENT_CACHE_ENABLED:
+        return None
+    try:
+        filename = redis_client.get(key)
+    except RedisError as e:
+        logger.warning(f"Document cache lookup failed: {e}")
+        return None
+    if filename is None:
+        _record('misses')
+        return None
+
+    filename = filename.decode('utf-8')
+    if not filename.startswith(document_filename_prefix(user_id)):
+        # A user's entries only ever name that user's files
+        try:
+            redis_client.delete(key)
+        except RedisError:
+            pass
+        _record('misses')
+        return None
+    path = os.path.join(output_dir, filename)
+    if not os.path.exists(path):
+        # Removed by the retention sweep
+        try:
+            redis_client.delete(key)
+        except RedisError:
+            pass
+        _record('misses')
+        return None
+
+    # Refresh the modification time so the size-based eviction drops the least recently used files first
+    os.utime(path)
+    _record('hits')
+    return filename
+
+
+def document_filename_prefix(user_id):
+    return f"{user_id}_"
+
+
+def store_cached_document(key, filename):
+    if not DOCUMENT_CACHE_ENABLED:
+        return
+    try:
+        redis_client.set(key, filename, ex=DOCUMENT_RETENTION_DAYS * 86400)
+    except RedisError as e:
+        logger.warning(f"Document cache store failed: {e}")
+
+
+def cleanup_document_storage(output_dir, max_age_days=None, max_total_mb=None):
+    """
+    Applies the retention policy to generated documents: removes files older than max_age_days,
+    then the least recently used files until the directory fits in max_total_mb.
+    """
+    max_age_days = max_age_days if max_age_days is not None else DOCUMENT_RETENTION_DAYS
+    max_total_bytes = (max_total_mb if max_total_mb is not None else DOCUMENT_STORAGE_MAX_MB) * 1024 * 1024
+    if not os.path.isdir(output_dir):
+        return {'removed': 0, 'freed_bytes': 0, 'remaining_bytes': 0}
+
+    files = []
+    for entry in os.scandir(output_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    cutoff = time.time() - max_age_days * 86400
+    total_bytes = sum(size for _, size, _ in files)
+    removed, freed_bytes = 0, 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total_bytes - freed_bytes <= max_total_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            freed_bytes += size
+        except OSError as e:
+            logger.warning(f"Unable to remove generated document {path}: {e}")
+
+    stats = {'removed': removed, 'freed_bytes': freed_bytes, 'remaining_bytes': total_bytes - freed_bytes}
+    logger.info(f"Generated document cleanup: {stats}")
+    return stats
+
+
+def get_document_cache_stats():
+    """Returns cumulative document cache hits, misses and hit rate."""
+    try:
+        raw = redis_client.hgetall(CACHE_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read document cache stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+    stats['hit_rate'] = round(stats.get('hits', 0) / lookups, 4) if lookups else 0.0
+    return stats
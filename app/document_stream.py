@@ -0,0 +1,71 @@
+# app/document_stream.py
+
+import json
+import time
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+
+# Generation events are appended to a Redis stream per task so a browser that connects after the
+# worker has started still receives everything from the first token
+DOCUMENT_STREAM_TTL = config('DOCUMENT_STREAM_TTL', default=3600, cast=int)  # seconds
+DOCUMENT_STREAM_TIMEOUT = config('DOCUMENT_STREAM_TIMEOUT', default=300, cast=int)  # seconds
+DOCUMENT_STREAM_HEARTBEAT = 15  # seconds
+
+STREAM_PREFIX = 'docstream:'
+
+
+def stream_key(task_id):
+    return f"{STREAM_PREFIX}{task_id}"
+
+
+def publish_event(task_id, event, **fields):
+    """Appends one event (delta, reset, done, error) to the task's stream."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xadd(stream_key(task_id), {'event': event, 'data': json.dumps(fields)})
+        pipe.expire(stream_key(task_id), DOCUMENT_STREAM_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to publish {event} event for document task {task_id}: {e}")
+
+
+def make_delta_publisher(task_id):
+    """on_delta callback for generate_document(): forwards each text fragment to the task's stream."""
+    def on_delta(section, text):
+        publish_event(task_id, 'delta', section=section, text=text)
+    return on_delta
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_events(task_id, timeout=None):
+    """
+    Yields (event, data) from a task's stream as they arrive, until a done/error event or the timeout.
+    Yields ('heartbeat', None) while waiting so the caller can keep the connection alive.
+    """
+    deadline = time.monotonic() + (timeout or DOCUMENT_STREAM_TIMEOUT)
+    last_id = '0'
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            # Short blocking reads: the shared client's socket timeout is 2 seconds
+            entries = redis_client.xread({stream_key(task_id): last_id}, block=1000)
+        except RedisError as e:
+            logger.warning(f"Unable to read document stream for task {task_id}: {e}")
+            yield 'error', {'error': "Lost connection to the document generator."}
+            return
+        if not entries:
+            if time.monotonic() - last_sent >= DOCUMENT_STREAM_HEARTBEAT:
+                last_sent = time.monotonic()
+                yield 'heartbeat', None
+            continue
+        last_sent = time.monotonic()
+        for entry_id, fields in entries[0][1]:
+            last_id = entry_id
+            event = fields[b'event'].decode('utf-8')
+            yield event, json.loads(fields[b'data'])
+            if event in ('done', 'error'):
+                return
+    yield 'error', {'error': "Timed out waiting for the document."}
@@ -0,0 +1,630 @@
+# app/documents.py
+
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.text.paragraph import Paragraph
+from openai import OpenAI
+from .extensions import config, logger, supabase, llm_client, llm_model_name, api_key
+from .rate_limiter import limited_chat_completion
+from .office_pool import convert_docx_to_pdf
+from .docx_templates import render_template
+from .company_metadata import get_company_address
+from .document_cache import document_cache_key, document_filename_prefix, get_cached_document, job_fingerprint, profile_fingerprint, store_cached_document, JOB_FIELDS
+from .prompt_builder import build_messages, record_prompt_usage, serialize_profile
+from .job_digest import job_description_for_prompt
+from .token_utils import estimate_tokens
+
+# Generated resumes and cover letters (DOCX and PDF) are written here and served by the download endpoint
+DOCUMENT_OUTPUT_DIR = os.path.join(os.getcwd(), 'static', 'cover_letter')
+DOCUMENT_TYPES = ('resume', 'cover_letter')
+DOCUMENT_TEMPLATES = {
+    'resume': os.path.join(os.path.dirname(__file__), 'docs', 'resume_template.docx'),
+    'cover_letter': os.path.join(os.path.dirname(__file__), 'docs', 'cover_letter_template.docx'),
+}
+
+
+# Point document generation at a local fake chat-completions server (tests, demos)
+DOC_GENERATION_LLM_BASE_URL = config('DOC_GENERATION_LLM_BASE_URL', default='')
+client = OpenAI(base_url=DOC_GENERATION_LLM_BASE_URL, api_key=api_key or 'local', max_retries=0) if DOC_GENERATION_LLM_BASE_URL else llm_client
+
+
+class DocumentGenerationError(Exception):
+    """Raised when a document cannot be generated from the user's profile (missing data or template)."""
+
+
+def capitalize_first_letter(text):
+    # Capitalize only the first letter of the text, leave the rest unchanged
+    if text:
+        return text[0].upper() + text[1:]
+    return text  # Return the original text if it's empty
+
+def replace_education_placeholder(para, education_data):
+    # Define degree acronyms and titles
+    degree_titles = {
+        'BA': 'Bachelor of Arts',
+        'BS': 'Bachelor of Science',
+        'BSc': 'Bachelor of Science',
+        'BBA': 'Bachelor of Business Administration',
+        'BFA': 'Bachelor of Fine Arts',
+        'BMus': 'Bachelor of Music',
+        'BEd': 'Bachelor of Education',
+        'BEng': 'Bachelor of Engineering',
+        'BSN': 'Bachelor of Science in Nursing',
+        'MA': 'Master of Arts',
+        'MS': 'Master of Science',
+        'MSc': 'Master of Science',
+        'MBA': 'Master of Business Administration',
+        'MFA': 'Master of Fine Arts',
+        'MEd': 'Master of Education',
+        'MPH': 'Master of Public Health',
+        'MSW': 'Master of Social Work',
+        'MMus': 'Master of Music',
+        'MEng': 'Master of Engineering',
+        'PhD': 'Doctor of Philosophy',
+        'EdD': 'Doctor of Education',
+        'DBA': 'Doctor of Business Administration',
+        'MD': 'Doctor of Medicine',
+        'JD': 'Juris Doctor (Law)',
+        'DDS': 'Doctor of Dental Surgery',
+        'DVM': 'Doctor of Veterinary Medicine',
+        'PsyD': 'Doctor of Psychology',
+        'PostDoc': 'Post-Doctoral Fellow/Research',
+        'PDF': 'Post-Doctoral Fellowship'
+    }
+
+    # para is the $EDUCATION placeholder paragraph
+    if para is not None:
+        # Clear the paragraph and replace with formatted education text
+        for item in education_data:
+            # Get degree abbreviation directly from item (e.g., 'MS')
+            degree = item.get('degree_title', '')
+
+            # Get the full degree title using the degree abbreviation
+            degree_title = degree_titles.get(degree, '')
+
+            # Capitalize the field of study and institution if available
+            field_of_study = capitalize_first_letter(item['field_of_study']) if item.get('field_of_study') else ''
+            institution = capitalize_first_letter(item['institution']) if item.get('institution') else ''
+
+            # Format the text as "{degree} ({degree_title}) in {field_of_study} – {institution}"
+            formatted_text = f"{degree} ({degree_title}) in {field_of_study} – {institution}" if field_of_study else f"{degree} ({degree_title}) – {institution}"
+
+            # Clear the paragraph text (remove any existing content)
+            para.clear()
+
+            # Add the formatted text as a run with font size 10pt
+            run = para.add_run(formatted_text)
+            run.font.size = Pt(10)  # Set font size to 10pt
+
+            # If you want to add additional lines after each entry, you could insert a new paragraph here
+            # document.add_paragraph()  # Uncomment to add extra whitespace (new paragraph)
+
+
+def add_section_to_template(para, data, key_map, document, is_certifications=False):
+    # para is the section's placeholder paragraph (e.g. $WORKEXPERIENCE)
+    if para is not None:
+        # Replace the section heading with tab-stops formatted text
+        insert_tab_stops_text(para, data, key_map, document, is_certifications)
+        remove_paragraph(para)
+
+def remove_paragraph(para):
+    # Access the underlying XML element of the paragraph
+    para_element = para._element
+
+    # Remove the paragraph from the document's XML structure
+    para_element.getparent().remove(para_element)
+
+def insert_paragraph_after(paragraph, text=None, style=None):
+    """Insert a new paragraph after the given paragraph."""
+    new_p = OxmlElement("w:p")  # Create a new XML element for the paragraph
+    paragraph._p.addnext(new_p)  # Insert it after the current paragraph
+    new_para = Paragraph(new_p, paragraph._parent)  # Wrap it as a `Paragraph` object
+    if text:
+        new_para.add_run(text)  # Add text if provided
+    if style is not None:
+        new_para.style = style  # Apply style if provided
+    return new_para
+
+def insert_tab_stops_text(para, data, key_map, document, is_certifications):
+    """Insert tab stops and formatted text sequentially after the given paragraph."""
+    # Calculate usable width for tab position
+    section = document.sections[0]
+    usable_width = section.page_width - section.left_margin - section.right_margin
+
+    for item in data:
+        # Create a new paragraph for each entry
+        new_para = insert_paragraph_after(para)
+
+        left_text = item.get(key_map['left'], '')
+
+        # Handle date formatting
+        if is_certifications:
+            date_text = item.get('acquired_date', 'Unknown Date')
+        else:
+            start_year = item.get('start_year', '')
+            end_year = item.get('end_year', 'Present')
+            if end_year == 'None' or end_year is None:
+                end_year = 'Present'
+            date_text = f"{start_year} - {end_year}"
+
+        # Add left-aligned text with tab and right-aligned date
+        run_left = new_para.add_run(left_text)
+        run_left.font.size = Pt(11.5)
+
+        run_tab_date = new_para.add_run(f"\t{date_text}")
+        run_tab_date.font.size = Pt(10)
+
+        # Set the tab stop with right alignment
+        new_para.paragraph_format.tab_stops.add_tab_stop(
+            usable_width,
+            alignment=WD_TAB_ALIGNMENT.RIGHT
+        )
+
+        # Handle additional lines (below_text)
+        below_text = key_map.get('below', [])
+        if isinstance(below_text, list):  # If below is a list of keys
+            below_text_lines = [item.get(key, '') for key in below_text]
+        else:
+            below_text_lines = [item.get(below_text, '')]
+
+        for below_line in below_text_lines:
+            if below_line:  # Only add if there's text to add
+                new_para.add_run(f"\n{below_line}").font.size = Pt(10)
+
+        # Align the paragraph to the left (tab stop ensures the date aligns right)
+        new_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+        
+        # Manually insert a blank paragraph by adding a new empty paragraph after the current one
+        new_blank_para = insert_paragraph_after(new_para)
+
+        # Set a minimal formatting or style for the blank line if necessary
+        new_blank_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+        new_blank_para.add_run("")  # Just an empty run to create the blank line
+        
+# Shared pool for the independent LLM and Supabase calls made while generating a document
+DOC_GENERATION_MAX_WORKERS = config('DOC_GENERATION_MAX_WORKERS', default=16, cast=int)
+document_executor = ThreadPoolExecutor(max_workers=DOC_GENERATION_MAX_WORKERS, thread_name_prefix='docgen')
+
+
+def complete_text(system_prompt, user_content, temperature=None, on_delta=None, section=None):
+    """
+    One chat completion for a document section. With on_delta, the completion is streamed and
+    on_delta(section, text) is called for every fragment as it arrives; the full text is returned either way.
+    """
+    request = {
+        'model': llm_model_name,
+        'messages': build_messages(system_prompt, user_content)
+    }
+    if temperature is not None:
+        request['temperature'] = temperature
+    tokens_in = sum(estimate_tokens(message['content']) for message in request['messages'])
+
+    if on_delta is None:
+        response = limited_chat_completion(client, **request)
+        content = response.choices[0].message.content
+        if getattr(response, 'usage', None):
+            record_prompt_usage(section, response.usage.prompt_tokens, response.usage.completion_tokens)
+        else:
+            record_prompt_usage(section, tokens_in, estimate_tokens(content), estimated=True)
+        return content
+
+    parts = []
+    for chunk in limited_chat_completion(client, stream=True, **request):
+        # Azure sends chunks without choices (e.g. content filter results)
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            on_delta(section, chunk.choices[0].delta.content)
+    content = "".join(parts)
+    # Streamed responses carry no usage block
+    record_prompt_usage(section, tokens_in, estimate_tokens(content), estimated=True)
+    return content
+
+
+def calculate_word_count(work_exp_count, education_count, certifications_count):
+    # Work experience word count based on the inverted functionality
+    static_edu_cert_word_count = (education_count + certifications_count) * 15
+
+    work_exp_word_count = 0
+    if work_exp_count > 5:
+        work_exp_word_count = 96
+    if work_exp_count == 5:
+        work_exp_word_count = 108
+    elif work_exp_count == 4:
+        work_exp_word_count = 120
+    elif work_exp_count == 3:
+        work_exp_word_count = 160
+    elif work_exp_count == 2:
+        work_exp_word_count = 240
+    elif work_exp_count == 1:
+        work_exp_word_count = 480
+
+    # Adjust work experience allocation based on remaining words after education and certifications
+    work_exp_word_count = work_exp_word_count - static_edu_cert_word_count
+
+    return work_exp_word_count
+
+
+def generate_resume(job_data, user_id, on_delta=None):
+    # Fetch user data from Supabase
+    user_data_response = supabase.table('user_job_preferences').select('*').eq('user_id', user_id).execute()
+    user_data = user_data_response.data
+    print(f"Job Data: {job_data}")
+
+    if not user_data:
+        raise DocumentGenerationError("User data not found.")
+
+    user_details = user_data[0]
+    if not user_details.get('real_name'):
+        raise DocumentGenerationError("Real name is missing.")
+
+    # Extract user details
+    full_name = user_details['real_name']
+    postnomial = user_details.get('postnomial', '')
+    phone_number = user_details.get('phone', '')
+    email = user_details.get('email', '')
+    current_city = user_details.get('current_city', '')
+    current_state = user_details.get('current_state', '')
+
+    # Generate professional summary using OpenAI
+    company = job_data['company']
+    # The job's stored digest, shared by the summary, skills and every description call
+    job_description = job_description_for_prompt(job_data)
+    preferred_roles_responsibilities = user_details.get('preferred_roles_responsibilities', '')
+
+    summary_prompt = f"""You are a professional resume summary writer. 
+    The user will upload a job description they will use to apply for the job.
+
+    Your task is to write a resume summary section that is no more than 60 words in length. 
+    The summary must specifically be tailored for the job which the user provides as input. 
+
+    Preferred Roles and Responsibilities: {preferred_roles_responsibilities}
+    Applying to company: {company}
+    """
+
+    skills_prompt = """The user will upload a job description they will use to apply for the job.
+
+Your task is to write a list of skills no more than 45 words in length. The skills list must specifically be tailored for the job which the user provides as input. Use a mixture of hard skills (technologies) and soft skills, all of which should be related to the job.
+
+The first letter of each skill must be Capitalized. Each skill must be separated by a comma and a space. List the skills in order of relevance to the job posting. 
+
+IMPORTANT: Do not exceed 45 words in length. This is going at the bottom of a resume and if you exceed 45 words, it will not fit. Do not give the skills list a label like "Skills: " - Generate the skills list only, following the below Example List:
+"""
+
+    # The summary call, the skills call and the three profile fetches are independent: run them concurrently
+    summary_future = document_executor.submit(complete_text, summary_prompt, f"Job Description: {job_description}", 0.8, on_delta, 'summary')
+    skills_future = document_executor.submit(complete_text, skills_prompt, f": {job_description}", 0.4, on_delta, 'skills')
+    work_experience_future = document_executor.submit(lambda: supabase.table('work_experience').select('*').eq('profile_id', user_id).execute())
+    education_future = document_executor.submit(lambda: supabase.table('education').select('*').eq('profile_id', user_id).execute())
+    certifications_future = document_executor.submit(lambda: supabase.table('certifications').select('*').eq('profile_id', user_id).execute())
+
+    work_experience = work_experience_future.result()
+    education = education_future.result()
+    certifications = certifications_future.result()
+
+    # Safely process data
+    work_experience_data = [
+        {
+            "company": data.get('company', 'Unknown Company'),
+            "title": data.get('title', 'Unknown Title'),
+            "description": data.get('description', ''),
+            "start_year": data.get('start_year', ''),
+            "end_year": data.get('end_year', 'Present'),
+        }
+        for data in (work_experience.data or [])
+    ]
+    education_data = [
+        {
+            "institution": data.get('institution', 'Unknown Institution'),
+            "degree": data.get('degree', 'Unknown Degree'),
+            "degree_title": data.get('degree_title', 'Unknown Title'),
+            "field_of_study": data.get('field_of_study', 'Unknown Field'),
+            "start_year": data.get('start_year', 'Unknown'),
+            "end_year": data.get('end_year', 'Present'),
+        }
+        for data in (education.data or [])
+    ]
+    certifications_data = [
+        {
+            "title": data.get('title', 'Unknown Certification'),
+            "issuer": data.get('issuer', ''),
+            "acquired_date": data.get('acquired_date', ''),
+        }
+        for data in (certifications.data or [])
+    ]
+
+
+ # For each work experience entry, decide whether to add more details based on the number of entries
+    word_limit = calculate_word_count(len(work_experience_data), len(education_data), len(certifications_data))
+
+    # One description call per work experience entry, all in flight at once
+    description_futures = []
+    for index, work in enumerate(work_experience_data):
+        description_prompt = f"""You are a resume writer. Based on the title '{work['title']}' at '{work['company']}', write a description for this job role, as if you were the one that had it and want to give your objective outlook on it. Use maximum of {word_limit} words. Respect the word count. Do not give any headings or position headers.
+
+Title: {work['title']}
+Company: {work['company']}
+"""
+        description_futures.append(document_executor.submit(
+            complete_text, description_prompt, f"Job Description: {job_description}", 0.7, on_delta, f"work_experience:{index}"
+        ))
+
+    # Update each work entry with its generated description once all results have arrived
+    for work, description_future in zip(work_experience_data, description_futures):
+        work['description'] = description_future.result()
+
+    summary = summary_future.result()
+    skills = skills_future.result()
+
+    # Replace placeholders in the template (body, headers and footers)
+    placeholder_map = {
+        "$FULLNAME": full_name,
+        "$POSTNOMIAL": postnomial,
+        "$CONTACTDETAILS": f"{current_city}, {current_state} · {email} · {phone_number}",
+        "$SUMMARY": summary,
+        "$SKILLS": skills,
+    }
+
+    try:
+        rendered = render_template(DOCUMENT_TEMPLATES['resume'], placeholder_map)
+    except Exception as e:  
+        raise DocumentGenerationError("Template not found or invalid.") from e
+    document = rendered.document
+
+    # Add sections
+    add_section_to_template(rendered.anchor('$WORKEXPERIENCE'), work_experience_data, {
+        "left": "company",
+        "below": ["title", "description"],
+    }, document, False)
+
+    replace_education_placeholder(rendered.anchor('$EDUCATION'), education_data)
+
+    add_section_to_template(rendered.anchor('$CERTIFICATIONS'), certifications_data, {
+        "left": "issuer",
+        "below": "title",
+    }, document, True)
+
+    # Save the document
+    output_dir = DOCUMENT_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_filename = document_filename(job_data, 'resume', user_id)
+    output_path = os.path.join(output_dir, output_filename)
+
+    # Save the DOCX document
+    document.save(output_path)
+
+    # Define PDF output path and filename
+    pdf_output_filename = output_filename.replace('.docx', '.pdf')
+    pdf_output_path = os.path.join(output_dir, pdf_output_filename)
+
+    # Convert DOCX to PDF
+    convert_docx_to_pdf(output_path, pdf_output_path)
+
+    # Return the PDF directory and PDF filename
+    return os.path.dirname(pdf_output_path), pdf_output_filename
+
+
+def generate_cover_letter(job_data, user_id, on_delta=None):
+    # Fetch user data from Supabase
+    user_data_response = supabase.table('user_job_preferences').select('*').eq('user_id', user_id).execute()
+    user_data = user_data_response.data
+    cover_letter_content = None
+
+    if not user_data:
+        raise DocumentGenerationError("User data not found.")
+
+    user_details = user_data[0]
+    if user_details.get('real_name') is None:
+        raise DocumentGenerationError("Real name is missing.")
+
+    full_name = user_details['real_name']
+    postnomial = user_details['postnomial']
+    phone_number = user_details.get('phone', '')
+    email = user_details['email']
+    current_city = user_details['current_city']
+    current_state = user_details['current_state']
+
+    # Format contact details
+    contact_details = f"{current_city}, {current_state}"
+    if phone_number:
+        contact_details += f" • {phone_number}"
+    contact_details += f" • {email}"
+
+    job_title = job_data['job_title']
+    company = job_data['company']
+    job_description = job_description_for_prompt(job_data)
+
+    work_experience = supabase.table('work_experience').select('*').eq('profile_id', user_id).execute()
+    education = supabase.table('education').select('*').eq('profile_id', user_id).execute()
+    certifications = supabase.table('certifications').select('*').eq('profile_id', user_id).execute()
+    
+    # Extract relevant data from the responses
+    work_experience_data = [
+        {
+            "company": data['company'],
+            "title": data['title'],
+            "description": data.get('description'),
+            "start_month": data['start_month'],
+            "start_year": data['start_year'],
+            "end_month": data.get('end_month'),
+            "end_year": data.get('end_year'),
+        }
+        for data in work_experience.data or []
+    ]
+    
+
+    education_data = [
+        {
+            "institution": data['institution'],
+            "degree": data['degree'],
+            "field_of_study": data.get('field_of_study'),
+            "start_month": data['start_month'],
+            "start_year": data['start_year'],
+            "end_month": data.get('end_month'),
+            "end_year": data.get('end_year'),
+        }
+        for data in education.data or []
+    ]
+
+    certifications_data = [
+        {
+            "title": data['title'],
+            "issuer": data.get('issuer'),
+            "acquired_date": data['acquired_date'],
+        }
+        for data in certifications.data or []
+    ]
+    print(f"Company Name: {company}")
+    profile = serialize_profile(work_experience_data, education_data, certifications_data)
+    summary_prompt = f"""You are a job application cover letter writer. The user will send a job description and company name and the resume they will use to apply for the job. Generate a cover letter of approximately 300 words in length which appropriately draws upon the experiences described in the user's resume to position the user as an excellent candidate for the job. 
+
+Your writing style should follow the Harvard cover letter model:
+- Opening paragraph: who the candidate is, the role they are applying for, and why they are excited about the field and the team.
+- One paragraph per relevant experience (two at most): connect the company's mission to a concrete role from the resume, what the candidate designed, led or delivered, with measurable results (e.g. "a 20% increase in membership").
+- Closing: thank the reader and say they look forward to speaking about the position.
+
+IMPORTANT: Do not include any variables or fields which may require user input. Do not include a date. Do not include the recipient address. Instead of starting with "Dear [Recipient Name]" you must write something like "Dear Hiring Committee"
+
+Sign the cover letter using details extrapolated from the user's resume. If you are unable to determine the details, you must use generic information. 
+
+Please output the cover letter responses without annotations, footnotes, or bracketed comments. Generate the letter only. Do not provide any intro or summary after generating the letter.
+
+Resume:
+{profile}
+Applying to company: {company}
+
+Don't end the text with any "sincerely", "kind regards" or give any personal information at the end.
+"""
+
+    cover_letter_content = complete_text(summary_prompt, f"Job Descriptions: {job_description}", on_delta=on_delta, section='cover_letter')
+    # # Generate company address
+    # openai_url = f"{os.getenv('AZURE_OPENAI_ENDPOINT_COVER_LETTER')}/openai/deployments/gpt-4o-mini/chat/completions?api-version=2024-05-01-preview"
+    # headers = {
+    #     "Authorization": f"Bearer {token_provider.get_token()}",
+    #     "Content-Type": "application/json"
+    # }
+
+    # Stored per company and shared with ingestion: the model is only asked the first time a company is seen
+    company_address = get_company_address(company, client)
+
+
+    # openai_payload_address = {
+    #     "prompt": return_address_prompt,
+    #     "max_tokens": 100,
+    #     "temperature": 0.2
+    # }
+    # response_address = requests.post(openai_url, headers=headers, json=openai_payload_address)
+    # if response_address.status_code != 200:
+    #     flash("Error generating company address: " + response_address.text, 'error')
+    #     return redirect(url_for('home'))
+
+    # address_response = response_address.json()
+    # company_address = address_response['choices'][0]['text'].strip()
+
+    # Prepare placeholders for template replacement
+    current_time = datetime.now().strftime("%m-%d-%Y")
+    user_details_dict = {
+        '$FULLNAME': full_name,
+        '$POSTNOMIAL': postnomial,
+        '$CONTACTDETAILS': contact_details,
+        '$DATETIME': current_time,
+        '$COMPANY_LOCATION': company_address,
+        '$USER_LOCATION': f"{current_city}, {current_state}",
+        '$SUMMARY': cover_letter_content,
+        '$EMAIL': email,
+        '$PHONENUMBER': phone_number
+    }
+
+    # Fill the Word template. Body placeholders are split across runs in this template, so they are
+    # replaced per paragraph; the body is set in 10pt and headers are filled run by run.
+    document = render_template(
+        DOCUMENT_TEMPLATES['cover_letter'], user_details_dict, body_mode='paragraphs', body_font_size=Pt(10)
+    ).document
+
+    output_dir = DOCUMENT_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_filename = document_filename(job_data, 'cover_letter', user_id)
+    output_path = os.path.join(output_dir, output_filename)
+
+
+    # Save the DOCX document
+    document.save(output_path)
+
+    # Define PDF output path and filename
+    pdf_output_filename = output_filename.replace('.docx', '.pdf')
+    pdf_output_path = os.path.join(output_dir, pdf_output_filename)
+
+    # Convert DOCX to PDF
+    convert_docx_to_pdf(output_path, pdf_output_path)
+
+    # Return the PDF directory and PDF filename
+    return os.path.dirname(pdf_output_path), pdf_output_filename
+
+
+def document_filename(job_data, doc_type, user_id):
+    """DOCX file name unique to one generation, so concurrent documents never share or overwrite a file."""
+    job_title = re.sub(r"[^A-Za-z0-9-]+", "_", job_data.get('job_title') or 'job').strip('_')[:60]
+    return f"{document_filename_prefix(user_id)}{uuid.uuid4().hex}_{job_title}_{doc_type}.docx"
+
+
+def find_cached_document(job_id, doc_type, user_id, profile_fp=None, job_data=None):
+    """
+    Looks up a previously generated document for the user's current profile, the job's current
+    content and the template.
+
+    :param profile_fp: profile_fingerprint(user_id) when the caller already has it
+    :param job_data: the job_postings row when the caller already has it (fetched otherwise)
+
+    :return: (cache_key, filename) where filename is None on a miss; (None, None) for an unknown job.
+    """
+    if job_data is None:
+        job_response = supabase.table('job_postings').select(', '.join(JOB_FIELDS)).eq('id', job_id).execute()
+        job_data = job_response.data[0] if job_response.data else None
+        if not job_data:
+            return None, None
+    profile_fp = profile_fp or profile_fingerprint(user_id)
+    key = document_cache_key(user_id, job_id, doc_type, DOCUMENT_TEMPLATES[doc_type], profile_fp, job_fingerprint(job_data))
+    return key, get_cached_document(key, DOCUMENT_OUTPUT_DIR, user_id)
+
+
+def generate_document(job_id, doc_type, user_id, on_delta=None, profile_fp=None):
+    """
+    Generates a resume or cover letter PDF for a job posting, reusing the stored PDF when the
+    profile, template and job are unchanged since it was last generated.
+
+    :param on_delta: Optional on_delta(section, text) callback; the document's text is then streamed
+                     section by section while it is generated.
+    :param profile_fp: profile_fingerprint(user_id) computed by the caller (computed here otherwise).
+
+    :return: (directory, filename) of the generated PDF.
+    """
+    if doc_type not in DOCUMENT_TYPES:
+        raise DocumentGenerationError(f"Unknown document type: {doc_type}")
+
+    job_response = supabase.table('job_postings').select('*').eq('id', job_id).execute()
+    job_data = job_response.data[0] if job_response.data else None
+    if not job_data:
+        raise DocumentGenerationError("Job not found.")
+
+    profile_fp = profile_fp or profile_fingerprint(user_id)
+    _, cached_filename = find_cached_document(job_id, doc_type, user_id, profile_fp, job_data)
+    if cached_filename:
+        logger.info(f"Serving cached {doc_type} for job_id={job_id}, user_id={user_id}: {cached_filename}")
+        return DOCUMENT_OUTPUT_DIR, cached_filename
+
+    if doc_type == 'resume':
+        document_dir, document_filename = generate_resume(job_data, user_id, on_delta)
+    else:
+        document_dir, document_filename = generate_cover_letter(job_data, user_id, on_delta)
+
+    # Keyed on the job as generated: a digest made during generation is part of it from now on
+    cache_key = document_cache_key(user_id, job_id, doc_type, DOCUMENT_TEMPLATES[doc_type], profile_fp, job_fingerprint(job_data))
+    store_cached_document(cache_key, document_filename)
+    return document_dir, document_filename
@@ -0,0 +1,173 @@
+# app/docx_templates.py
+
+import copy
+import os
+import re
+import threading
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+PLACEHOLDER_PATTERN = re.compile(r"\$[A-Z_]+")
+
+# Font size given to a run once its placeholder is filled; everything else gets DEFAULT_FONT_SIZE
+PLACEHOLDER_FONT_SIZES = {
+    '$FULLNAME': Pt(12),
+    '$POSTNOMIAL': Pt(9),
+    '$CONTACTDETAILS': Pt(11),
+}
+DEFAULT_FONT_SIZE = Pt(10)
+
+
+def _path_from(root, element):
+    """Child indices leading from root to element, so the same node can be found in a deep copy."""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _resolve(root, path):
+    element = root
+    for index in path:
+        element = element[index]
+    return element
+
+
+def _story_roots(document):
+    """Root elements of the body and every distinct header/footer, in a stable order."""
+    roots = [document.element]
+    for section in document.sections:
+        for story in (section.header, section.footer):
+            # A linked header/footer has no part of its own; touching .part would add one
+            if story.is_linked_to_previous:
+                continue
+            if not any(story.part.element is root for root in roots):
+                roots.append(story.part.element)
+    return roots
+
+
+def fill_run(run, replacements):
+    """Fills every placeholder found in one run, sizing the run after the placeholder it held."""
+    for placeholder, value in replacements.items():
+        if placeholder not in run.text:
+            continue
+        value = value if value is not None else ''
+        if placeholder == '$FULLNAME':
+            postnomial = replacements.get('$POSTNOMIAL', '')
+            value = value + (', ' + postnomial if postnomial else '')
+        run.text = run.text.replace(placeholder, value)
+        run.font.size = PLACEHOLDER_FONT_SIZES.get(placeholder, DEFAULT_FONT_SIZE)
+
+
+def fill_paragraph(paragraph, replacements, font_size):
+    """Fills placeholders across the whole paragraph text (they may span runs); the paragraph becomes one run."""
+    original = text = paragraph.text
+    for placeholder, value in replacements.items():
+        if placeholder in text:
+            text = text.replace(placeholder, value if value is not None else '')
+    if text != original:
+        paragraph.text = text
+        for run in paragraph.runs:
+            run.font.size = font_size
+
+
+class RenderedTemplate:
+    """A filled copy of a template plus the body paragraphs holding placeholders left for the caller (e.g. $EDUCATION)."""
+
+    def __init__(self, document, anchors):
+        self.document = document
+        self.anchors = anchors
+
+    def anchor(self, placeholder):
+        return self.anchors.get(placeholder)
+
+
+class CompiledTemplate:
+    """
+    A DOCX template parsed once, with the location of every placeholder indexed at load time.
+
+    render() deep-copies the parsed tree and fills only the indexed slots:
+    - header/footer placeholders are always filled run by run (fill_run)
+    - body placeholders are filled run by run, or per paragraph when body_mode='paragraphs'
+      (for templates whose placeholders are split across runs)
+
+    body_font_size, when set, is applied to every body run once at load time.
+    """
+
+    def __init__(self, path, body_mode='runs', body_font_size=None):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.body_mode = body_mode
+        self.body_font_size = body_font_size or DEFAULT_FONT_SIZE
+        self.document = Document(path)
+
+        if body_font_size is not None:
+            for paragraph in self.document.paragraphs:
+                for run in paragraph.runs:
+                    run.font.size = body_font_size
+
+        # Slots are paths from a story root: runs to fill, paragraphs to fill, anchor paragraphs
+        self.run_slots = []
+        self.paragraph_slots = []
+        self.anchor_slots = {}
+        for story_index, root in enumerate(_story_roots(self.document)):
+            is_body = story_index == 0
+            # Top-level paragraphs only, like Document.paragraphs / _Header.paragraphs
+            paragraphs = self.document.paragraphs if is_body else [Paragraph(p, None) for p in root.iterchildren(qn('w:p'))]
+            for paragraph in paragraphs:
+                if '$' not in paragraph.text:
+                    continue
+                if is_body:
+                    for placeholder in PLACEHOLDER_PATTERN.findall(paragraph.text):
+                        self.anchor_slots.setdefault(placeholder, _path_from(root, paragraph._p))
+                if is_body and body_mode == 'paragraphs':
+                    self.paragraph_slots.append(_path_from(root, paragraph._p))
+                    continue
+                for run in paragraph.runs:
+                    if '$' in run.text:
+                        self.run_slots.append((story_index, _path_from(root, run._r)))
+
+    def render(self, replacements):
+        document = copy.deepcopy(self.document)
+        roots = _story_roots(document)
+        body = document._body
+
+        # Every slot is resolved before anything is filled, so earlier fills cannot shift later paths
+        anchors = {
+            placeholder: Paragraph(_resolve(roots[0], path), body)
+            for placeholder, path in self.anchor_slots.items()
+            if placeholder not in replacements
+        }
+        runs = [Run(_resolve(roots[story_index], path), None) for story_index, path in self.run_slots]
+        paragraphs = [Paragraph(_resolve(roots[0], path), body) for path in self.paragraph_slots]
+
+        for run in runs:
+            fill_run(run, replacements)
+        for paragraph in paragraphs:
+            fill_paragraph(paragraph, replacements, self.body_font_size)
+        return RenderedTemplate(document, anchors)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path, **options):
+    """Returns the compiled template for path, recompiling only when the file changes on disk."""
+    key = (path, tuple(sorted(options.items())))
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None or template.mtime != os.path.getmtime(path):
+            template = CompiledTemplate(path, **options)
+            _templates[key] = template
+        return template
+
+
+def render_template(path, replacements, **options):
+    """Renders a filled copy of the template at path. See CompiledTemplate for options."""
+    return get_template(path, **options).render(replacements)
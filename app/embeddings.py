@@ -0,0 +1,119 @@
+# app/embeddings.py
+
+import hashlib
+from typing import List
+import numpy as np
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client, embedding_client, text_embedding_model_name
+from .token_utils import token_batches
+from .rate_limiter import limited_embeddings
+
+# Persistent embedding cache: (model, dimensions, sha256(normalised text)) -> float32 vector bytes
+EMBEDDING_CACHE_ENABLED = config('EMBEDDING_CACHE_ENABLED', default=True, cast=bool)
+EMBEDDING_CACHE_TTL = config('EMBEDDING_CACHE_TTL', default=30 * 86400, cast=int)  # seconds
+# One embeddings request carries many inputs; keep each request under these bounds
+EMBEDDING_BATCH_MAX_TOKENS = config('EMBEDDING_BATCH_MAX_TOKENS', default=100000, cast=int)
+EMBEDDING_BATCH_MAX_ITEMS = config('EMBEDDING_BATCH_MAX_ITEMS', default=256, cast=int)
+
+CACHE_PREFIX = 'embcache:'
+CACHE_STATS_KEY = 'embcache:stats'
+
+
+def normalize_text(text):
+    """Collapses whitespace so texts that only differ in layout share one cache entry and one embedding."""
+    return " ".join(str(text).split())
+
+
+def embedding_cache_key(model, dimensions, text):
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{CACHE_PREFIX}{model}:{dimensions}:{digest}"
+
+
+def _record(field, amount):
+    if amount:
+        try:
+            redis_client.hincrby(CACHE_STATS_KEY, field, amount)
+        except RedisError:
+            pass
+
+
+def _as_float32(vector):
+    """Rounds a vector to float32, the precision the cache stores, so hits and misses return equal values."""
+    return np.asarray(vector, dtype=np.float32).tolist()
+
+
+def _cache_get_many(keys):
+    if not EMBEDDING_CACHE_ENABLED or not keys:
+        return [None] * len(keys)
+    try:
+        blobs = redis_client.mget(keys)
+    except RedisError as e:
+        logger.warning(f"Embedding cache lookup failed, calling the API directly: {e}")
+        return [None] * len(keys)
+    return [np.frombuffer(blob, dtype=np.float32).tolist() if blob else None for blob in blobs]
+
+
+def _cache_set_many(items):
+    if not EMBEDDING_CACHE_ENABLED or not items:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key, vector in items:
+            pipe.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=EMBEDDING_CACHE_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Embedding cache store failed: {e}")
+
+
+def _request_embeddings(texts, dimensions, client, model):
+    """Embeds texts in token-bounded batches, one API round-trip per batch, preserving input order."""
+    vectors = [None] * len(texts)
+    for batch in token_batches(texts, EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_BATCH_MAX_ITEMS):
+        response = limited_embeddings(client, model, [text for _, text in batch], dimensions)
+        # The API may return items out of order; item.index is the position within this batch
+        for item in response.data:
+            vectors[batch[item.index][0]] = item.embedding
+    return vectors
+
+
+def embed_texts(texts: List[str], dimensions: int = 512, client=None, model: str = None) -> List[List[float]]:
+    """
+    Returns one embedding per input text, in order. Identical texts are embedded at most once:
+    repeats inside the call are collapsed and previously seen texts are served from the cache.
+    """
+    client = client or embedding_client
+    model = model or text_embedding_model_name
+    normalized = [normalize_text(text) for text in texts]
+    unique_texts = list(dict.fromkeys(normalized))
+    keys = [embedding_cache_key(model, dimensions, text) for text in unique_texts]
+
+    vectors = dict(zip(unique_texts, _cache_get_many(keys)))
+    missing = [text for text in unique_texts if vectors[text] is None]
+    _record('hits', len(unique_texts) - len(missing))
+    _record('misses', len(missing))
+
+    if missing:
+        fresh = [_as_float32(vector) for vector in _request_embeddings(missing, dimensions, client, model)]
+        vectors.update(zip(missing, fresh))
+        _cache_set_many([(embedding_cache_key(model, dimensions, text), vectors[text]) for text in missing])
+        logger.debug(f"Embedded {len(missing)} new texts; {len(unique_texts) - len(missing)} served from cache.")
+
+    return [vectors[text] for text in normalized]
+
+
+def embed_text(text: str, dimensions: int = 512, client=None, model: str = None) -> List[float]:
+    """Embeds a single text through the shared cache."""
+    return embed_texts([text], dimensions, client=client, model=model)[0]
+
+
+def get_embedding_cache_stats():
+    """Returns cumulative embedding cache hits, misses and hit rate."""
+    try:
+        raw = redis_client.hgetall(CACHE_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read embedding cache stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+    stats['hit_rate'] = round(stats.get('hits', 0) / lookups, 4) if lookups else 0.0
+    return stats
@@ -6,6 +6,7 @@ from supabase.client import ClientOptions
 from decouple import config, Config, RepositoryEnv
 from scrapingbee import ScrapingBeeClient
 from openai import AzureOpenAI
+import redis
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -77,7 +78,8 @@ if not all([api_key, azure_endpoint]):
 llm_client = AzureOpenAI(
     api_key=api_key,
     azure_endpoint=azure_endpoint,
-    api_version="2024-05-01-preview"
+    api_version="2024-05-01-preview",
+    max_retries=0  # 429s are retried by app/rate_limiter.py, which also slows the shared buckets down
 )
 llm_model_name = config('AZURE_OPENAI_MODEL_NAME', default='cognibly-gpt4o-mini')
 
@@ -86,11 +88,16 @@ print(llm_client)
 embedding_client = AzureOpenAI(
         api_key=config('AZURE_OPENAI_TEXT_EMBEDDING_KEY'),
         api_version="2024-07-01-preview",
-        azure_endpoint=config('AZURE_OPENAI_EMBEDDING_ENDPOINT')
+        azure_endpoint=config('AZURE_OPENAI_EMBEDDING_ENDPOINT'),
+        max_retries=0
     )
 
 text_embedding_model_name = config('AZURE_OPENAI_EMBEDDING_MODEL_NAME', default='text-embedding-3-small')
 
+# Initialize Redis for shared caches (kept off the Celery broker database)
+redis_url = config('REDIS_URL', default='redis://localhost:6379/1')
+redis_client = redis.Redis.from_url(redis_url, socket_timeout=2, socket_connect_timeout=2)
+
 
 #Initialize Logger
 logger = logging.getLogger('cognibly_app')  # Use a specific logger name for your app
@@ -59,7 +59,12 @@ def generate_job_keywords(job_preferences, maximum_keywords=10):
     """
     
     try:
-        response = client.chat.completions.create(
+        # Imported here: the cache pulls in app.extensions (Redis, Supabase, Azure clients), which this module avoids at import
+        from .llm_cache import cached_chat_completion
+
+        # Preferences rarely change between hourly runs, so identical prompts are served from cache
+        response = cached_chat_completion(
+            client,
             model=deployment_name,
             messages=[
                 {"role": "system", "content": system_prompt},
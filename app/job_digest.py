@@ -0,0 +1,147 @@
+# app/job_digest.py
+
+import json
+from .extensions import config, logger, supabase, llm_client, llm_model_name
+from .llm_cache import cached_chat_completion
+from .llm_extraction import run_extraction_batch, parse_llm_json
+from .prompt_builder import condense_job_description
+from .job_ingest import POSTING_URL_LOOKUP_CHUNK
+
+# Digests are stored in the job_postings.digest column (jsonb, nullable) and reused by every
+# resume and cover letter generated for the job. Column: supabase/migrations/20261019000000_job_postings_digest.sql
+JOB_DIGEST_MODEL = llm_model_name
+# Off: a digest is made the first time a document is generated for the job, so jobs nobody applies
+# to cost no LLM call. On: every newly ingested job is digested in the background.
+JOB_DIGEST_AT_INGESTION = config('JOB_DIGEST_AT_INGESTION', default=False, cast=bool)
+# Job description tokens the digest is written from (larger than the prompt budget: the digest is made once)
+JOB_DIGEST_INPUT_TOKEN_BUDGET = config('JOB_DIGEST_INPUT_TOKEN_BUDGET', default=2000, cast=int)
+JOB_DIGEST_MAX_TOKENS = 400
+# Bump when JOB_DIGEST_PROMPT changes so stored digests are rebuilt on next use
+JOB_DIGEST_VERSION = 1
+
+JOB_DIGEST_PROMPT = """
+You will receive a job posting. Summarise it for a resume and cover letter writer.
+
+Output format: a valid JSON object with these keys and nothing else. Do not include any markdown or backticks.
+{
+    "seniority": "Entry, Mid, Senior, Lead, Manager, Director or Executive",
+    "key_skills": ["up to 12 hard and soft skills, most important first"],
+    "responsibilities": ["up to 6 short phrases"],
+    "requirements": ["up to 6 short phrases: experience, education, certifications"],
+    "company_focus": "one sentence on the company's mission or product, or an empty string"
+}
+"""
+
+
+def _digest_input(job):
+    description = condense_job_description(job.get('job_description'), JOB_DIGEST_INPUT_TOKEN_BUDGET)
+    return f"Job Title: {job.get('job_title')}\nCompany: {job.get('company')}\n\n{description}"
+
+
+def _valid_digest(digest):
+    if isinstance(digest, str):
+        try:
+            digest = json.loads(digest)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(digest, dict) and digest.get('version') == JOB_DIGEST_VERSION:
+        return digest
+    return None
+
+
+def _finish_digest(digest):
+    if not isinstance(digest, dict) or not digest.get('key_skills'):
+        return None
+    digest['version'] = JOB_DIGEST_VERSION
+    return digest
+
+
+def store_job_digest(job_id, digest):
+    try:
+        supabase.table('job_postings').update({'digest': digest}).eq('id', job_id).execute()
+    except Exception as e:
+        logger.warning(f"Unable to store digest for job {job_id}: {e}")
+
+
+def get_job_digest(job_data):
+    """
+    The stored digest for a job_postings row, or one generated now (and stored) when the job was
+    ingested before digests existed or the digest prompt changed. Returns None if it can't be made.
+    """
+    digest = _valid_digest(job_data.get('digest'))
+    if digest:
+        return digest
+    try:
+        response = cached_chat_completion(
+            llm_client,
+            model=JOB_DIGEST_MODEL,
+            messages=[
+                {"role": "system", "content": JOB_DIGEST_PROMPT},
+                {"role": "user", "content": _digest_input(job_data)}
+            ],
+            temperature=0,
+            max_tokens=JOB_DIGEST_MAX_TOKENS,
+            validate=lambda content: _finish_digest(parse_llm_json(content))
+        )
+        digest = _finish_digest(parse_llm_json(response.choices[0].message.content))
+    except Exception as e:
+        logger.warning(f"Unable to generate digest for job {job_data.get('id')}: {e}")
+        return None
+    if digest and job_data.get('id'):
+        store_job_digest(job_data['id'], digest)
+        job_data['digest'] = digest
+    return digest
+
+
+def format_job_digest(job_data, digest):
+    """Plain-text rendering of a digest for generation prompts."""
+    lines = [f"Role: {job_data.get('job_title')} at {job_data.get('company')} ({digest.get('seniority') or 'Unknown'} level)"]
+    if digest.get('company_focus'):
+        lines.append(f"Company: {digest['company_focus']}")
+    lines.append(f"Key skills: {', '.join(digest.get('key_skills') or [])}")
+    for heading, key in (("Responsibilities", 'responsibilities'), ("Requirements", 'requirements')):
+        if digest.get(key):
+            lines.append(f"{heading}:")
+            lines.extend(f"- {item}" for item in digest[key])
+    return "\n".join(lines)
+
+
+def job_description_for_prompt(job_data):
+    """The job's digest when one is available, otherwise the condensed raw description."""
+    digest = get_job_digest(job_data)
+    if digest:
+        return format_job_digest(job_data, digest)
+    return condense_job_description(job_data.get('job_description', ""))
+
+
+def digest_job_postings(posting_urls):
+    """
+    Ingestion stage: generates and stores digests for the given postings that don't have a current
+    one, all in one concurrent batch. Returns the number of digests stored.
+    """
+    posting_urls = [url for url in posting_urls if url]
+    jobs = []
+    for i in range(0, len(posting_urls), POSTING_URL_LOOKUP_CHUNK):
+        response = supabase.table('job_postings')\
+            .select('id, job_title, company, job_description, digest')\
+            .in_('posting_url', posting_urls[i:i + POSTING_URL_LOOKUP_CHUNK])\
+            .execute()
+        jobs.extend(job for job in (response.data or []) if not _valid_digest(job.get('digest')))
+    if not jobs:
+        return 0
+
+    digests = run_extraction_batch(
+        [_digest_input(job) for job in jobs],
+        JOB_DIGEST_MODEL,
+        system_prompt=JOB_DIGEST_PROMPT,
+        temperature=0,
+        max_tokens=JOB_DIGEST_MAX_TOKENS
+    )
+    stored = 0
+    for job, digest in zip(jobs, digests):
+        digest = _finish_digest(digest)
+        if digest:
+            store_job_digest(job['id'], digest)
+            stored += 1
+    logger.info(f"Stored digests for {stored}/{len(jobs)} job postings.")
+    return stored
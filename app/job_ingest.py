@@ -0,0 +1,147 @@
+# app/job_ingest.py
+
+import re
+from datetime import datetime
+from .extensions import config, logger, supabase
+from .seen_jobs import mark_jobs_seen
+from .near_duplicates import index_jobs
+
+# Rows per upsert request; throughput scales with the batch size rather than round-trip latency
+JOB_INGEST_BATCH_SIZE = config('JOB_INGEST_BATCH_SIZE', default=200, cast=int)
+# Posting URLs per `in` lookup: they travel in the GET query string, which proxies cap at a few KB
+POSTING_URL_LOOKUP_CHUNK = 20
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")  # YYYY-MM-DD format
+
+
+def parse_date_posted(date_posted_str):
+    """ISO date for the extracted "Date Posted" value, or None when it is unknown or malformed."""
+    date_posted_str = date_posted_str or ""
+    if DATE_PATTERN.match(date_posted_str):
+        try:
+            return datetime.strptime(date_posted_str, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            logger.warning(f"Invalid date format: {date_posted_str}. Setting to NULL.")
+    elif "unknown" in date_posted_str.lower():
+        logger.warning("Date Posted is 'unknown'. Setting to NULL.")
+    else:
+        logger.warning(f"Non-compliant Date Posted value: {date_posted_str}. Setting to NULL.")
+    return None
+
+
+def job_posting_from_details(job_details, url):
+    """Maps LLM-extracted job details onto a job_postings record."""
+    return {
+        'job_title': job_details.get("Job Title", "Unknown"),
+        'company': job_details.get("Company", "Unknown"),
+        'location': job_details.get("Location", "Unknown"),
+        'remote': job_details.get("Remote(Yes/No/Hybrid/Unknown)", "Unknown"),
+        'date_posted': parse_date_posted(job_details.get("Date Posted", "")),
+        'job_description': job_details.get("Job Description", "Unknown"),
+        'job_type': job_details.get("Job Type", "Unknown"),
+        'salary_range': job_details.get("Salary Range", "Unknown"),
+        'embedding': job_details.get("Embedding", ""),
+        'posting_url': url
+    }
+
+
+def stored_posting_urls(urls):
+    """The given posting URLs that are already in job_postings."""
+    urls = list(dict.fromkeys(url for url in urls if url))
+    stored = set()
+    for i in range(0, len(urls), POSTING_URL_LOOKUP_CHUNK):
+        response = supabase.table('job_postings').select('posting_url').in_('posting_url', urls[i:i + POSTING_URL_LOOKUP_CHUNK]).execute()
+        stored.update(row['posting_url'] for row in response.data or [])
+    return stored
+
+
+class JobPostingWriter:
+    """
+    Buffers job_postings records and writes them with one upsert per batch, on conflict on
+    posting_url. Existing postings are skipped, or updated when update_existing=True.
+
+    After flush():
+    - ids maps posting_url -> id for every row inserted or updated
+    - inserted_urls lists the postings that are new, in the order they were added
+    - stats counts inserted, updated, skipped (already stored, repeated or without a URL) and failed rows
+    - failed_records holds the records that could not be written, for the caller to retry
+
+    Stored rows are added to the seen-jobs filter and the near-duplicate index.
+    """
+
+    def __init__(self, batch_size=None, update_existing=False):
+        self.batch_size = batch_size or JOB_INGEST_BATCH_SIZE
+        self.update_existing = update_existing
+        self.buffer = []
+        self.buffered_urls = set()
+        self.ids = {}
+        self.inserted_urls = []
+        self.stats = {'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        self.failed_records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add(self, record):
+        url = record.get('posting_url')
+        if not url or url in self.buffered_urls:
+            self.stats['skipped'] += 1
+            return
+        self.buffered_urls.add(url)
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def _upsert(self, rows):
+        return supabase.table('job_postings').upsert(
+            rows,
+            on_conflict='posting_url',
+            ignore_duplicates=not self.update_existing,
+            default_to_null=False
+        ).execute().data or []
+
+    def _write(self, batch):
+        """Writes one batch; returns the rows that are stored afterwards (for the seen-jobs filter)."""
+        urls = [record['posting_url'] for record in batch]
+        existing = stored_posting_urls(urls) if self.update_existing else set()
+        returned = self._upsert(batch)
+
+        # With ignore_duplicates only newly inserted rows come back
+        for row in returned:
+            self.ids[row['posting_url']] = row['id']
+            if row['posting_url'] in existing:
+                self.stats['updated'] += 1
+            else:
+                self.stats['inserted'] += 1
+                self.inserted_urls.append(row['posting_url'])
+        self.stats['skipped'] += len(batch) - len(returned)
+        return batch
+
+    def flush(self):
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return self.ids
+        try:
+            stored = self._write(batch)
+        except Exception as e:
+            # One bad row fails the whole request: write the rows one at a time to isolate it
+            logger.warning(f"Bulk upsert of {len(batch)} job postings failed, writing them one by one: {e}")
+            stored = []
+            for record in batch:
+                try:
+                    stored.extend(self._write([record]))
+                except Exception as row_error:
+                    self.stats['failed'] += 1
+                    self.failed_records.append(record)
+                    logger.error(f"Error saving job {record.get('posting_url')}: {row_error}")
+        mark_jobs_seen(stored)
+        index_jobs(stored)
+        logger.info(f"Wrote {len(batch)} job postings (totals so far: {self.stats})")
+        return self.ids
@@ -6,6 +6,7 @@ from supabase import create_client
 #from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
 from typing import List, Optional, Dict
+from .embeddings import embed_text
 
 load_dotenv()
 supabase_url = os.getenv('SUPABASE_URL')
@@ -18,19 +19,15 @@ supabase = create_client(supabase_url, supabase_key)
 client = AzureOpenAI(
     api_key = os.getenv('AZURE_OPENAI_TEXT_EMBEDDING_KEY'),
     api_version="2024-07-01-preview",
-    azure_endpoint="https://cognibly-jobs-ai-service.openai.azure.com/openai/deployments/text-embedding-3-small/embeddings?api-version=2023-05-15"
+    # Overridable so the record/replay proxies (app/replay.py) can stand in for the service
+    azure_endpoint=os.getenv('JOBMATCHER_EMBEDDING_ENDPOINT', "https://cognibly-jobs-ai-service.openai.azure.com/openai/deployments/text-embedding-3-small/embeddings?api-version=2023-05-15"),
+    max_retries=0  # retried by app/rate_limiter.py
 )
 
 def generate_embedding(text, dimensionality):
     try:
-        response = client.embeddings.create(
-            input=text,
-            model='text-embedding-3-small',
-            dimensions=dimensionality
-        )
-        # The response structure has changed in the new OpenAI API version
-        # We need to access the embedding data differently
-        return response.data[0].embedding
+        # Served from the shared embedding cache when this exact text was embedded before
+        return embed_text(text, dimensionality, client=client, model='text-embedding-3-small')
     except Exception as e:
         print(f"Error generating embedding: {str(e)}")
         raise
@@ -0,0 +1,245 @@
+# app/llm_cache.py
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from openai.types.chat import ChatCompletion
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+from .rate_limiter import limited_chat_completion, alimited_chat_completion
+
+# Chat-completion response cache: an in-process LRU in front of a shared Redis tier.
+LLM_CACHE_ENABLED = config('LLM_CACHE_ENABLED', default=True, cast=bool)
+LLM_CACHE_TTL = config('LLM_CACHE_TTL', default=7 * 86400, cast=int)  # seconds
+LLM_CACHE_MAX_ENTRIES = config('LLM_CACHE_MAX_ENTRIES', default=50000, cast=int)
+LLM_CACHE_LOCAL_MAX_ENTRIES = config('LLM_CACHE_LOCAL_MAX_ENTRIES', default=512, cast=int)
+# Calls at or below this temperature are deterministic enough to cache by default
+LLM_CACHE_MAX_TEMPERATURE = config('LLM_CACHE_MAX_TEMPERATURE', default=0.5, cast=float)
+
+CACHE_PREFIX = 'llmcache:'
+CACHE_INDEX_KEY = 'llmcache:index'  # sorted set of cache keys by last access time
+CACHE_STATS_KEY = 'llmcache:stats'
+
+# Request parameters that change the completion and therefore belong in the key
+KEYED_PARAMS = ('max_tokens', 'response_format', 'top_p', 'stop', 'n')
+# Replies cut short or filtered are returned to the caller but never cached
+UNCACHEABLE_FINISH_REASONS = ('length', 'content_filter')
+
+
+class LocalLRUCache:
+    """Thread-safe, size-bounded in-process LRU cache."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRUCache(LLM_CACHE_LOCAL_MAX_ENTRIES)
+
+
+def cache_key(model, messages, temperature, **params):
+    """Content-addressed key: sha256 over model, every message's role and content, temperature and output-shaping params."""
+    material = json.dumps({
+        'model': model,
+        # Roles are kept so multi-turn conversations with the same text in different turns don't collide
+        'messages': [[m.get('role'), str(m.get('content'))] for m in messages],
+        'temperature': temperature,
+        'params': {name: params[name] for name in KEYED_PARAMS if params.get(name) is not None}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(temperature, cache=None, stream=False):
+    if stream:
+        return False
+    if cache is not None:
+        return cache and LLM_CACHE_ENABLED
+    return LLM_CACHE_ENABLED and temperature is not None and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+
+def usable_response(response, validate=None):
+    """
+    True when every choice holds a complete, non-empty, non-refused reply and, with validate,
+    validate(content) accepts it (returns something other than None/False without raising).
+    """
+    if not response.choices:
+        return False
+    for choice in response.choices:
+        message = choice.message
+        if not message.content or not message.content.strip() or getattr(message, 'refusal', None):
+            return False
+        if choice.finish_reason in UNCACHEABLE_FINISH_REASONS:
+            return False
+        if validate is not None:
+            try:
+                result = validate(message.content)
+                if result is None or result is False:
+                    return False
+            except Exception:
+                return False
+    return True
+
+
+def _record(field, amount=1):
+    try:
+        redis_client.hincrby(CACHE_STATS_KEY, field, amount)
+    except RedisError:
+        pass
+
+
+def _lookup(key, validate=None):
+    payload = local_cache.get(key)
+    tier = 'local'
+    if payload is None:
+        tier = 'redis'
+        try:
+            payload = redis_client.get(CACHE_PREFIX + key)
+            if payload is not None:
+                payload = payload.decode('utf-8')
+                local_cache.set(key, payload)
+                redis_client.zadd(CACHE_INDEX_KEY, {key: time.time()})
+        except RedisError as e:
+            logger.warning(f"LLM cache lookup failed, calling the model directly: {e}")
+            payload = None
+    if payload is None:
+        _record('misses')
+        return None
+
+    try:
+        response = ChatCompletion.model_validate_json(payload)
+    except ValidationError as e:
+        # Corrupt, or written by an incompatible SDK version: drop it and call the model again
+        logger.warning(f"Discarding unreadable LLM cache entry {key[:12]}: {e}")
+        _discard(key)
+        _record('rejected')
+        _record('misses')
+        return None
+    if not usable_response(response, validate):
+        # Stored before replies were checked, or the caller's parser changed: call the model again
+        _record('rejected')
+        _record('misses')
+        return None
+    usage = response.usage
+    _record(f'hits_{tier}')
+    if usage:
+        _record('saved_prompt_tokens', usage.prompt_tokens or 0)
+        _record('saved_completion_tokens', usage.completion_tokens or 0)
+    logger.debug(f"LLM cache {tier} hit for {key[:12]}")
+    return response
+
+
+def _discard(key):
+    local_cache.delete(key)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(CACHE_PREFIX + key)
+        pipe.zrem(CACHE_INDEX_KEY, key)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to discard LLM cache entry {key[:12]}: {e}")
+
+
+def _store(key, response):
+    payload = response.model_dump_json()
+    local_cache.set(key, payload)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.set(CACHE_PREFIX + key, payload, ex=LLM_CACHE_TTL)
+        pipe.zadd(CACHE_INDEX_KEY, {key: time.time()})
+        pipe.zcard(CACHE_INDEX_KEY)
+        size = pipe.execute()[-1]
+        # Size-bounded eviction: drop the least recently used entries beyond the limit
+        overflow = size - LLM_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [member.decode('utf-8') for member, _ in redis_client.zpopmin(CACHE_INDEX_KEY, overflow)]
+            if evicted:
+                redis_client.delete(*[CACHE_PREFIX + k for k in evicted])
+                _record('evictions', len(evicted))
+    except RedisError as e:
+        logger.warning(f"LLM cache store failed: {e}")
+
+
+def cached_chat_completion(client, model, messages, temperature=None, cache=None, validate=None, **params):
+    """
+    Drop-in replacement for client.chat.completions.create() that serves repeated prompts from cache.
+
+    :param cache: Force caching on (True) or off (False). By default only calls with
+                  temperature <= LLM_CACHE_MAX_TEMPERATURE are cached.
+    :param validate: Optional validate(content), e.g. the caller's parser. A reply is only cached
+                     (and a cached reply only served) when it returns something other than None/False.
+    """
+    request = dict(params, temperature=temperature) if temperature is not None else params
+    if not is_cacheable(temperature, cache, params.get('stream')):
+        return limited_chat_completion(client, model, messages, **request)
+
+    key = cache_key(model, messages, temperature, **params)
+    response = _lookup(key, validate)
+    if response is None:
+        response = limited_chat_completion(client, model, messages, **request)
+        if usable_response(response, validate):
+            _store(key, response)
+    return response
+
+
+async def acached_chat_completion(client, model, messages, temperature=None, cache=None, validate=None, **params):
+    """
+    Async counterpart of cached_chat_completion() for AsyncOpenAI/AsyncAzureOpenAI clients.
+    The Redis tier is reached from a worker thread so the event loop never blocks on it.
+    """
+    request = dict(params, temperature=temperature) if temperature is not None else params
+    if not is_cacheable(temperature, cache, params.get('stream')):
+        return await alimited_chat_completion(client, model, messages, **request)
+
+    key = cache_key(model, messages, temperature, **params)
+    response = await asyncio.to_thread(_lookup, key, validate)
+    if response is None:
+        response = await alimited_chat_completion(client, model, messages, **request)
+        if usable_response(response, validate):
+            await asyncio.to_thread(_store, key, response)
+    return response
+
+
+def get_llm_cache_stats():
+    """Returns cumulative hit/miss counts, hit rate and tokens saved across all processes."""
+    try:
+        raw = redis_client.hgetall(CACHE_STATS_KEY)
+        entries = redis_client.zcard(CACHE_INDEX_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read LLM cache stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    hits = stats.get('hits_local', 0) + stats.get('hits_redis', 0)
+    lookups = hits + stats.get('misses', 0)
+    stats['hits'] = hits
+    stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+    stats['entries'] = entries
+    return stats
@@ -0,0 +1,145 @@
+# app/llm_extraction.py
+
+import asyncio
+import json
+import time
+from typing import Callable, List, Optional
+import openai
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+from .extensions import config, logger, api_key, azure_endpoint
+from .llm_cache import acached_chat_completion
+
+# Bounded parallelism for the extraction stage. Throughput scales with
+# LLM_EXTRACTION_CONCURRENCY instead of the number of Celery workers.
+LLM_EXTRACTION_CONCURRENCY = config('LLM_EXTRACTION_CONCURRENCY', default=8, cast=int)
+LLM_EXTRACTION_TIMEOUT = config('LLM_EXTRACTION_TIMEOUT', default=60.0, cast=float)
+LLM_EXTRACTION_MAX_TOKENS = config('LLM_EXTRACTION_MAX_TOKENS', default=4096, cast=int)
+# Point the engine at a local fake chat-completions server (tests, benchmarks).
+LLM_EXTRACTION_BASE_URL = config('LLM_EXTRACTION_BASE_URL', default='')
+
+JOB_DETAILS_SYSTEM_PROMPT = """
+    The user will upload text extracted from a job posting webpage. Based on the text content detail, return a JSON output with values for the following fields:
+    "Job Title","Company","Location","Remote(Yes/No/Hybrid/Unknown)","Date Posted","Job Description","Job Type","Salary Range".
+    If you cannot determine the value for a field, use the value "Unknown".
+
+    Example output:
+    {
+        "Job Title": "Director, Enterprise Applications",
+        "Company": "Lone Star College System",
+        "Location":"The Woodlands, TX",
+        "Remote(Yes/No/Hybrid/Unknown)":"No",
+        "Date Posted":"7/26/2024",
+        "Job Description":"The Director, Enterprise Applications is an integral part...",
+        "Job Type":"Full-time",
+        "Salary Range":"$114,241 - $131,377"
+    }
+    """
+
+JOB_POST_URLS_SYSTEM_PROMPT = """
+    Your task is to return a JSON array of strings representing links to job listings from the provided content.
+    If the provided href URLs are relative, reconstruct the absolute URL based on the job board's base URL.
+    Include only links that are actually for job posts. These typically have job titles as anchor text.
+    Exclude unrelated links such as navigation to other parts of the website.
+
+    Output format: Must be a valid JSON array of strings.  Do not include any markdown or backticks.
+    ["url1", "url2", "url3"]
+    """
+
+
+def parse_llm_json(content):
+    """Strips markdown fences from an LLM reply and decodes it as JSON. Returns None if it is not valid JSON."""
+    if not content:
+        return None
+    cleaned = content.strip().replace("```json", "").replace("```", "").strip()
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid JSON output from LLM: {e}. Content: {cleaned[:200]}")
+        return None
+
+
+def make_async_llm_client(base_url=None):
+    """
+    Builds the async chat-completions client used by the extraction engine.
+
+    :param base_url: Optional OpenAI-compatible base URL (e.g. a local fake server). Falls back to
+                     LLM_EXTRACTION_BASE_URL, then to the Azure OpenAI cover letter deployment.
+    """
+    base_url = base_url or LLM_EXTRACTION_BASE_URL
+    if base_url:
+        return AsyncOpenAI(base_url=base_url, api_key=api_key or 'local', max_retries=0)
+    return AsyncAzureOpenAI(
+        api_key=api_key,
+        azure_endpoint=azure_endpoint,
+        api_version="2024-05-01-preview",
+        max_retries=0
+    )
+
+
+async def _complete_one(client, semaphore, index, user_content, model, system_prompt, temperature, max_tokens, timeout, parse):
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            # The timeout is the client's per-request one, so it covers the HTTP call only and not
+            # the wait for the shared RPM/TPM buckets (which is bounded by RATE_LIMIT_MAX_WAIT)
+            response = await acached_chat_completion(
+                client,
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=1,
+                validate=parse,
+                timeout=timeout
+            )
+        except openai.APITimeoutError:
+            logger.error(f"LLM extraction item {index} timed out after {timeout}s")
+            return None
+        except Exception as e:
+            logger.error(f"LLM extraction item {index} failed: {e}")
+            return None
+        logger.debug(f"LLM extraction item {index} completed in {time.monotonic() - started:.2f}s")
+    return parse(response.choices[0].message.content)
+
+
+async def extract_batch(inputs: List[str], model: str, system_prompt: str = JOB_DETAILS_SYSTEM_PROMPT,
+                        temperature: float = 0.33, max_tokens: int = None, concurrency: int = None,
+                        timeout: float = None, parse: Callable = parse_llm_json, client=None) -> List[Optional[object]]:
+    """
+    Sends every input to the chat model concurrently, keeping at most `concurrency` requests in flight.
+
+    Results are returned in input order. Empty inputs, timeouts, API errors and unparseable replies
+    yield None in their slot so one bad page never fails the batch.
+    """
+    concurrency = concurrency or LLM_EXTRACTION_CONCURRENCY
+    timeout = timeout or LLM_EXTRACTION_TIMEOUT
+    max_tokens = max_tokens or LLM_EXTRACTION_MAX_TOKENS
+    owns_client = client is None
+    client = client or make_async_llm_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def skip():
+        return None
+
+    started = time.monotonic()
+    try:
+        results = await asyncio.gather(*[
+            _complete_one(client, semaphore, i, text, model, system_prompt, temperature, max_tokens, timeout, parse)
+            if isinstance(text, str) and text.strip() else skip()
+            for i, text in enumerate(inputs)
+        ])
+    finally:
+        if owns_client:
+            await client.close()
+
+    succeeded = sum(1 for result in results if result is not None)
+    logger.info(f"LLM extraction batch: {succeeded}/{len(inputs)} succeeded in {time.monotonic() - started:.2f}s (concurrency={concurrency})")
+    return results
+
+
+def run_extraction_batch(inputs: List[str], model: str, **kwargs) -> List[Optional[object]]:
+    """Synchronous entry point so a single Celery task can drive a whole batch."""
+    return asyncio.run(extract_batch(inputs, model, **kwargs))
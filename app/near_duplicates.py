@@ -0,0 +1,247 @@
+# app/near_duplicates.py
+
+import hashlib
+import re
+import time
+import uuid
+import zlib
+import numpy as np
+from redis.exceptions import RedisError
+from .extensions import config, logger, supabase, redis_client
+from .company_metadata import normalize_company_name
+from .seen_jobs import normalize_posting_url
+
+# MinHash signatures over word shingles of the normalised description, indexed with LSH banding in
+# Redis so every worker sees the same index. Band buckets are scoped to company|location: the same
+# description posted for another city is a different job (as in remove_duplicate_jobs).
+NEAR_DUPLICATE_THRESHOLD = config('NEAR_DUPLICATE_THRESHOLD', default=0.8, cast=float)  # estimated Jaccard
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 5  # words
+REBUILD_PAGE_SIZE = 500
+
+# The index lives under a generation (neardup:<generation>:signatures and neardup:<generation>:band:*).
+# A rebuild fills a new generation while ingestion keeps checking the live one, then switches
+# GENERATION_KEY over and drops the old keys.
+GENERATION_KEY = 'neardup:generation'
+REBUILDING_KEY = 'neardup:rebuilding'  # generation being built; index_jobs writes to it as well
+REBUILD_LOCK_KEY = 'neardup:rebuild_lock'
+REBUILD_LOCK_TTL = 3 * 3600  # seconds; longer than any rebuild
+NEAR_DUPLICATE_STATS_KEY = 'neardup:stats'
+
+_MERSENNE_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_random = np.random.RandomState(1)  # fixed seed: signatures must match across processes and restarts
+_PERM_A = _random.randint(1, 2**32 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _random.randint(0, 2**32 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _normalize_text(text):
+    return re.sub(r"[^\w\s]", " ", str(text or '').lower()).split()
+
+
+def minhash_signature(text):
+    """MinHash signature (uint32 array) of the text's word shingles. None for empty text."""
+    words = _normalize_text(text)
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p stays below 2**64 for 32-bit a, b and x
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimated_jaccard(signature, other):
+    return float(np.mean(signature == other))
+
+
+def _signatures_key(generation):
+    return f"neardup:{generation}:signatures"
+
+
+def _band_prefix(generation):
+    return f"neardup:{generation}:band:"
+
+
+def _live_generation():
+    generation = redis_client.get(GENERATION_KEY)
+    return generation.decode('utf-8') if generation else None
+
+
+def _band_keys(signature, company, location, generation):
+    scope = f"{normalize_company_name(company)}|{' '.join(_normalize_text(location))}"
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        digest = hashlib.blake2b(scope.encode('utf-8') + rows, digest_size=8).hexdigest()
+        keys.append(f"{_band_prefix(generation)}{band}:{digest}")
+    return keys
+
+
+def _candidates(band_keys):
+    pipe = redis_client.pipeline(transaction=False)
+    for key in band_keys:
+        pipe.smembers(key)
+    members = set()
+    for result in pipe.execute():
+        members.update(result)
+    return members
+
+
+def _record(checked, duplicates):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(NEAR_DUPLICATE_STATS_KEY, 'checked', checked)
+        pipe.hincrby(NEAR_DUPLICATE_STATS_KEY, 'duplicates', duplicates)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def filter_near_duplicates(jobs, url=lambda job: job.get('posting_url'), text=lambda job: job.get('job_description'),
+                           company=lambda job: job.get('company'), location=lambda job: job.get('location')):
+    """
+    Drops jobs whose description is a near duplicate (estimated Jaccard >= NEAR_DUPLICATE_THRESHOLD)
+    of a stored job, or of an earlier job in the list, at the same company and location.
+    The accessors read the fields from each job (defaults: job_postings columns).
+    """
+    kept, batch = [], []  # batch: (band keys, signature) of the jobs kept so far
+    duplicates = 0
+    try:
+        generation = _live_generation()
+    except RedisError as e:
+        logger.warning(f"Near-duplicate index unavailable, checking within the batch only: {e}")
+        generation = None
+    for job in jobs:
+        signature = minhash_signature(text(job))
+        if signature is None:
+            kept.append(job)
+            continue
+        band_keys = _band_keys(signature, company(job), location(job), generation)
+
+        duplicate_of = None
+        for other_keys, other_signature in batch:
+            if set(band_keys) & set(other_keys) and estimated_jaccard(signature, other_signature) >= NEAR_DUPLICATE_THRESHOLD:
+                duplicate_of = 'an earlier job in this batch'
+                break
+        if duplicate_of is None and generation:
+            try:
+                candidates = [member for member in _candidates(band_keys) if member.decode('utf-8') != normalize_posting_url(url(job))]
+                stored = redis_client.hmget(_signatures_key(generation), candidates) if candidates else []
+            except RedisError as e:
+                logger.warning(f"Near-duplicate index unavailable, keeping {url(job)}: {e}")
+                candidates, stored = [], []
+            for candidate, candidate_signature in zip(candidates, stored):
+                if candidate_signature and estimated_jaccard(signature, np.frombuffer(candidate_signature, dtype=np.uint32)) >= NEAR_DUPLICATE_THRESHOLD:
+                    duplicate_of = candidate.decode('utf-8')
+                    break
+
+        if duplicate_of:
+            duplicates += 1
+            logger.info(f"Skipping {url(job)}: near duplicate of {duplicate_of}")
+            continue
+        batch.append((band_keys, signature))
+        kept.append(job)
+    _record(len(jobs), duplicates)
+    return kept
+
+
+def index_jobs(jobs, url=lambda job: job.get('posting_url'), text=lambda job: job.get('job_description'),
+               company=lambda job: job.get('company'), location=lambda job: job.get('location'), generations=None):
+    """
+    Adds stored jobs to the near-duplicate index. Call after they are written.
+    By default they go into the live generation and the one being rebuilt, if any.
+    """
+    try:
+        if generations is None:
+            generations = [generation.decode('utf-8') for generation in redis_client.mget(GENERATION_KEY, REBUILDING_KEY) if generation]
+        if not generations:
+            # Never built: the next scheduler tick rebuilds from job_postings, these jobs included
+            return
+        pipe = redis_client.pipeline(transaction=False)
+        for job in jobs:
+            signature = minhash_signature(text(job))
+            job_key = normalize_posting_url(url(job))
+            if signature is None or not job_key:
+                continue
+            for generation in generations:
+                pipe.hset(_signatures_key(generation), job_key, signature.tobytes())
+                for band_key in _band_keys(signature, company(job), location(job), generation):
+                    pipe.sadd(band_key, job_key)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to index {len(jobs)} jobs for near-duplicate detection: {e}")
+
+
+def near_duplicate_index_ready():
+    try:
+        generation = _live_generation()
+        return bool(generation and redis_client.exists(_signatures_key(generation)))
+    except RedisError:
+        return True
+
+
+def _delete_generation(generation):
+    for key in redis_client.scan_iter(match=f"neardup:{generation}:*", count=1000):
+        redis_client.delete(key)
+
+
+def rebuild_near_duplicate_index():
+    """
+    Rebuilds the index from job_postings, dropping postings deleted since it was built. Ingestion keeps
+    using the current index until the new one is complete. Returns the number of jobs indexed, or None
+    when another rebuild is already running.
+    """
+    lock = uuid.uuid4().hex
+    if not redis_client.set(REBUILD_LOCK_KEY, lock, nx=True, ex=REBUILD_LOCK_TTL):
+        logger.info("A near-duplicate index rebuild is already running.")
+        return None
+
+    generation = str(time.time_ns())
+    try:
+        redis_client.set(REBUILDING_KEY, generation, ex=REBUILD_LOCK_TTL)
+        total, offset = 0, 0
+        while True:
+            rows = supabase.table('job_postings')\
+                .select('id, posting_url, company, location, job_description')\
+                .order('id')\
+                .range(offset, offset + REBUILD_PAGE_SIZE - 1)\
+                .execute().data or []
+            if not rows:
+                break
+            index_jobs(rows, generations=[generation])
+            total += len(rows)
+            offset += REBUILD_PAGE_SIZE
+            if len(rows) < REBUILD_PAGE_SIZE:
+                break
+
+        previous = _live_generation()
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.set(GENERATION_KEY, generation)
+        pipe.delete(REBUILDING_KEY)
+        pipe.execute()
+        if previous:
+            _delete_generation(previous)
+    except Exception:
+        redis_client.delete(REBUILDING_KEY)
+        _delete_generation(generation)
+        raise
+    finally:
+        if redis_client.get(REBUILD_LOCK_KEY) == lock.encode('utf-8'):
+            redis_client.delete(REBUILD_LOCK_KEY)
+    logger.info(f"Rebuilt the near-duplicate index from {total} job postings.")
+    return total
+
+
+def get_near_duplicate_stats():
+    """Returns jobs checked and near duplicates skipped at ingestion, and the number of indexed jobs."""
+    try:
+        raw = redis_client.hgetall(NEAR_DUPLICATE_STATS_KEY)
+        stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+        generation = _live_generation()
+        stats['indexed'] = redis_client.hlen(_signatures_key(generation)) if generation else 0
+    except RedisError as e:
+        logger.warning(f"Unable to read near-duplicate stats: {e}")
+        return {}
+    return stats
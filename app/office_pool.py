@@ -0,0 +1,304 @@
+# app/office_pool.py
+
+import atexit
+import os
+import shlex
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import queue
+from collections import deque
+from celery.signals import worker_process_shutdown, worker_shutdown
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+
+try:
+    from unoserver.client import UnoClient
+except ImportError:  # unoserver not installed: every conversion uses a cold soffice process
+    UnoClient = None
+
+# Warm headless office instances kept per worker process (documents_queue workers run one task at a time per child)
+OFFICE_POOL_ENABLED = config('OFFICE_POOL_ENABLED', default=True, cast=bool)
+OFFICE_POOL_SIZE = config('OFFICE_POOL_SIZE', default=1, cast=int)
+# Command that starts one unoserver; it must run under a Python that can import `uno` (python3-uno)
+OFFICE_POOL_SERVER_COMMAND = config('OFFICE_POOL_SERVER_COMMAND', default='unoserver')
+OFFICE_POOL_PROFILE_ROOT = config('OFFICE_POOL_PROFILE_ROOT', default='/tmp/office-pool')
+OFFICE_POOL_STARTUP_TIMEOUT = config('OFFICE_POOL_STARTUP_TIMEOUT', default=45.0, cast=float)  # seconds
+OFFICE_CONVERSION_TIMEOUT = config('OFFICE_CONVERSION_TIMEOUT', default=60.0, cast=float)  # seconds
+OFFICE_POOL_QUEUE_TIMEOUT = config('OFFICE_POOL_QUEUE_TIMEOUT', default=120.0, cast=float)  # seconds
+LIBREOFFICE_BINARY = config('LIBREOFFICE_BINARY', default='libreoffice')
+
+# After a failed pool start, conversions go straight to the cold path for this long
+OFFICE_POOL_RETRY_AFTER = 300  # seconds
+
+OFFICE_POOL_STATS_KEY = 'officepool:stats'
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _port_open(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _record_stats(**counters):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for field, amount in counters.items():
+            if isinstance(amount, float):
+                pipe.hincrbyfloat(OFFICE_POOL_STATS_KEY, field, amount)
+            else:
+                pipe.hincrby(OFFICE_POOL_STATS_KEY, field, amount)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def _run_with_timeout(func, timeout, *args):
+    """Runs func on a daemon thread so a hung conversion cannot block the caller (or a later conversion) past `timeout`."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func(*args)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True, name='office-convert')
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"Conversion did not finish within {timeout}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+
+class OfficeInstance:
+    """One unoserver (and the soffice it drives) with its own user profile directory."""
+
+    def __init__(self, index):
+        self.index = index
+        self.profile_dir = os.path.join(OFFICE_POOL_PROFILE_ROOT, f"{os.getpid()}-{index}")
+        self.process = None
+        self.port = None
+        self.uno_port = None
+        self.conversions = 0
+
+    def start(self):
+        self.port, self.uno_port = _free_port(), _free_port()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        command = shlex.split(OFFICE_POOL_SERVER_COMMAND) + [
+            '--interface', '127.0.0.1',
+            '--port', str(self.port),
+            '--uno-port', str(self.uno_port),
+            '--user-installation', f"file://{self.profile_dir}",
+        ]
+        started = time.monotonic()
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        while time.monotonic() - started < OFFICE_POOL_STARTUP_TIMEOUT:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Office instance {self.index} exited during startup (code {self.process.returncode})")
+            if _port_open(self.port):
+                logger.info(f"Office instance {self.index} ready on port {self.port} in {time.monotonic() - started:.1f}s")
+                return
+            time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"Office instance {self.index} did not start within {OFFICE_POOL_STARTUP_TIMEOUT}s")
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            # unoserver and soffice share the session started above
+            os.killpg(self.process.pid, 15)
+            self.process.wait(timeout=10)
+        except (ProcessLookupError, subprocess.TimeoutExpired, PermissionError):
+            try:
+                os.killpg(self.process.pid, 9)
+            except ProcessLookupError:
+                pass
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+        _record_stats(restarts=1)
+
+    def convert(self, docx_path, pdf_path):
+        UnoClient(server='127.0.0.1', port=str(self.port), host_location='local').convert(
+            inpath=docx_path, outpath=pdf_path, convert_to='pdf'
+        )
+        self.conversions += 1
+
+
+class OfficePool:
+    """
+    A small pool of warm office instances. Conversions wait in a queue for a free instance,
+    are bounded by OFFICE_CONVERSION_TIMEOUT, and an instance that crashes or hangs is restarted.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.instances = []
+        self.idle = queue.Queue()
+        self.latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._started = False
+        self._unavailable_until = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            if time.monotonic() < self._unavailable_until:
+                raise RuntimeError("Office pool failed to start recently")
+            try:
+                for index in range(self.size):
+                    instance = OfficeInstance(index)
+                    self.instances.append(instance)
+                    instance.start()
+            except Exception:
+                self.shutdown()
+                self.instances = []
+                self._unavailable_until = time.monotonic() + OFFICE_POOL_RETRY_AFTER
+                raise
+            for instance in self.instances:
+                self.idle.put(instance)
+            self._started = True
+            atexit.register(self.shutdown)
+
+    def shutdown(self):
+        for instance in self.instances:
+            instance.stop()
+
+    def convert(self, docx_path, pdf_path, timeout=None):
+        self.start()
+        queued = time.monotonic()
+        instance = self.idle.get(timeout=OFFICE_POOL_QUEUE_TIMEOUT)
+        started = time.monotonic()
+        try:
+            if not instance.is_alive():
+                logger.warning(f"Office instance {instance.index} is not running, restarting it")
+                instance.restart()
+            try:
+                _run_with_timeout(instance.convert, timeout or OFFICE_CONVERSION_TIMEOUT, docx_path, pdf_path)
+            except TimeoutError:
+                logger.error(f"Conversion of {docx_path} timed out on office instance {instance.index}, restarting it")
+                _record_stats(timeouts=1)
+                instance.restart()
+                raise
+            except Exception:
+                if not instance.is_alive():
+                    instance.restart()
+                raise
+        finally:
+            self.idle.put(instance)
+
+        elapsed = time.monotonic() - started
+        self.latencies.append(elapsed)
+        _record_stats(conversions=1, conversion_seconds=float(elapsed), queue_seconds=float(started - queued))
+        return elapsed
+
+    def local_stats(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'size': self.size}
+        return {
+            'size': self.size,
+            'p50_seconds': round(latencies[len(latencies) // 2], 3),
+            'p95_seconds': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            'busy': self.size - self.idle.qsize()
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_office_pool():
+    """Returns this process's pool, or None when pooling is disabled or unavailable."""
+    global _pool
+    if not OFFICE_POOL_ENABLED or UnoClient is None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficePool(OFFICE_POOL_SIZE)
+        return _pool
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_office_pool(**kwargs):
+    """
+    Stops this process's office instances when its Celery worker exits. Prefork children leave
+    through os._exit, which skips atexit, so without this every recycle orphans their process groups.
+    """
+    if _pool is not None:
+        _pool.shutdown()
+
+
+def convert_docx_to_pdf_cold(docx_path, pdf_path, timeout=None):
+    """One-off soffice conversion, with a per-process profile so concurrent conversions do not collide."""
+    profile_dir = os.path.join(OFFICE_POOL_PROFILE_ROOT, f"cold-{os.getpid()}")
+    libreoffice_command = [
+        LIBREOFFICE_BINARY,
+        f"-env:UserInstallation=file://{profile_dir}",
+        '--headless',
+        '--convert-to', 'pdf',
+        '--outdir', os.path.dirname(pdf_path),
+        docx_path
+    ]
+    subprocess.run(libreoffice_command, check=True, timeout=timeout or OFFICE_CONVERSION_TIMEOUT)
+    # soffice names the output after the input file
+    produced = os.path.join(os.path.dirname(pdf_path), os.path.splitext(os.path.basename(docx_path))[0] + '.pdf')
+    if produced != pdf_path:
+        shutil.move(produced, pdf_path)
+
+
+def convert_docx_to_pdf(docx_path, pdf_path, timeout=None):
+    """Converts a DOCX file to PDF on a warm office instance, falling back to a cold soffice process."""
+    pool = get_office_pool()
+    if pool is not None:
+        try:
+            elapsed = pool.convert(docx_path, pdf_path, timeout=timeout)
+            logger.info(f"PDF saved at {pdf_path} in {elapsed:.2f}s (office pool)")
+            return
+        except Exception as e:
+            logger.warning(f"Office pool conversion failed for {docx_path}, using a cold soffice process: {e}")
+            _record_stats(failures=1)
+
+    started = time.monotonic()
+    convert_docx_to_pdf_cold(docx_path, pdf_path, timeout=timeout)
+    _record_stats(cold_conversions=1, cold_conversion_seconds=float(time.monotonic() - started))
+    logger.info(f"PDF saved at {pdf_path} in {time.monotonic() - started:.2f}s (cold soffice)")
+
+
+def get_office_pool_stats():
+    """Returns conversion counts, average latency/queue wait across workers and this process's percentiles."""
+    try:
+        raw = redis_client.hgetall(OFFICE_POOL_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read office pool stats: {e}")
+        raw = {}
+    stats = {k.decode('utf-8'): float(v) for k, v in raw.items()}
+    if stats.get('conversions'):
+        stats['avg_conversion_seconds'] = round(stats['conversion_seconds'] / stats['conversions'], 3)
+        stats['avg_queue_seconds'] = round(stats.get('queue_seconds', 0) / stats['conversions'], 3)
+    if stats.get('cold_conversions'):
+        stats['avg_cold_conversion_seconds'] = round(stats['cold_conversion_seconds'] / stats['cold_conversions'], 3)
+    if _pool is not None:
+        stats['local'] = _pool.local_stats()
+    return stats
@@ -0,0 +1,103 @@
+# app/page_text.py
+
+import re
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+from .token_utils import estimate_tokens, truncate_lines_to_budget
+
+# Maximum estimated input tokens of page text sent to the extraction model
+PAGE_TEXT_TOKEN_BUDGET = config('PAGE_TEXT_TOKEN_BUDGET', default=3000, cast=int)
+# Lines kept above the first job section marker (title, company, location usually sit there)
+PAGE_TEXT_LEAD_LINES = config('PAGE_TEXT_LEAD_LINES', default=12, cast=int)
+
+PAGE_TEXT_STATS_KEY = 'pagetext:stats'
+
+# Short lines matching these are navigation, cookie banners, footers and other site chrome
+BOILERPLATE_PATTERN = re.compile(
+    r"(cookie|privacy (policy|notice|settings)|terms (of|and) (use|service|conditions)|all rights reserved|©|copyright"
+    r"|^(sign|log) ?(in|up|out)$|create (an )?account|forgot password|subscribe|newsletter|follow us"
+    r"|skip to (main )?content|accept( all)?( cookies)?$|reject all|manage preferences|back to (top|search|jobs)"
+    r"|share (this )?(job|posting)|similar jobs|recommended jobs|jobs you may like|download (our|the) app"
+    r"|^(home|menu|search|careers|about us|contact( us)?|help|faq|blog|sitemap|english|language)$)",
+    re.IGNORECASE
+)
+BOILERPLATE_MAX_WORDS = 14
+
+# Markers of the job-relevant region of a posting
+JOB_SECTION_PATTERN = re.compile(
+    r"(job description|about (the|this) (role|job|position|opportunity)|responsibilities|qualifications|requirements"
+    r"|what you('ll| will) (do|bring)|who you are|about you|duties|skills|experience|benefits|salary|compensation"
+    r"|pay range|job type|employment type|apply (now|for this))",
+    re.IGNORECASE
+)
+
+
+def _is_boilerplate(line):
+    return len(line.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE_PATTERN.search(line) is not None
+
+
+def _record_stats(stats):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(PAGE_TEXT_STATS_KEY, 'pages', 1)
+        pipe.hincrby(PAGE_TEXT_STATS_KEY, 'tokens_in', stats['tokens_in'])
+        pipe.hincrby(PAGE_TEXT_STATS_KEY, 'tokens_out', stats['tokens_out'])
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def preprocess_page_text(page_text, token_budget=None):
+    """
+    Shrinks scraped page text to the part worth sending to the extraction model.
+
+    Strips navigation/cookie/footer lines, drops repeated blocks (responsive layouts often render
+    the same content twice), keeps the region around the job sections and enforces a token budget.
+
+    :return: (cleaned_text, stats) where stats holds tokens_in, tokens_out and tokens_saved.
+    """
+    token_budget = token_budget or PAGE_TEXT_TOKEN_BUDGET
+    tokens_in = estimate_tokens(page_text)
+
+    seen = set()
+    lines = []
+    for raw_line in page_text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line or _is_boilerplate(line):
+            continue
+        fingerprint = line.lower()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        lines.append(line)
+
+    markers = [i for i, line in enumerate(lines) if JOB_SECTION_PATTERN.search(line)]
+    if markers:
+        lines = lines[max(0, markers[0] - PAGE_TEXT_LEAD_LINES):]
+
+    lines = truncate_lines_to_budget(lines, token_budget)
+    cleaned = "\n".join(lines)
+    tokens_out = estimate_tokens(cleaned)
+
+    stats = {
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'tokens_saved': tokens_in - tokens_out
+    }
+    _record_stats(stats)
+    logger.info(f"Page text preprocessing: {tokens_in} -> {tokens_out} estimated tokens ({stats['tokens_saved']} saved)")
+    return cleaned, stats
+
+
+def get_page_text_stats():
+    """Returns cumulative pages processed and estimated tokens in/out/saved."""
+    try:
+        raw = redis_client.hgetall(PAGE_TEXT_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read page text stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    stats['tokens_saved'] = stats.get('tokens_in', 0) - stats.get('tokens_out', 0)
+    if stats.get('pages'):
+        stats['avg_tokens_saved_per_page'] = round(stats['tokens_saved'] / stats['pages'], 1)
+    return stats
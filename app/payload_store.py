@@ -0,0 +1,177 @@
+# app/payload_store.py
+
+import json
+import os
+import time
+import uuid
+import zlib
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+
+# Large intermediate values (page texts, embeddings) are kept here under short-lived keys and tasks
+# pass a small reference instead, so broker messages and result-backend entries stay a few hundred
+# bytes however large the pages are. Values below the inline limit travel as they are.
+PAYLOAD_STORE_BACKEND = config('PAYLOAD_STORE_BACKEND', default='redis')  # 'redis' or 'disk'
+PAYLOAD_STORE_DIR = config('PAYLOAD_STORE_DIR', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'payload_store'))
+PAYLOAD_TTL = config('PAYLOAD_TTL', default=6 * 3600, cast=int)  # seconds; longer than any retry chain
+PAYLOAD_INLINE_MAX_BYTES = config('PAYLOAD_INLINE_MAX_BYTES', default=1024, cast=int)
+
+PAYLOAD_PREFIX = 'payload:'
+PAYLOAD_STATS_KEY = 'payload:stats'
+REF_FIELD = 'payload_ref'
+
+
+def _record(counts):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for field, amount in counts.items():
+            if amount:
+                pipe.hincrby(PAYLOAD_STATS_KEY, field, amount)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def _encode(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), 1)
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def _disk_path(key):
+    return os.path.join(PAYLOAD_STORE_DIR, key.replace(':', '_'))
+
+
+def is_payload_ref(value):
+    return isinstance(value, dict) and REF_FIELD in value and len(value) <= 2
+
+
+def put_payloads(values):
+    """
+    Stores each JSON-serialisable value and returns what a task should pass instead: a reference
+    ({'payload_ref': key, 'size': bytes}) for large values, the value itself for small ones or when
+    the store is unavailable.
+    """
+    results, blobs = [], {}
+    for value in values:
+        blob = _encode(value)
+        if len(blob) < PAYLOAD_INLINE_MAX_BYTES:
+            results.append(value)
+            continue
+        key = f"{PAYLOAD_PREFIX}{uuid.uuid4().hex}"
+        blobs[key] = blob
+        results.append({REF_FIELD: key, 'size': len(blob)})
+    if not blobs:
+        _record({'inline': len(results)})
+        return results
+    try:
+        if PAYLOAD_STORE_BACKEND == 'disk':
+            os.makedirs(PAYLOAD_STORE_DIR, exist_ok=True)
+            for key, blob in blobs.items():
+                with open(_disk_path(key), 'wb') as f:
+                    f.write(blob)
+        else:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, blob in blobs.items():
+                pipe.set(key, blob, ex=PAYLOAD_TTL)
+            pipe.execute()
+    except (RedisError, OSError) as e:
+        logger.warning(f"Payload store unavailable, passing {len(blobs)} payloads inline: {e}")
+        return list(values)
+    _record({'stored': len(blobs), 'stored_bytes': sum(len(blob) for blob in blobs.values()), 'inline': len(results) - len(blobs)})
+    return results
+
+
+def put_payload(value):
+    return put_payloads([value])[0]
+
+
+def get_payloads(values):
+    """
+    Resolves references made by put_payloads (other values are returned as they are).
+    Raises KeyError for a reference that expired or was dropped.
+    """
+    keys = [value[REF_FIELD] for value in values if is_payload_ref(value)]
+    if not keys:
+        return list(values)
+    if PAYLOAD_STORE_BACKEND == 'disk':
+        blobs = []
+        for key in keys:
+            try:
+                with open(_disk_path(key), 'rb') as f:
+                    blobs.append(f.read())
+            except FileNotFoundError:
+                blobs.append(None)
+    else:
+        blobs = redis_client.mget(keys)
+
+    missing = [key for key, blob in zip(keys, blobs) if blob is None]
+    _record({'fetched': len(keys) - len(missing), 'missing': len(missing)})
+    if missing:
+        raise KeyError(f"Payloads expired or dropped: {missing}")
+    loaded = {key: _decode(blob) for key, blob in zip(keys, blobs)}
+    return [loaded[value[REF_FIELD]] if is_payload_ref(value) else value for value in values]
+
+
+def get_payload(value, fallback=None):
+    """
+    Resolves one value. With fallback, a reference that expired or was dropped returns fallback()
+    instead of raising KeyError, e.g. to reload the value from the table it was stored in.
+    """
+    try:
+        return get_payloads([value])[0]
+    except KeyError as e:
+        if fallback is None:
+            raise
+        logger.warning(f"{e}; reloading the value")
+        _record({'reloaded': 1})
+        return fallback()
+
+
+def drop_payloads(values):
+    """Deletes the referenced payloads once the consuming task has succeeded (a retry still needs them)."""
+    keys = [value[REF_FIELD] for value in values if is_payload_ref(value)]
+    if not keys:
+        return
+    try:
+        if PAYLOAD_STORE_BACKEND == 'disk':
+            for key in keys:
+                try:
+                    os.remove(_disk_path(key))
+                except FileNotFoundError:
+                    pass
+        else:
+            redis_client.delete(*keys)
+    except (RedisError, OSError) as e:
+        logger.warning(f"Unable to drop {len(keys)} payloads, they expire on their own: {e}")
+
+
+def cleanup_payload_store(max_age=None):
+    """Removes disk payloads older than the TTL (Redis expires its own). Returns the number removed."""
+    if PAYLOAD_STORE_BACKEND != 'disk' or not os.path.isdir(PAYLOAD_STORE_DIR):
+        return 0
+    cutoff = time.time() - (max_age or PAYLOAD_TTL)
+    removed = 0
+    for name in os.listdir(PAYLOAD_STORE_DIR):
+        path = os.path.join(PAYLOAD_STORE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        logger.info(f"Removed {removed} expired payloads from {PAYLOAD_STORE_DIR}")
+    return removed
+
+
+def get_payload_store_stats():
+    """Payloads stored by reference vs passed inline, bytes kept off the broker, and references that had expired."""
+    try:
+        raw = redis_client.hgetall(PAYLOAD_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read payload store stats: {e}")
+        return {}
+    return {k.decode('utf-8'): int(v) for k, v in raw.items()}
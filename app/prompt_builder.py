@@ -0,0 +1,154 @@
+# app/prompt_builder.py
+
+import re
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+from .token_utils import estimate_tokens, truncate_lines_to_budget
+
+# Maximum estimated input tokens (system + user message) for one document generation call
+PROMPT_INPUT_TOKEN_BUDGET = config('PROMPT_INPUT_TOKEN_BUDGET', default=2000, cast=int)
+# The job description is condensed once per document to this many tokens and shared by every call
+JOB_DESCRIPTION_TOKEN_BUDGET = config('JOB_DESCRIPTION_TOKEN_BUDGET', default=700, cast=int)
+# Cap on the serialised work experience / education / certifications block
+PROFILE_TOKEN_BUDGET = config('PROFILE_TOKEN_BUDGET', default=800, cast=int)
+# Each work experience description is cut to this many words in the profile block
+PROFILE_DESCRIPTION_MAX_WORDS = 60
+
+PROMPT_STATS_KEY = 'prompt:stats'
+
+# Lines of a posting that carry no information for the writer (EEO statements, apply instructions)
+JOB_DESCRIPTION_NOISE_PATTERN = re.compile(
+    r"(equal (employment )?opportunity|without regard to|reasonable accommodation|e-?verify|click apply"
+    r"|apply (now|today|online)|to apply,|drug[- ]free|background check)",
+    re.IGNORECASE
+)
+
+
+def _clean(value):
+    return " ".join(str(value).split()) if value not in (None, '') else ''
+
+
+def _years(item):
+    start = _clean(item.get('start_year'))
+    end = _clean(item.get('end_year')) or 'Present'
+    if end == 'None':
+        end = 'Present'
+    return f"{start}-{end}" if start else end
+
+
+def _truncate_words(text, max_words):
+    words = text.split()
+    return text if len(words) <= max_words else " ".join(words[:max_words]) + "..."
+
+
+def serialize_work_experience(work_experience_data, include_description=True):
+    """One line per role: "- Title, Company (2019-Present): description"."""
+    lines = []
+    for item in work_experience_data:
+        line = f"- {_clean(item.get('title'))}, {_clean(item.get('company'))} ({_years(item)})"
+        description = _clean(item.get('description'))
+        if include_description and description:
+            line += f": {_truncate_words(description, PROFILE_DESCRIPTION_MAX_WORDS)}"
+        lines.append(line)
+    return lines
+
+
+def serialize_education(education_data):
+    lines = []
+    for item in education_data:
+        degree = " ".join(part for part in (_clean(item.get('degree')), _clean(item.get('field_of_study'))) if part)
+        lines.append(f"- {degree}, {_clean(item.get('institution'))} ({_years(item)})")
+    return lines
+
+
+def serialize_certifications(certifications_data):
+    lines = []
+    for item in certifications_data:
+        line = f"- {_clean(item.get('title'))}"
+        if _clean(item.get('issuer')):
+            line += f", {_clean(item.get('issuer'))}"
+        if _clean(item.get('acquired_date')):
+            line += f" ({_clean(item.get('acquired_date'))})"
+        lines.append(line)
+    return lines
+
+
+def serialize_profile(work_experience_data, education_data, certifications_data, token_budget=None):
+    """
+    Compact plain-text profile for a prompt: one line per entry under a short heading, empty
+    sections left out, cut to token_budget (work experience comes first, so it is kept longest).
+    """
+    lines = []
+    for heading, section_lines in (
+        ("Work Experience:", serialize_work_experience(work_experience_data)),
+        ("Education:", serialize_education(education_data)),
+        ("Certifications:", serialize_certifications(certifications_data)),
+    ):
+        if section_lines:
+            lines.append(heading)
+            lines.extend(section_lines)
+    return "\n".join(truncate_lines_to_budget(lines, token_budget or PROFILE_TOKEN_BUDGET))
+
+
+def condense_job_description(job_description, token_budget=None):
+    """
+    Shared, condensed job description for every call made for one document: whitespace collapsed,
+    blank, duplicate and boilerplate lines dropped, cut to token_budget.
+    """
+    lines, seen = [], set()
+    for raw_line in str(job_description or '').splitlines():
+        line = _clean(raw_line)
+        if not line or line.lower() in seen or JOB_DESCRIPTION_NOISE_PATTERN.search(line):
+            continue
+        seen.add(line.lower())
+        lines.append(line)
+    return "\n".join(truncate_lines_to_budget(lines, token_budget or JOB_DESCRIPTION_TOKEN_BUDGET))
+
+
+def build_messages(system_prompt, user_content, token_budget=None):
+    """
+    System + user messages within the input token budget. The user message (the job description)
+    is what gets cut when the two together exceed the budget.
+    """
+    token_budget = token_budget or PROMPT_INPUT_TOKEN_BUDGET
+    system_tokens = estimate_tokens(system_prompt)
+    if system_tokens + estimate_tokens(user_content) > token_budget:
+        remaining = max(token_budget - system_tokens, 0)
+        user_content = "\n".join(truncate_lines_to_budget(str(user_content).splitlines(), remaining))
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def record_prompt_usage(section, tokens_in, tokens_out, estimated=False):
+    """Logs tokens in/out for one generation call and adds them to the cumulative stats."""
+    section_name = (section or 'document').split(':')[0]
+    logger.info(
+        f"Prompt usage [{section or 'document'}]: {tokens_in} tokens in, {tokens_out} tokens out"
+        f"{' (estimated)' if estimated else ''}"
+    )
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(PROMPT_STATS_KEY, 'calls', 1)
+        pipe.hincrby(PROMPT_STATS_KEY, 'tokens_in', tokens_in)
+        pipe.hincrby(PROMPT_STATS_KEY, 'tokens_out', tokens_out)
+        pipe.hincrby(PROMPT_STATS_KEY, f'{section_name}:tokens_in', tokens_in)
+        pipe.hincrby(PROMPT_STATS_KEY, f'{section_name}:tokens_out', tokens_out)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def get_prompt_stats():
+    """Returns cumulative generation calls and tokens in/out, in total and per section, plus the mean per call."""
+    try:
+        raw = redis_client.hgetall(PROMPT_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read prompt stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    calls = stats.get('calls', 0)
+    stats['avg_tokens_in'] = round(stats.get('tokens_in', 0) / calls, 1) if calls else 0.0
+    stats['avg_tokens_out'] = round(stats.get('tokens_out', 0) / calls, 1) if calls else 0.0
+    return stats
@@ -0,0 +1,262 @@
+# app/rate_limiter.py
+
+import asyncio
+import random
+import time
+import uuid
+import openai
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+from .token_utils import estimate_tokens
+
+# Cluster-wide quotas, shared by every worker through Redis. Limits apply per model deployment.
+LLM_RPM_LIMIT = config('LLM_RPM_LIMIT', default=450, cast=int)
+LLM_TPM_LIMIT = config('LLM_TPM_LIMIT', default=450000, cast=int)
+EMBEDDING_RPM_LIMIT = config('EMBEDDING_RPM_LIMIT', default=700, cast=int)
+EMBEDDING_TPM_LIMIT = config('EMBEDDING_TPM_LIMIT', default=700000, cast=int)
+SCRAPINGBEE_CREDITS_PER_MINUTE = config('SCRAPINGBEE_CREDITS_PER_MINUTE', default=300, cast=int)
+# Completion tokens counted against TPM when the request does not set max_tokens
+LLM_DEFAULT_COMPLETION_TOKENS = config('LLM_DEFAULT_COMPLETION_TOKENS', default=1000, cast=int)
+RATE_LIMIT_MAX_WAIT = config('RATE_LIMIT_MAX_WAIT', default=300.0, cast=float)  # seconds
+RATE_LIMIT_MAX_ATTEMPTS = config('RATE_LIMIT_MAX_ATTEMPTS', default=4, cast=int)
+
+# Adaptive control: each 429 halves the bucket's rate (down to MIN_SCALE);
+# the rate then recovers linearly back to the configured quota.
+MIN_SCALE = 0.1
+BACKOFF_FACTOR = 0.5
+RECOVERY_PER_SECOND = 0.01
+
+BUCKET_PREFIX = 'ratelimit:'
+
+# Atomically refills and draws from a token bucket. Returns the number of seconds the caller
+# must wait before trying again (0 when the tokens were granted).
+# KEYS[1] bucket hash; ARGV: capacity, refill_per_second, requested, now
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'scale', 'scale_ts', 'blocked_until')
+local scale = tonumber(state[3]) or 1
+local scale_ts = tonumber(state[4]) or now
+local blocked_until = tonumber(state[5]) or 0
+scale = math.min(1, scale + (now - scale_ts) * tonumber(ARGV[5]))
+capacity = capacity * scale
+rate = rate * scale
+requested = math.min(requested, capacity)
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if blocked_until > now then
+    wait = blocked_until - now
+elseif tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# Records a 429: shrinks the bucket's rate and blocks it until Retry-After has passed.
+# KEYS[1] bucket hash; ARGV: now, retry_after, backoff_factor, min_scale, recovery_per_second
+PENALIZE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'scale', 'scale_ts', 'blocked_until')
+local scale = tonumber(state[1]) or 1
+local scale_ts = tonumber(state[2]) or now
+scale = math.min(1, scale + (now - scale_ts) * tonumber(ARGV[5]))
+scale = math.max(tonumber(ARGV[4]), scale * tonumber(ARGV[3]))
+local blocked_until = math.max(tonumber(state[3]) or 0, now + tonumber(ARGV[2]))
+redis.call('HSET', KEYS[1], 'scale', scale, 'scale_ts', now, 'blocked_until', blocked_until, 'tokens', 0, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(scale)
+"""
+
+# Takes one of `limit` concurrency slots. Holders are kept in a sorted set scored by expiry, so
+# slots held by a worker that died are reclaimed once their lease runs out.
+# KEYS[1] slot zset; ARGV: limit, now, lease_seconds, holder
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[2]) + tonumber(ARGV[3]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3])) + 60)
+return 1
+"""
+
+SLOT_PREFIX = 'slots:'
+
+_token_bucket = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+_penalize = redis_client.register_script(PENALIZE_SCRIPT)
+_acquire_slot = redis_client.register_script(ACQUIRE_SLOT_SCRIPT)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a quota could not be acquired within RATE_LIMIT_MAX_WAIT."""
+
+
+def _try_acquire(bucket, amount, per_minute):
+    """Returns seconds to wait (0 if granted). Fails open if Redis is unavailable."""
+    try:
+        return float(_token_bucket(
+            keys=[BUCKET_PREFIX + bucket],
+            args=[per_minute, per_minute / 60.0, amount, time.time(), RECOVERY_PER_SECOND]
+        ))
+    except RedisError as e:
+        logger.warning(f"Rate limiter unavailable for {bucket}, proceeding without it: {e}")
+        return 0.0
+
+
+def _jitter(wait):
+    # Spread waiting workers out so they don't all wake up at the same instant
+    return wait + random.uniform(0, min(1.0, wait * 0.1 + 0.05))
+
+
+def acquire(bucket, amount, per_minute, max_wait=None):
+    """Blocks until `amount` units are available in the bucket (refilled at `per_minute`)."""
+    deadline = time.monotonic() + (max_wait or RATE_LIMIT_MAX_WAIT)
+    while True:
+        wait = _try_acquire(bucket, amount, per_minute)
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            raise RateLimitTimeout(f"Could not acquire {amount} from {bucket} within {max_wait or RATE_LIMIT_MAX_WAIT}s")
+        time.sleep(_jitter(wait))
+
+
+async def acquire_async(bucket, amount, per_minute, max_wait=None):
+    """Async counterpart of acquire() that yields to the event loop while waiting."""
+    deadline = time.monotonic() + (max_wait or RATE_LIMIT_MAX_WAIT)
+    while True:
+        # The Redis call blocks: run it off the event loop
+        wait = await asyncio.to_thread(_try_acquire, bucket, amount, per_minute)
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            raise RateLimitTimeout(f"Could not acquire {amount} from {bucket} within {max_wait or RATE_LIMIT_MAX_WAIT}s")
+        await asyncio.sleep(_jitter(wait))
+
+
+def try_acquire_slot(name, limit, lease_seconds):
+    """
+    Takes a concurrency slot without waiting. Returns a holder token to pass to release_slot(),
+    or None when all `limit` slots are taken. Fails open if Redis is unavailable.
+    """
+    holder = uuid.uuid4().hex
+    try:
+        granted = _acquire_slot(keys=[SLOT_PREFIX + name], args=[limit, time.time(), lease_seconds, holder])
+    except RedisError as e:
+        logger.warning(f"Concurrency limiter unavailable for {name}, proceeding without it: {e}")
+        return holder
+    return holder if granted else None
+
+
+def release_slot(name, holder):
+    try:
+        redis_client.zrem(SLOT_PREFIX + name, holder)
+    except RedisError as e:
+        logger.warning(f"Unable to release {name} slot (it expires with its lease): {e}")
+
+
+def report_throttled(bucket, retry_after=None):
+    """Tightens a bucket after the provider answered 429, honouring Retry-After when present."""
+    retry_after = float(retry_after) if retry_after else 1.0
+    try:
+        scale = float(_penalize(
+            keys=[BUCKET_PREFIX + bucket],
+            args=[time.time(), retry_after, BACKOFF_FACTOR, MIN_SCALE, RECOVERY_PER_SECOND]
+        ))
+        logger.warning(f"Provider throttled {bucket}: backing off {retry_after:.1f}s, rate scaled to {scale:.2f}")
+    except RedisError as e:
+        logger.warning(f"Unable to record throttling for {bucket}: {e}")
+
+
+def report_deployment_throttled(kind, model, error):
+    """
+    Tightens both buckets of a model deployment after a 429 (kind: 'llm' or 'embedding'). Azure
+    does not say which quota was hit, and token limits are the usual cause, so RPM and TPM both back off.
+    """
+    retry_after = retry_after_from_headers(error.response.headers)
+    report_throttled(f'{kind}:rpm:{model}', retry_after)
+    report_throttled(f'{kind}:tpm:{model}', retry_after)
+
+
+def retry_after_from_headers(headers):
+    """Reads Retry-After (or Azure's retry-after-ms) from response headers, in seconds."""
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        return float(headers['retry-after-ms']) / 1000.0
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _llm_request_tokens(messages, params):
+    prompt_tokens = sum(estimate_tokens(m.get('content')) for m in messages)
+    return prompt_tokens + (params.get('max_tokens') or LLM_DEFAULT_COMPLETION_TOKENS)
+
+
+def limited_chat_completion(client, model, messages, **params):
+    """client.chat.completions.create() gated by the shared RPM/TPM buckets of the deployment."""
+    tokens = _llm_request_tokens(messages, params)
+    for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+        acquire(f'llm:rpm:{model}', 1, LLM_RPM_LIMIT)
+        acquire(f'llm:tpm:{model}', tokens, LLM_TPM_LIMIT)
+        try:
+            return client.chat.completions.create(model=model, messages=messages, **params)
+        except openai.RateLimitError as e:
+            report_deployment_throttled('llm', model, e)
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS:
+                raise
+
+
+async def alimited_chat_completion(client, model, messages, **params):
+    """Async counterpart of limited_chat_completion()."""
+    tokens = _llm_request_tokens(messages, params)
+    for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+        await acquire_async(f'llm:rpm:{model}', 1, LLM_RPM_LIMIT)
+        await acquire_async(f'llm:tpm:{model}', tokens, LLM_TPM_LIMIT)
+        try:
+            return await client.chat.completions.create(model=model, messages=messages, **params)
+        except openai.RateLimitError as e:
+            await asyncio.to_thread(report_deployment_throttled, 'llm', model, e)
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS:
+                raise
+
+
+def limited_embeddings(client, model, texts, dimensions):
+    """client.embeddings.create() gated by the shared RPM/TPM buckets of the embedding deployment."""
+    tokens = sum(estimate_tokens(text) for text in texts)
+    for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+        acquire(f'embedding:rpm:{model}', 1, EMBEDDING_RPM_LIMIT)
+        acquire(f'embedding:tpm:{model}', tokens, EMBEDDING_TPM_LIMIT)
+        try:
+            return client.embeddings.create(input=texts, model=model, dimensions=dimensions)
+        except openai.RateLimitError as e:
+            report_deployment_throttled('embedding', model, e)
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS:
+                raise
+
+
+def scrapingbee_credit_cost(params):
+    """Approximate ScrapingBee credits for a request: JS rendering and premium proxies cost more."""
+    params = params or {}
+    if params.get('stealth_proxy'):
+        return 75
+    if params.get('premium_proxy'):
+        return 25 if params.get('render_js', True) else 10
+    return 5 if params.get('render_js', True) else 1
+
+
+def acquire_scrapingbee(params):
+    acquire('scrapingbee:credits', scrapingbee_credit_cost(params), SCRAPINGBEE_CREDITS_PER_MINUTE)
+
+
+async def acquire_scrapingbee_async(params):
+    await acquire_async('scrapingbee:credits', scrapingbee_credit_cost(params), SCRAPINGBEE_CREDITS_PER_MINUTE)
@@ -0,0 +1,690 @@
+# app/replay.py
+"""
+Record/replay proxies and local stand-ins for the ingestion pipeline's external services
+(ScrapingBee, Azure OpenAI chat and embeddings, Supabase PostgREST).
+
+Each service gets a small HTTP server on localhost; the app is pointed at it through the
+environment variables that already hold the service URLs (SCRAPINGBEE_API_URL, SUPABASE_URL,
+AZURE_OPENAI_ENDPOINT_COVER_LETTER, AZURE_OPENAI_EMBEDDING_ENDPOINT, JOBMATCHER_EMBEDDING_ENDPOINT).
+
+Modes:
+- record: forwards every request to the real service and appends the exchange to
+  <fixtures>/<service>.jsonl. Credentials (api_key query parameters, auth headers) and request
+  bodies are never written; requests are matched by a digest of method, path, query and body.
+- replay: answers from the fixtures, repeating an exchange's responses in recorded order. Requests
+  with no recording fall back to the synthetic responder (or fail with 502 under --strict).
+- synthetic: no fixtures at all. ScrapingBee returns generated job pages and Hiring Cafe results,
+  chat completions return job details parsed from the page, embeddings are deterministic vectors
+  and Supabase is an in-memory PostgREST that keeps what the pipeline writes.
+
+Replay and synthetic responses can be delayed (recorded latency, or fixed per service) and a share
+of them replaced with 429 or 500 errors. GET /__replay__/stats on any proxy returns its counters.
+
+This module doesn't import the app (or app.extensions), so the proxies start without credentials:
+    python app/replay.py synthetic --service scrapingbee=8701 --service supabase=8705
+bench_ingestion.py starts them in-process and drives the pipeline against them.
+"""
+import argparse
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from aiohttp import web, ClientSession, ClientTimeout
+
+logger = logging.getLogger('cognibly_app')
+
+# Query parameters that carry credentials: dropped from keys and fixtures (request headers are never stored)
+SECRET_PARAMS = {'api_key', 'api-key', 'apikey', 'key'}
+# Response headers worth replaying; everything else (dates, request ids, encodings) is regenerated
+REPLAYED_HEADERS = {'content-type', 'retry-after', 'content-range', 'spb-cost', 'spb-resolved-url'}
+HOP_BY_HOP_HEADERS = {'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding', 'accept-encoding'}
+
+# Default service-side latency of synthetic responses, in seconds (ballpark production figures)
+SYNTHETIC_LATENCY = {'scrapingbee': 3.0, 'openai': 1.5, 'embeddings': 0.3, 'jobmatcher': 0.3, 'supabase': 0.05}
+SYNTHETIC_RESULTS_PER_PAGE = 40  # Hiring Cafe search results per synthetic location page
+STATS_PATH = '/__replay__/stats'
+
+
+def _canonical_body(body):
+    if not body:
+        return b''
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return body
+
+
+def _public_query(query_items):
+    return sorted((key, value) for key, value in query_items if key.lower() not in SECRET_PARAMS)
+
+
+def exchange_key(method, path, query_items, body):
+    """Identifies a request independent of credentials, parameter order and JSON key order."""
+    digest = hashlib.sha1(_canonical_body(body)).hexdigest()[:16]
+    return f"{method} {path}?{urlencode(_public_query(query_items))} {digest}"
+
+
+class FixtureStore:
+    """Recorded exchanges of one service, in <fixtures_dir>/<service>.jsonl."""
+
+    def __init__(self, fixtures_dir, service):
+        self.path = os.path.join(fixtures_dir, f"{service}.jsonl")
+        self.exchanges = {}
+        self.served = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.exchanges.setdefault(entry['key'], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.exchanges.values())
+
+    def next(self, key):
+        """The next recorded response for key (the last one repeats), or None."""
+        entries = self.exchanges.get(key)
+        if not entries:
+            return None
+        index = self.served.get(key, 0)
+        self.served[key] = index + 1
+        return entries[min(index, len(entries) - 1)]
+
+    def append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        self.exchanges.setdefault(entry['key'], []).append(entry)
+
+
+def _seeded(*parts):
+    return random.Random(hashlib.sha1("|".join(str(part) for part in parts).encode('utf-8')).digest())
+
+
+# ---------------------------------------------------------------- synthetic ScrapingBee
+
+TITLES = ['Data Analyst', 'Software Engineer', 'Product Manager', 'Registered Nurse', 'Account Executive',
+          'Operations Manager', 'UX Designer', 'Financial Analyst', 'Marketing Specialist', 'Project Coordinator']
+COMPANIES = ['Example Corp', 'Northwind Traders', 'Contoso Health', 'Fabrikam', 'Tailspin Logistics',
+             'Litware Labs', 'Adventure Works', 'Wide World Importers']
+SENIORITIES = ['Junior', '', 'Senior', 'Lead', 'Principal']
+WORKPLACE_TYPES = ['Onsite', 'Remote', 'Hybrid']
+
+
+def _synthetic_job(rng, location):
+    title = f"{rng.choice(SENIORITIES)} {rng.choice(TITLES)}".strip()
+    salary_min = rng.randrange(50, 160) * 1000
+    return {
+        'title': title,
+        'company': rng.choice(COMPANIES),
+        'location': location,
+        'workplace_type': rng.choice(WORKPLACE_TYPES),
+        'salary': (salary_min, salary_min + rng.randrange(10, 60) * 1000),
+        'description': " ".join(
+            f"As a {title} you will {rng.choice(['own', 'improve', 'build', 'support', 'analyse'])} "
+            f"{rng.choice(['reporting', 'customer onboarding', 'core services', 'clinical workflows', 'pipeline forecasts'])} "
+            f"with a team of {rng.randrange(3, 30)}."
+            for _ in range(rng.randrange(4, 12))
+        ),
+    }
+
+
+def synthetic_page_text(url):
+    """Body text of a job posting page; the first three lines are title, company and location."""
+    rng = _seeded('page', url)
+    job = _synthetic_job(rng, f"{rng.choice(['Austin', 'Miami', 'Denver', 'Seattle'])}, {rng.choice(['TX', 'FL', 'CO', 'WA'])}")
+    return "\n".join([
+        job['title'], job['company'], job['location'],
+        f"{job['workplace_type']} · Full-time · ${job['salary'][0]:,} - ${job['salary'][1]:,}",
+        f"Posted {datetime.now(timezone.utc).date().isoformat()}",
+        job['description'],
+        "Equal Opportunity Employer. All qualified applicants will receive consideration for employment.",
+    ])
+
+
+def synthetic_search_results(search_url, count=SYNTHETIC_RESULTS_PER_PAGE):
+    """A Hiring Cafe search-jobs response for the location encoded in the search URL."""
+    try:
+        search_state = json.loads(dict(parse_qsl(urlsplit(search_url).query)).get('searchState', '{}'))
+        location = search_state['selectedPlaceDetail']['formatted_address']
+    except (ValueError, KeyError, TypeError):
+        location = 'United States'
+    now = datetime.now(timezone.utc)
+    results = []
+    for i in range(count):
+        rng = _seeded('hiringcafe', location, i)
+        job = _synthetic_job(rng, location)
+        published = now - timedelta(hours=i * 3 + rng.random())
+        results.append({
+            'apply_url': f"https://jobs.example.com/{hashlib.sha1(f'{location}|{i}'.encode('utf-8')).hexdigest()[:12]}",
+            'job_information': {'title': job['title'], 'description': f"<p>{job['description']}</p>"},
+            'v5_processed_company_data': {'name': job['company']},
+            'v5_processed_job_data': {
+                'estimated_publish_date': published.isoformat().replace('+00:00', 'Z'),
+                'workplace_cities': [], 'workplace_states': [location],
+                'workplace_type': job['workplace_type'],
+                'yearly_min_compensation': job['salary'][0],
+                'yearly_max_compensation': job['salary'][1],
+            },
+        })
+    return {'results': results}
+
+
+def synthetic_scrapingbee(query):
+    url = query.get('url', '')
+    if query.get('extract_rules'):
+        return 200, {'text': synthetic_page_text(url)}
+    if str(query.get('json_response', '')).lower() == 'true':
+        body = json.dumps(synthetic_search_results(url))
+        return 200, {'body': '', 'xhr': [{'url': 'https://hiring.cafe/api/search-jobs', 'body': body}]}
+    return 200, f"<html><body><h1>Synthetic page</h1><p>{url}</p></body></html>"
+
+
+# ---------------------------------------------------------------- synthetic Azure OpenAI
+
+def _synthetic_reply(messages):
+    system = next((m.get('content') or '' for m in messages if m.get('role') == 'system'), '')
+    user = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    if isinstance(user, list):
+        user = " ".join(part.get('text', '') for part in user if isinstance(part, dict))
+    if '"Job Title"' in system:
+        lines = [line.strip() for line in user.splitlines() if line.strip()]
+        salary = re.search(r"\$[\d,]+ - \$[\d,]+", user)
+        return json.dumps({
+            "Job Title": lines[0] if lines else "Unknown",
+            "Company": lines[1] if len(lines) > 1 else "Unknown",
+            "Location": lines[2] if len(lines) > 2 else "Unknown",
+            "Remote(Yes/No/Hybrid/Unknown)": next((w for w in ('Remote', 'Hybrid') if w in user), "No").replace('Remote', 'Yes'),
+            "Date Posted": next(iter(re.findall(r"\d{4}-\d{2}-\d{2}", user)), "Unknown"),
+            "Job Description": " ".join(lines[3:])[:2000] or "Unknown",
+            "Job Type": "Full-time",
+            "Salary Range": salary.group(0) if salary else "Unknown",
+        })
+    if 'JSON array' in system:
+        return json.dumps(sorted(set(re.findall(r"https?://[^\s\"'<>]+/jobs?/[^\s\"'<>]+", user)))[:50])
+    if 'JSON' in system:
+        return "{}"
+    return "Synthetic reply. " * 20
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def synthetic_chat_completion(body):
+    messages = body.get('messages') or []
+    content = _synthetic_reply(messages)
+    prompt_tokens = sum(_approx_tokens(str(m.get('content') or '')) for m in messages)
+    return {
+        'id': f"chatcmpl-replay-{hashlib.sha1(json.dumps(messages).encode('utf-8')).hexdigest()[:12]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model') or 'replay',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': _approx_tokens(content),
+                  'total_tokens': prompt_tokens + _approx_tokens(content)},
+    }
+
+
+def synthetic_embedding(text, dimensions):
+    """Deterministic unit vector for the text, so equal texts embed equally across runs."""
+    rng = _seeded('embedding', dimensions, text)
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def synthetic_embeddings(body):
+    inputs = body.get('input')
+    inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+    dimensions = int(body.get('dimensions') or 1536)
+    data = []
+    for index, text in enumerate(inputs):
+        vector = synthetic_embedding(str(text), dimensions)
+        if body.get('encoding_format') == 'base64':
+            vector = base64.b64encode(array.array('f', vector).tobytes()).decode('ascii')
+        data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+    tokens = sum(_approx_tokens(str(text)) for text in inputs)
+    return {'object': 'list', 'data': data, 'model': body.get('model') or 'replay',
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+
+
+def synthetic_openai(path, body):
+    body = body or {}
+    if path.endswith('/embeddings'):
+        return 200, synthetic_embeddings(body)
+    if path.endswith('/chat/completions'):
+        return 200, synthetic_chat_completion(body)
+    return 404, {'error': {'message': f"No synthetic response for {path}"}}
+
+
+# ---------------------------------------------------------------- in-memory PostgREST
+
+_RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+def _as_text(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _parse_list(value):
+    """Items of a PostgREST in.(a,"b,c") list."""
+    inner = value[1:-1] if value.startswith('(') and value.endswith(')') else value
+    return [item[1:-1].replace('\\"', '"') if item.startswith('"') and item.endswith('"') else item
+            for item in re.findall(r'"(?:[^"\\]|\\.)*"|[^,]+', inner)]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(row, column, expression):
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    operator, _, operand = expression.partition('.')
+    value = row.get(column)
+    if operator == 'eq':
+        result = _as_text(value) == operand
+    elif operator == 'neq':
+        result = _as_text(value) != operand
+    elif operator == 'in':
+        result = _as_text(value) in _parse_list(operand)
+    elif operator == 'is':
+        result = _as_text(value) == operand.lower()
+    elif operator in ('gt', 'gte', 'lt', 'lte'):
+        left, right = _number(value), _number(operand)
+        if left is None or right is None:
+            left, right = _as_text(value), operand
+        result = {'gt': left > right, 'gte': left >= right, 'lt': left < right, 'lte': left <= right}[operator] if value is not None else False
+    elif operator in ('like', 'ilike'):
+        pattern = '^' + re.escape(operand).replace(r'\*', '.*').replace('%', '.*') + '$'
+        result = value is not None and re.match(pattern, str(value), re.IGNORECASE if operator == 'ilike' else 0) is not None
+    else:
+        logger.debug(f"In-memory PostgREST ignores filter {column}={expression}")
+        result = True
+    return not result if negate else result
+
+
+class MemoryPostgrest:
+    """Just enough of PostgREST for the pipeline: filters, order, offset/limit, single, upsert, update, delete."""
+
+    def __init__(self):
+        self.tables = {}
+        self.next_ids = {}
+
+    def _prefer(self, headers):
+        return {part.strip() for part in headers.get('Prefer', '').split(',') if part.strip()}
+
+    def _filtered(self, table, query_items):
+        rows = self.tables.setdefault(table, [])
+        filters = [(key, value) for key, value in query_items if key not in _RESERVED_PARAMS]
+        return [row for row in rows if all(_matches(row, key, value) for key, value in filters)]
+
+    def _project(self, rows, select):
+        if not select or select.strip() == '*':
+            return [dict(row) for row in rows]
+        columns = [column.strip().split(':')[-1] for column in select.split(',') if column.strip() and '(' not in column]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    def _insert(self, table, row):
+        if 'id' not in row or row['id'] is None:
+            self.next_ids[table] = self.next_ids.get(table, 0) + 1
+            row['id'] = self.next_ids[table]
+        else:
+            self.next_ids[table] = max(self.next_ids.get(table, 0), int(_number(row['id']) or 0))
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    def handle(self, method, path, query_items, headers, body):
+        """Returns (status, payload, headers) for a request to /rest/v1/<table>."""
+        table = path.rstrip('/').split('/')[-1]
+        query = dict(query_items)
+        prefer = self._prefer(headers)
+        extra_headers = {}
+
+        if method == 'GET':
+            rows = self._filtered(table, query_items)
+            for order in reversed([part for part in query.get('order', '').split(',') if part]):
+                column, _, direction = order.partition('.')
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else 0),
+                          reverse=direction.startswith('desc'))
+            total = len(rows)
+            offset = int(query.get('offset', 0))
+            limit = int(query['limit']) if 'limit' in query else None
+            rows = rows[offset:offset + limit if limit is not None else None]
+            rows = self._project(rows, query.get('select'))
+            if 'count=exact' in prefer:
+                extra_headers['Content-Range'] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        elif method == 'POST':
+            records = body if isinstance(body, list) else [body or {}]
+            conflict_column = query.get('on_conflict')
+            rows = []
+            for record in records:
+                existing = None
+                if conflict_column and record.get(conflict_column) is not None:
+                    existing = next((row for row in self.tables.get(table, []) if row.get(conflict_column) == record.get(conflict_column)), None)
+                if existing is None:
+                    rows.append(self._insert(table, dict(record)))
+                elif 'resolution=merge-duplicates' in prefer:
+                    existing.update(record)
+                    rows.append(existing)
+                elif 'resolution=ignore-duplicates' not in prefer:
+                    return 409, {'code': '23505', 'message': f'duplicate key value violates unique constraint on "{conflict_column}"'}, extra_headers
+            rows = self._project(rows, query.get('select'))
+        elif method == 'PATCH':
+            rows = self._filtered(table, query_items)
+            for row in rows:
+                row.update(body or {})
+            rows = self._project(rows, query.get('select'))
+        elif method == 'DELETE':
+            rows = self._filtered(table, query_items)
+            removed = {id(row) for row in rows}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in removed]
+            rows = self._project(rows, query.get('select'))
+        else:
+            return 405, {'message': f"{method} is not supported"}, extra_headers
+
+        status = 201 if method == 'POST' else 200
+        if 'application/vnd.pgrst.object+json' in headers.get('Accept', ''):
+            if len(rows) != 1:
+                return 406, {'code': 'PGRST116', 'details': f"The result contains {len(rows)} rows",
+                             'message': 'JSON object requested, multiple (or no) rows returned'}, extra_headers
+            return status, rows[0], extra_headers
+        if method != 'GET' and 'return=representation' not in prefer:
+            return (204 if method != 'POST' else 201), None, extra_headers
+        return status, rows, extra_headers
+
+
+# ---------------------------------------------------------------- proxy server
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+
+class ReplayProxy:
+    """One service's record/replay/synthetic HTTP server."""
+
+    def __init__(self, service, port, mode, fixtures_dir=None, upstream=None, latency=None, jitter=0.0,
+                 latency_scale=1.0, error_rate=0.0, throttle_rate=0.0, strict=False, host='127.0.0.1'):
+        if mode not in ('record', 'replay', 'synthetic'):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if mode == 'record' and not upstream:
+            raise ValueError(f"Recording {service} needs its upstream URL")
+        if mode != 'synthetic' and not fixtures_dir:
+            raise ValueError(f"{mode} mode needs a fixtures directory")
+        self.service = service
+        self.host, self.port = host, port
+        self.mode = mode
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.store = FixtureStore(fixtures_dir, service) if fixtures_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.strict = strict
+        self.postgrest = MemoryPostgrest() if service == 'supabase' else None
+        self.session = None
+        self.runner = None
+        self.counters = {'requests': 0, 'recorded': 0, 'hits': 0, 'misses': 0, 'synthetic': 0, 'injected_errors': 0, 'upstream_errors': 0}
+        self.latencies = []
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_get(STATS_PATH, self.handle_stats)
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        if self.mode == 'record':
+            self.session = ClientSession(timeout=ClientTimeout(total=300), auto_decompress=True)
+        logger.info(f"Replay proxy for {self.service} ({self.mode}) listening on {self.url}")
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+        if self.runner:
+            await self.runner.cleanup()
+
+    def stats(self):
+        samples = self.latencies
+        return {
+            **self.counters,
+            'service': self.service,
+            'mode': self.mode,
+            'mean_latency': round(statistics.fmean(samples), 4) if samples else None,
+            'p50_latency': _percentile(samples, 0.5),
+            'p95_latency': _percentile(samples, 0.95),
+        }
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats())
+
+    def _delay(self, recorded_elapsed=None):
+        if self.latency is not None:
+            base = self.latency
+        elif recorded_elapsed is not None:
+            base = recorded_elapsed * self.latency_scale
+        else:
+            base = SYNTHETIC_LATENCY.get(self.service, 0.1)
+        return max(0.0, base + random.uniform(-self.jitter, self.jitter))
+
+    def _injected_error(self):
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return web.json_response({'message': 'Too many requests (injected)'}, status=429, headers={'Retry-After': '1'})
+        if roll < self.throttle_rate + self.error_rate:
+            return web.json_response({'message': 'Internal server error (injected)'}, status=500)
+        return None
+
+    async def handle(self, request):
+        started = time.monotonic()
+        self.counters['requests'] += 1
+        body = await request.read()
+        query_items = list(request.query.items())
+        key = exchange_key(request.method, request.path, query_items, body)
+        try:
+            if self.mode == 'record':
+                return await self._record(request, key, body)
+            injected = self._injected_error()
+            if injected is not None:
+                self.counters['injected_errors'] += 1
+                await asyncio.sleep(self._delay())
+                return injected
+            entry = self.store.next(key) if self.mode == 'replay' else None
+            if entry is not None:
+                self.counters['hits'] += 1
+                await asyncio.sleep(self._delay(entry.get('elapsed')))
+                return self._response_from_entry(entry)
+            if self.mode == 'replay':
+                self.counters['misses'] += 1
+                if self.strict:
+                    return web.json_response({'message': f"No recorded exchange for {key}"}, status=502)
+            self.counters['synthetic'] += 1
+            await asyncio.sleep(self._delay())
+            return self._synthetic(request, query_items, body)
+        finally:
+            self.latencies.append(time.monotonic() - started)
+
+    async def _record(self, request, key, body):
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+        started = time.monotonic()
+        try:
+            async with self.session.request(request.method, f"{self.upstream}{request.path_qs}", headers=headers, data=body or None) as upstream:
+                payload = await upstream.read()
+                status = upstream.status
+                upstream_headers = {name: value for name, value in upstream.headers.items() if name.lower() in REPLAYED_HEADERS}
+        except Exception as e:
+            self.counters['upstream_errors'] += 1
+            logger.error(f"Replay proxy for {self.service}: upstream request failed: {e}")
+            return web.json_response({'message': f"Upstream request failed: {e}"}, status=502)
+        entry = {
+            'key': key,
+            'method': request.method,
+            'path': request.path,
+            'query': _public_query(request.query.items()),
+            'status': status,
+            'headers': upstream_headers,
+            'elapsed': round(time.monotonic() - started, 4),
+        }
+        try:
+            entry['body'] = payload.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_b64'] = base64.b64encode(payload).decode('ascii')
+        self.store.append(entry)
+        self.counters['recorded'] += 1
+        return web.Response(status=status, body=payload, headers=upstream_headers)
+
+    def _response_from_entry(self, entry):
+        payload = base64.b64decode(entry['body_b64']) if 'body_b64' in entry else entry.get('body', '').encode('utf-8')
+        return web.Response(status=entry['status'], body=payload, headers=entry.get('headers') or {})
+
+    def _synthetic(self, request, query_items, body):
+        try:
+            parsed = json.loads(body) if body else None
+        except ValueError:
+            parsed = None
+        headers = {}
+        if self.service == 'scrapingbee':
+            status, payload = synthetic_scrapingbee(dict(query_items))
+        elif self.service == 'supabase':
+            status, payload, headers = self.postgrest.handle(request.method, request.path, query_items, request.headers, parsed)
+        else:
+            status, payload = synthetic_openai(request.path, parsed)
+        if payload is None:
+            return web.Response(status=status, headers=headers)
+        if isinstance(payload, str):
+            return web.Response(status=status, text=payload, content_type='text/html')
+        return web.json_response(payload, status=status, headers=headers)
+
+
+class ReplayServers:
+    """Proxies running on a background event loop; stop() shuts them down."""
+
+    def __init__(self, proxies):
+        self.proxies = {proxy.service: proxy for proxy in proxies}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='replay-proxies', daemon=True)
+        self._ready = threading.Event()
+        self._error = None
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            for proxy in self.proxies.values():
+                self.loop.run_until_complete(proxy.start())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def urls(self):
+        return {service: proxy.url for service, proxy in self.proxies.items()}
+
+    def stats(self):
+        return {service: proxy.stats() for service, proxy in self.proxies.items()}
+
+    def stop(self):
+        async def close_all():
+            for proxy in self.proxies.values():
+                await proxy.close()
+        asyncio.run_coroutine_threadsafe(close_all(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+
+
+def start_proxies(services, mode, fixtures_dir=None, latencies=None, **options):
+    """
+    Starts one proxy per service on a background thread.
+
+    :param services: {service: (port, upstream URL or None)}
+    :param latencies: optional {service: fixed latency in seconds}; otherwise recorded or SYNTHETIC_LATENCY
+    :param options: jitter, latency_scale, error_rate, throttle_rate, strict (see ReplayProxy)
+    """
+    latencies = latencies or {}
+    proxies = [
+        ReplayProxy(service, port, mode, fixtures_dir=fixtures_dir, upstream=upstream, latency=latencies.get(service), **options)
+        for service, (port, upstream) in services.items()
+    ]
+    return ReplayServers(proxies).start()
+
+
+def service_values(values, cast=str):
+    """Parses repeated name=value options into a dict."""
+    pairs = {}
+    for value in values or []:
+        name, _, rest = value.partition('=')
+        pairs[name] = cast(rest) if rest else None
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay proxies for ScrapingBee, Azure OpenAI and Supabase.")
+    parser.add_argument('mode', choices=['record', 'replay', 'synthetic'])
+    parser.add_argument('--fixtures', help='fixtures directory (record and replay)')
+    parser.add_argument('--service', action='append', required=True,
+                        help='name=port or name=port=upstream-url, e.g. supabase=8705=https://xyz.supabase.co')
+    parser.add_argument('--latency', action='append', help='fixed latency per service, e.g. openai=1.2')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='multiplier for recorded latencies')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of responses replaced by 500s')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of responses replaced by 429s')
+    parser.add_argument('--strict', action='store_true', help='fail unrecorded requests instead of answering synthetically')
+    args = parser.parse_args()
+
+    services = {}
+    for value in args.service:
+        name, port, upstream = (value.split('=', 2) + [None])[:3]
+        services[name] = (int(port), upstream)
+    servers = start_proxies(
+        services, args.mode, fixtures_dir=args.fixtures, latencies=service_values(args.latency, float), jitter=args.jitter,
+        latency_scale=args.latency_scale, error_rate=args.error_rate, throttle_rate=args.throttle_rate, strict=args.strict
+    )
+    print(json.dumps(servers.urls(), indent=2))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(servers.stats(), indent=2))
+        servers.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,18 +1,22 @@
 # app/routes.py
 
-from flask import render_template, flash, redirect, request, session, url_for, send_file, send_from_directory, request, g, jsonify, Blueprint, Flask
+from flask import render_template, flash, redirect, request, session, url_for, send_file, send_from_directory, request, g, jsonify, Blueprint, Flask, Response, stream_with_context
 from flask_login import login_required, current_user, login_user, logout_user
 from functools import wraps
-from .extensions import supabase, logger, stripe  # Removed oauth import
+from .extensions import supabase, logger, stripe, redis_client  # Removed oauth import
 from .celery_app import celery  # Import the Celery instance
 from .models import User
 #from .generate_query import generate_job_keywords, generate_urls
 from .jobmatcher import embed_user_preferences, calculate_user_job_fit
 from forms import JobPreferencesForm, EducationEntryForm
 from math import ceil
-from .tasks import process_job_preferences
+from .tasks import process_job_preferences, generate_document as generate_document_task
+from .documents import DOCUMENT_OUTPUT_DIR, DOCUMENT_TYPES, DocumentGenerationError, find_cached_document
+from .document_cache import profile_fingerprint
+from .document_stream import format_sse, iter_events
 from datetime import datetime, timedelta, timezone
 from decouple import config
+from redis.exceptions import RedisError
 import json
 import ast
 import os
@@ -2377,703 +2381,168 @@ def init_drive_service():
     return build('drive', 'v3', credentials=credentials)
 
 
-def capitalize_first_letter(text):
-    # Capitalize only the first letter of the text, leave the rest unchanged
-    if text:
-        return text[0].upper() + text[1:]
-    return text  # Return the original text if it's empty
-
-def replace_education_placeholder(document, education_data):
-    # Define degree acronyms and titles
-    degree_titles = {
-        'BA': 'Bachelor of Arts',
-        'BS': 'Bachelor of Science',
-        'BSc': 'Bachelor of Science',
-        'BBA': 'Bachelor of Business Administration',
-        'BFA': 'Bachelor of Fine Arts',
-        'BMus': 'Bachelor of Music',
-        'BEd': 'Bachelor of Education',
-        'BEng': 'Bachelor of Engineering',
-        'BSN': 'Bachelor of Science in Nursing',
-        'MA': 'Master of Arts',
-        'MS': 'Master of Science',
-        'MSc': 'Master of Science',
-        'MBA': 'Master of Business Administration',
-        'MFA': 'Master of Fine Arts',
-        'MEd': 'Master of Education',
-        'MPH': 'Master of Public Health',
-        'MSW': 'Master of Social Work',
-        'MMus': 'Master of Music',
-        'MEng': 'Master of Engineering',
-        'PhD': 'Doctor of Philosophy',
-        'EdD': 'Doctor of Education',
-        'DBA': 'Doctor of Business Administration',
-        'MD': 'Doctor of Medicine',
-        'JD': 'Juris Doctor (Law)',
-        'DDS': 'Doctor of Dental Surgery',
-        'DVM': 'Doctor of Veterinary Medicine',
-        'PsyD': 'Doctor of Psychology',
-        'PostDoc': 'Post-Doctoral Fellow/Research',
-        'PDF': 'Post-Doctoral Fellowship'
-    }
-
-    # Iterate through paragraphs in the document to find the $EDUCATION placeholder
-    for para in document.paragraphs:
-        if '$EDUCATION' in para.text:  # Match the $EDUCATION placeholder
-            # Clear the paragraph and replace with formatted education text
-            for item in education_data:
-                # Get degree abbreviation directly from item (e.g., 'MS')
-                degree = item.get('degree_title', '')
-
-                # Get the full degree title using the degree abbreviation
-                degree_title = degree_titles.get(degree, '')
-
-                # Capitalize the field of study and institution if available
-                field_of_study = capitalize_first_letter(item['field_of_study']) if item.get('field_of_study') else ''
-                institution = capitalize_first_letter(item['institution']) if item.get('institution') else ''
-
-                # Format the text as "{degree} ({degree_title}) in {field_of_study} – {institution}"
-                formatted_text = f"{degree} ({degree_title}) in {field_of_study} – {institution}" if field_of_study else f"{degree} ({degree_title}) – {institution}"
-
-                # Clear the paragraph text (remove any existing content)
-                para.clear()
-
-                # Add the formatted text as a run with font size 10pt
-                run = para.add_run(formatted_text)
-                run.font.size = Pt(10)  # Set font size to 10pt
+# How long a queued document can be polled and downloaded (matches Celery's default result expiry)
+DOCUMENT_TASK_TTL = config('DOCUMENT_TASK_TTL', default=86400, cast=int)
 
-                # If you want to add additional lines after each entry, you could insert a new paragraph here
-                # document.add_paragraph()  # Uncomment to add extra whitespace (new paragraph)
 
-            break  # Exit the loop once the placeholder is replaced
+def _document_task_owner_key(task_id):
+    return f"doctask:{task_id}"
 
 
+def _owns_document_task(task_id):
+    try:
+        owner = redis_client.get(_document_task_owner_key(task_id))
+    except RedisError as e:
+        logger.warning(f"Unable to check document task owner for {task_id}: {e}")
+        return False
+    return owner is not None and owner.decode('utf-8') == str(current_user.id)
 
-def add_section_to_template(section_heading, data, key_map, document, is_certifications=False):
-    # Iterate through paragraphs in the document to find the placeholder
-    for para in document.paragraphs:
-        if '$' + section_heading.upper() in para.text:  # Match the dynamic section heading placeholder
-            # Replace the section heading with tab-stops formatted text
-            insert_tab_stops_text(para, data, key_map, document, is_certifications)
-            remove_paragraph(para)
-            break  # Exit the loop once the placeholder is replaced
-
-def remove_paragraph(para):
-    # Access the underlying XML element of the paragraph
-    para_element = para._element
-
-    # Remove the paragraph from the document's XML structure
-    para_element.getparent().remove(para_element)
 
-def insert_paragraph_after(paragraph, text=None, style=None):
-    """Insert a new paragraph after the given paragraph."""
-    new_p = OxmlElement("w:p")  # Create a new XML element for the paragraph
-    paragraph._p.addnext(new_p)  # Insert it after the current paragraph
-    new_para = Paragraph(new_p, paragraph._parent)  # Wrap it as a `Paragraph` object
-    if text:
-        new_para.add_run(text)  # Add text if provided
-    if style is not None:
-        new_para.style = style  # Apply style if provided
-    return new_para
+@main_bp.route('/generate_doc/<job_id>/<doc_type>', methods=['GET', 'POST'])
+@login_required
+def generate_doc(job_id, doc_type):
+    """Queues generation of a resume or cover letter and returns the task id to poll."""
+    is_subscribed = current_user.is_subscribed if not current_user.is_anonymous else False
 
-def insert_tab_stops_text(para, data, key_map, document, is_certifications):
-    """Insert tab stops and formatted text sequentially after the given paragraph."""
-    for item in data:
-        # Create a new paragraph for each entry
-        new_para = insert_paragraph_after(para)
+    if not is_subscribed:
+        return jsonify({'error': "You need to buy a subscription to use this feature."}), 403
 
-        left_text = item.get(key_map['left'], '')
+    if not job_id or doc_type not in DOCUMENT_TYPES:
+        return jsonify({'error': "Invalid parameters for document generation."}), 400
 
-        # Handle date formatting
-        if is_certifications:
-            date_text = item.get('acquired_date', 'Unknown Date')
-        else:
-            start_year = item.get('start_year', '')
-            end_year = item.get('end_year', 'Present')
-            if end_year == 'None' or end_year is None:
-                end_year = 'Present'
-            date_text = f"{start_year} - {end_year}"
-
-        # Add left-aligned text with tab and right-aligned date
-        run_left = new_para.add_run(left_text)
-        run_left.font.size = Pt(11.5)
-
-        run_tab_date = new_para.add_run(f"\t{date_text}")
-        run_tab_date.font.size = Pt(10)
-
-        # Calculate usable width for tab position
-        section = document.sections[0]
-        usable_width = section.page_width - section.left_margin - section.right_margin
-
-        # Set the tab stop with right alignment
-        new_para.paragraph_format.tab_stops.add_tab_stop(
-            usable_width,
-            alignment=WD_TAB_ALIGNMENT.RIGHT
-        )
+    profile_fp = None
+    try:
+        # A document generated from the same profile, template and job is served straight from storage.
+        # The profile fingerprint is passed on to the task so it is only computed once.
+        profile_fp = profile_fingerprint(current_user.id)
+        _, cached_filename = find_cached_document(job_id, doc_type, current_user.id, profile_fp)
+        if cached_filename:
+            return jsonify({
+                'status': 'ready',
+                'download_url': url_for('main.generate_doc_cached', job_id=job_id, doc_type=doc_type)
+            })
+    except Exception as e:
+        logger.warning(f"Document cache lookup failed for job_id={job_id}: {str(e)}")
 
-        # Handle additional lines (below_text)
-        below_text = key_map.get('below', [])
-        if isinstance(below_text, list):  # If below is a list of keys
-            below_text_lines = [item.get(key, '') for key in below_text]
-        else:
-            below_text_lines = [item.get(below_text, '')]
+    try:
+        task = generate_document_task.delay(job_id, doc_type, current_user.id, profile_fp=profile_fp)
+        redis_client.set(_document_task_owner_key(task.id), str(current_user.id), ex=DOCUMENT_TASK_TTL)
+    except Exception as e:
+        logger.exception(f"Error queueing document for job_id={job_id}: {str(e)}")
+        return jsonify({'error': "An error occurred while generating the document."}), 500
 
-        for below_line in below_text_lines:
-            if below_line:  # Only add if there's text to add
-                new_para.add_run(f"\n{below_line}").font.size = Pt(10)
+    return jsonify({
+        'task_id': task.id,
+        'status_url': url_for('main.generate_doc_status', task_id=task.id),
+        'download_url': url_for('main.generate_doc_download', task_id=task.id)
+    }), 202
 
-        # Align the paragraph to the left (tab stop ensures the date aligns right)
-        new_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        
-        # Manually insert a blank paragraph by adding a new empty paragraph after the current one
-        new_blank_para = insert_paragraph_after(new_para)
 
-        # Set a minimal formatting or style for the blank line if necessary
-        new_blank_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        new_blank_para.add_run("")  # Just an empty run to create the blank line
-        
-def replace_placeholders(paragraphs, replacements):
-    for paragraph in paragraphs:
-        # Print the paragraph text for debugging
-        print(f"Processing paragraph: {paragraph.text}")
-        
-        for placeholder, value in replacements.items():
-            if value is None:
-                value = ''  # Replace None with an empty string
-
-            # Handle $FULLNAME special case
-            if placeholder == '$FULLNAME':
-                postnomial = replacements.get('$POSTNOMIAL', '')
-                # Add a comma and postnomial if it's present
-                replacement_text = value + (', ' + postnomial if postnomial else '')
-                # Now replace the placeholder with the new value (full name + postnomial)
-                for run in paragraph.runs:
-                    if placeholder in run.text:
-                        run.text = run.text.replace(placeholder, replacement_text)
-                        run.font.size = Pt(12)  # Set the font size for FULLNAME
-            elif placeholder == '$POSTNOMIAL':
-                # Regular replacement for $POSTNOMIAL
-                for run in paragraph.runs:
-                    if placeholder in run.text:
-                        run.text = run.text.replace(placeholder, value)
-                        run.font.size = Pt(9)  # Set the font size for POSTNOMIAL
-            elif placeholder == '$CONTACTDETAILS':
-                # Regular replacement for $CONTACTDETAILS
-                for run in paragraph.runs:
-                    if placeholder in run.text:
-                        run.text = run.text.replace(placeholder, value)
-                        run.font.size = Pt(11)  # Set the font size for CONTACTDETAILS
-            else:
-                # Regular placeholder replacement for all other placeholders
-                for run in paragraph.runs:
-                    if placeholder in run.text:
-                        run.text = run.text.replace(placeholder, value)
-                        run.font.size = Pt(10)  # Default font size
-
-
-def calculate_word_count(work_exp_count, education_count, certifications_count):
-    # Work experience word count based on the inverted functionality
-    static_edu_cert_word_count = (education_count + certifications_count) * 15
-
-    work_exp_word_count = 0
-    if work_exp_count > 5:
-        work_exp_word_count = 96
-    if work_exp_count == 5:
-        work_exp_word_count = 108
-    elif work_exp_count == 4:
-        work_exp_word_count = 120
-    elif work_exp_count == 3:
-        work_exp_word_count = 160
-    elif work_exp_count == 2:
-        work_exp_word_count = 240
-    elif work_exp_count == 1:
-        work_exp_word_count = 480
-
-    # Adjust work experience allocation based on remaining words after education and certifications
-    work_exp_word_count = work_exp_word_count - static_edu_cert_word_count
-
-    return work_exp_word_count
-
-
-def generate_resume(job_data, user_id):
-    # Fetch user data from Supabase
-    user_data_response = supabase.table('user_job_preferences').select('*').eq('user_id', user_id).execute()
-    user_data = user_data_response.data
-    print(f"Job Data: {job_data}")
-
-    if not user_data:
-        flash("User data not found.", 'error')
-        return redirect(url_for('some_error_page'))
-
-    user_details = user_data[0]
-    if not user_details.get('real_name'):
-        flash("Real name is missing.", 'error')
-        return redirect(url_for('some_error_page'))
-
-    # Extract user details
-    full_name = user_details['real_name']
-    postnomial = user_details.get('postnomial', '')
-    phone_number = user_details.get('phone', '')
-    email = user_details.get('email', '')
-    current_city = user_details.get('current_city', '')
-    current_state = user_details.get('current_state', '')
-
-    # Generate professional summary using OpenAI
-    company = job_data['company']
-    job_description = job_data.get('job_description', "")
-    preferred_roles_responsibilities = user_details.get('preferred_roles_responsibilities', '')
-
-    summary_prompt = f"""You are a professional resume summary writer. 
-    The user will upload a job description they will use to apply for the job.
-
-    Your task is to write a resume summary section that is no more than 60 words in length. 
-    The summary must specifically be tailored for the job which the user provides as input. 
-
-    Preferred Roles and Responsibilities: {preferred_roles_responsibilities}
-    Applying to company: {company}
+@main_bp.route('/generate_doc/stream/<job_id>/<doc_type>', methods=['GET'])
+@login_required
+def generate_doc_stream(job_id, doc_type):
     """
+    Generates a resume or cover letter and streams its text to the browser as server-sent events
+    (delta, reset, done, error) while the documents worker writes it; 'done' carries the download URL
+    once the DOCX/PDF has been assembled.
+    """
+    def single_event(event, data):
+        return Response(format_sse(event, data), mimetype='text/event-stream')
 
-    summary_response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.8,
-        messages=[
-            {"role": "system", "content": summary_prompt},
-            {"role": "user", "content": f"Job Description: {job_description}"}
-        ]
-    )
-    summary = summary_response.choices[0].message.content   
-
-    skills_prompt = f"""The user will upload a job description they will use to apply for the job.
-
-Your task is to write a list of skills no more than 45 words in length. The skills list must specifically be tailored for the job which the user provides as input. Use a mixture of hard skills (technologies) and soft skills, all of which should be related to the job.
-
-The first letter of each skill must be Capitalized. Each skill must be separated by a comma and a space. List the skills in order of relevance to the job posting. 
-
-IMPORTANT: Do not exceed 45 words in length. This is going at the bottom of a resume and if you exceed 45 words, it will not fit. Do not give the skills list a label like "Skills: " - Generate the skills list only, following the below Example List:
-"""
-
-    skills_response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.4,
-        messages=[
-            {"role": "system", "content": skills_prompt},
-            {"role": "user", "content": f": {job_description}"}
-        ]
-    )
-    skills = skills_response.choices[0].message.content  
-
-    # Fetch additional details from Supabase
-    work_experience = supabase.table('work_experience').select('*').eq('profile_id', user_id).execute()
-    education = supabase.table('education').select('*').eq('profile_id', user_id).execute()
-    certifications = supabase.table('certifications').select('*').eq('profile_id', user_id).execute()
-
-    # Safely process data
-    work_experience_data = [
-        {
-            "company": data.get('company', 'Unknown Company'),
-            "title": data.get('title', 'Unknown Title'),
-            "description": data.get('description', ''),
-            "start_year": data.get('start_year', ''),
-            "end_year": data.get('end_year', 'Present'),
-        }
-        for data in (work_experience.data or [])
-    ]
-    education_data = [
-        {
-            "institution": data.get('institution', 'Unknown Institution'),
-            "degree": data.get('degree', 'Unknown Degree'),
-            "degree_title": data.get('degree_title', 'Unknown Title'),
-            "field_of_study": data.get('field_of_study', 'Unknown Field'),
-            "start_year": data.get('start_year', 'Unknown'),
-            "end_year": data.get('end_year', 'Present'),
-        }
-        for data in (education.data or [])
-    ]
-    certifications_data = [
-        {
-            "title": data.get('title', 'Unknown Certification'),
-            "issuer": data.get('issuer', ''),
-            "acquired_date": data.get('acquired_date', ''),
-        }
-        for data in (certifications.data or [])
-    ]
-
-
- # For each work experience entry, decide whether to add more details based on the number of entries
-    word_limit = calculate_word_count(len(work_experience_data), len(education_data), len(certifications_data))
-
-    for work in work_experience_data:
-        description_prompt = f"""You are a resume writer. Based on the title '{work['title']}' at '{work['company']}', write a description for this job role, as if you were the one that had it and want to give your objective outlook on it. Use maximum of {word_limit} words. Respect the word count. Do not give any headings or position headers.
-
-Title: {work['title']}
-Company: {work['company']}
-"""
-
-        description_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.7,
-            messages=[
-                {"role": "system", "content": description_prompt},
-                {"role": "user", "content": f"Job Description: {job_description}"}
-            ]
-        )
-
-        # Extract the generated description
-        generated_description = description_response.choices[0].message.content
+    is_subscribed = current_user.is_subscribed if not current_user.is_anonymous else False
+    if not is_subscribed:
+        return single_event('error', {'error': "You need to buy a subscription to use this feature."})
 
-        # Update the work entry with the adjusted description
-        work['description'] = generated_description
+    if not job_id or doc_type not in DOCUMENT_TYPES:
+        return single_event('error', {'error': "Invalid parameters for document generation."})
 
-    # Load the template
+    profile_fp = None
     try:
-        template_path = os.path.join(os.path.dirname(__file__), 'docs', 'resume_template.docx')
-        document = Document(template_path)
-    except Exception as e:  
-        flash("Template not found or invalid.", 'error')
-        return redirect(url_for('some_error_page'))
-
-    # Replace placeholders in the template
-    placeholder_map = {
-        "$FULLNAME": full_name,
-        "$POSTNOMIAL": postnomial,
-        "$CONTACTDETAILS": f"{current_city}, {current_state} · {email} · {phone_number}",
-        "$SUMMARY": summary,
-        "$SKILLS": skills,
-    }
-
-    # Replace placeholders in headers and footers
-    for section in document.sections:
-        # Process the header
-        header = section.header
-        replace_placeholders(header.paragraphs, placeholder_map)
-        
-        # Process the footer
-        footer = section.footer
-        replace_placeholders(footer.paragraphs, placeholder_map)
-
-        replace_placeholders(document.paragraphs, placeholder_map)
-
-    # Add sections
-    add_section_to_template("WorkExperience", work_experience_data, {
-        "left": "company",
-        "below": ["title", "description"],
-    }, document, False)
-
-    replace_education_placeholder(document, education_data)
-
-    add_section_to_template("Certifications", certifications_data, {
-        "left": "issuer",
-        "below": "title",
-    }, document, True)
-
-    # Save the document
-    output_dir = os.path.join(os.getcwd(), 'static', 'cover_letter')
-    os.makedirs(output_dir, exist_ok=True)
-
-    job_title = job_data['job_title']
-    output_filename = f"{job_title.replace(' ', '_')}_resume_{datetime.now().strftime('%I_%M_%d_%m_%Y')}.docx"
-    output_path = os.path.join(output_dir, output_filename)
-
-    # Save the DOCX document
-    document.save(output_path)
-
-    # Define PDF output path and filename
-    pdf_output_filename = output_filename.replace('.docx', '.pdf')
-    pdf_output_path = os.path.join(output_dir, pdf_output_filename)
-
-    # Convert DOCX to PDF
-    convert_docx_to_pdf(output_path, pdf_output_path)
-
-    # Return the PDF directory and PDF filename
-    return os.path.dirname(pdf_output_path), pdf_output_filename
-
-
-def convert_docx_to_pdf(docx_path, pdf_path):
-    # Make sure the LibreOffice binary is in your PATH
-    # On Linux and macOS, the following command should work.
-    # On Windows, use the full path to LibreOffice (e.g., 'C:/Program Files/LibreOffice/program/soffice.exe')
-    
-    libreoffice_command = [
-        'libreoffice',  # Command to run LibreOffice
-        '--headless',   # Run in headless mode (no GUI)
-        '--convert-to', 'pdf',  # Convert to PDF
-        '--outdir', os.path.dirname(pdf_path),  # Specify output directory
-        docx_path  # Path to the input DOCX file
-    ]
-    
-    # Run the command
-    subprocess.run(libreoffice_command, check=True)
-    print(f"PDF saved successfully at {pdf_path}")
-
-
-def generate_cover_letter(job_data, user_id):
-    # Fetch user data from Supabase
-    user_data_response = supabase.table('user_job_preferences').select('*').eq('user_id', user_id).execute()
-    user_data = user_data_response.data
-    cover_letter_content = None
-
-    if not user_data:
-        flash("User data not found.", 'error')
-        return redirect(url_for('some_error_page'))
-
-    user_details = user_data[0]
-    if user_details.get('real_name') is None:
-        flash("Real name is missing", 'error')
-
-    full_name = user_details['real_name']
-    postnomial = user_details['postnomial']
-    phone_number = user_details.get('phone', '')
-    email = user_details['email']
-    current_city = user_details['current_city']
-    current_state = user_details['current_state']
-
-    # Format contact details
-    contact_details = f"{current_city}, {current_state}"
-    if phone_number:
-        contact_details += f" • {phone_number}"
-    contact_details += f" • {email}"
-
-    job_title = job_data['job_title']
-    company = job_data['company']
-    # Assuming `job_data` is available in the current context and contains the job description
-    job_description = job_data.get('job_description', "")
-
-    work_experience = supabase.table('work_experience').select('*').eq('profile_id', current_user.id).execute()
-    education = supabase.table('education').select('*').eq('profile_id', current_user.id).execute()
-    certifications = supabase.table('certifications').select('*').eq('profile_id', current_user.id).execute()
-    
-    # Extract relevant data from the responses
-    work_experience_data = [
-        {
-            "company": data['company'],
-            "title": data['title'],
-            "description": data.get('description'),
-            "start_month": data['start_month'],
-            "start_year": data['start_year'],
-            "end_month": data.get('end_month'),
-            "end_year": data.get('end_year'),
-        }
-        for data in work_experience.data or []
-    ]
-    
+        profile_fp = profile_fingerprint(current_user.id)
+        _, cached_filename = find_cached_document(job_id, doc_type, current_user.id, profile_fp)
+        if cached_filename:
+            return single_event('done', {'download_url': url_for('main.generate_doc_cached', job_id=job_id, doc_type=doc_type)})
+    except Exception as e:
+        logger.warning(f"Document cache lookup failed for job_id={job_id}: {str(e)}")
 
-    education_data = [
-        {
-            "institution": data['institution'],
-            "degree": data['degree'],
-            "field_of_study": data.get('field_of_study'),
-            "start_month": data['start_month'],
-            "start_year": data['start_year'],
-            "end_month": data.get('end_month'),
-            "end_year": data.get('end_year'),
-        }
-        for data in education.data or []
-    ]
-
-    certifications_data = [
-        {
-            "title": data['title'],
-            "issuer": data.get('issuer'),
-            "acquired_date": data['acquired_date'],
-        }
-        for data in certifications.data or []
-    ]
-    print(f"Job Description: f{job_description}, Company Name: {company}")
-    summary_prompt = f"""You are a job application cover letter writer. The user will send a job description and company name and the resume they will use to apply for the job. Generate a cover letter of approximately 300 words in length which appropriately draws upon the experiences described in the user's resume to position the user as an excellent candidate for the job. 
-
-Your writing style should draw from the Harvard Cover Letter Example I'm going to send below
-
-IMPORTANT: Do not include any variables or fields which may require user input. Do not include a date. Do not include the recipient address. Instead of starting with "Dear [Recipient Name]" you must write something like "Dear Hiring Committee"
-
-Sign the cover letter using details extrapolated from the user's resume. If you are unable to determine the details, you must use generic information. 
-
-Please output the cover letter responses without annotations, footnotes, or bracketed comments. Generate the letter only. Do not provide any intro or summary after generating the letter.
-
-Cover Letter Example:
-Dear Morgan Smith:
-I am a senior at Harvard College studying History and Literature. I am writing to apply for the
-Marketing and Communications position at Jumpstart posted in Harvard’s Crimson Careers
-database. I'm very excited about the field of education, and would welcome the opportunity to
-bring my strong communication skills, creativity, and marketing experience to your growing
-team.
-Jumpstart's commitment to early education for every child is of particular interest to me because
-of my passion for youth development. This past summer, I worked as a senior counselor in the
-Summer Urban Program, which is dedicated to preventing summer learning loss for children in
-the Boston and Cambridge area. I designed and taught fun, interactive classes to a group of 10
-fifth graders, and planned and led local field trips and workshops daily with a junior counselor.
-Throughout the summer, I consistently strived to create math, science, and reading lessons and
-activities that were engaging and tailored to my students' needs.
-Additionally, in my role as the Director of Marketing for the Social Innovation Collaborative, I
-led our team in creating a social media strategy to drive our member recruitment efforts and
-promote our programs and events on platforms including Facebook, Twitter, and Instagram.
-With so many competing events on campus each day, I had to continually be creative in my
-approach to developing and delivering content that would be compelling and effective. As a
-result of my efforts, our group experienced a 20% increase in our membership base and a 15%
-increase in our social media engagement. I’m excited at the prospect of bringing the skills I
-developed through this experience to the Marketing and Communications role at Jumpstart.
-Thank you for your consideration. I very much look forward to the opportunity to speak with you
-in person about my interest in this position.
-
-Work Experience: {work_experience}
-Education: {education}
-Certifications: {certifications}
-Applying to company: {company}
-
-Don't end the text with any "sincerely", "kind regards" or give any personal information at the end.
-"""
-
-    response = client.chat.completions.create(
-    model="gpt-4o-mini", # model = "deployment_name".
-    messages=[
-        {"role": "system", "content": summary_prompt},
-        {"role": "user", "content": f"Job Descriptions: {job_description}"}
-    ]
+    try:
+        task = generate_document_task.delay(job_id, doc_type, current_user.id, stream=True, profile_fp=profile_fp)
+        redis_client.set(_document_task_owner_key(task.id), str(current_user.id), ex=DOCUMENT_TASK_TTL)
+    except Exception as e:
+        logger.exception(f"Error queueing document for job_id={job_id}: {str(e)}")
+        return single_event('error', {'error': "An error occurred while generating the document."})
+
+    download_url = url_for('main.generate_doc_download', task_id=task.id)
+
+    def events():
+        yield format_sse('queued', {'task_id': task.id})
+        for event, data in iter_events(task.id):
+            if event == 'heartbeat':
+                yield ": keep-alive\n\n"
+                continue
+            if event == 'done':
+                data = {'download_url': download_url}
+            yield format_sse(event, data)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
 
-    cover_letter_content = response.choices[0].message.content   
-    # # Generate company address
-    # openai_url = f"{os.getenv('AZURE_OPENAI_ENDPOINT_COVER_LETTER')}/openai/deployments/gpt-4o-mini/chat/completions?api-version=2024-05-01-preview"
-    # headers = {
-    #     "Authorization": f"Bearer {token_provider.get_token()}",
-    #     "Content-Type": "application/json"
-    # }
-
-    return_address_prompt = f"""
-Provide the formatted U.S. address for the following company for use in a cover letter. 
-The address should be in the following format:
 
-Company Name  
-Street Address  
-City, State ZIP Code
-
-If you do not know the address for this company, find it. If there are too many companies with the same name, just give the output only the name of the company and nothing else in this format:
+@main_bp.route('/generate_doc/cached/<job_id>/<doc_type>', methods=['GET'])
+@login_required
+def generate_doc_cached(job_id, doc_type):
+    """Serves the stored document for the user's current profile, if there is one."""
+    if doc_type not in DOCUMENT_TYPES:
+        flash("Invalid parameters for document generation.", "error")
+        return redirect(url_for('main.jobs'))
 
-Company Name
-    """
+    _, cached_filename = find_cached_document(job_id, doc_type, current_user.id)
+    if not cached_filename:
+        flash("Document not found.", "error")
+        return redirect(url_for('main.jobs'))
 
-    response = client.chat.completions.create(
-    model="gpt-4o-mini", # model = "deployment_name".
-    messages=[
-        {"role": "system", "content": return_address_prompt},
-        {"role": "user", "content": f"Company Name: {company}"}
-    ]
+    return send_from_directory(
+        directory=DOCUMENT_OUTPUT_DIR,
+        path=cached_filename,
+        as_attachment=True
     )
 
-    company_address = response.choices[0].message.content
-
-
-    # openai_payload_address = {
-    #     "prompt": return_address_prompt,
-    #     "max_tokens": 100,
-    #     "temperature": 0.2
-    # }
-    # response_address = requests.post(openai_url, headers=headers, json=openai_payload_address)
-    # if response_address.status_code != 200:
-    #     flash("Error generating company address: " + response_address.text, 'error')
-    #     return redirect(url_for('home'))
-
-    # address_response = response_address.json()
-    # company_address = address_response['choices'][0]['text'].strip()
-
-    # Prepare placeholders for template replacement
-    current_time = datetime.now().strftime("%m-%d-%Y")
-    user_details_dict = {
-        '$FULLNAME': full_name,
-        '$POSTNOMIAL': postnomial,
-        '$CONTACTDETAILS': contact_details,
-        '$DATETIME': current_time,
-        '$COMPANY_LOCATION': company_address,
-        '$USER_LOCATION': f"{current_city}, {current_state}",
-        '$SUMMARY': cover_letter_content,
-        '$EMAIL': email,
-        '$PHONENUMBER': phone_number
-    }
-
-    # Load and modify the Word template
-    template_path = os.path.join(os.path.dirname(__file__), 'docs', 'cover_letter_template.docx')
-    document = Document(template_path)
-    for paragraph in document.paragraphs:
-        for placeholder, value in user_details_dict.items():
-            # Ensure that the value is a string, replacing None with an empty string
-            if value is None:
-                value = ''  # Or use a default string like 'N/A' if preferred
-            if placeholder in paragraph.text:
-                paragraph.text = paragraph.text.replace(placeholder, value)
-            
-            # Now, update the font size for the paragraph's runs to 10Pt
-            for run in paragraph.runs:
-                run.font.size = Pt(10)
-
-
-    # Replace placeholders in headers
-    for section in document.sections:
-        header = section.header
-        replace_placeholders(header.paragraphs, user_details_dict)
-
-    output_dir = os.path.join(os.getcwd(), 'static', 'cover_letter')
-    os.makedirs(output_dir, exist_ok=True)
-
-    output_filename = f"{job_title.replace(' ', '_')}_cover_letter_{datetime.now().strftime('%I_%M_%d_%m_%Y')}.docx"
-    output_path = os.path.join(output_dir, output_filename)
-
-
-    # Save the DOCX document
-    document.save(output_path)
-
-    # Define PDF output path and filename
-    pdf_output_filename = output_filename.replace('.docx', '.pdf')
-    pdf_output_path = os.path.join(output_dir, pdf_output_filename)
 
-    # Convert DOCX to PDF
-    convert_docx_to_pdf(output_path, pdf_output_path)
-
-    # Return the PDF directory and PDF filename
-    return os.path.dirname(pdf_output_path), pdf_output_filename
+@main_bp.route('/generate_doc/status/<task_id>', methods=['GET'])
+@login_required
+def generate_doc_status(task_id):
+    """Reports the state of a queued document: pending, ready or failed."""
+    if not _owns_document_task(task_id):
+        return jsonify({'error': "Document not found."}), 404
 
+    result = generate_document_task.AsyncResult(task_id)
+    if result.successful():
+        return jsonify({'status': 'ready', 'download_url': url_for('main.generate_doc_download', task_id=task_id)})
+    if result.failed():
+        error = str(result.result) if isinstance(result.result, DocumentGenerationError) else "An error occurred while generating the document."
+        return jsonify({'status': 'failed', 'error': error})
+    return jsonify({'status': 'pending'})
 
 
-@main_bp.route('/generate_doc/<job_id>/<doc_type>', methods=['GET'])
+@main_bp.route('/generate_doc/download/<task_id>', methods=['GET'])
 @login_required
-def generate_doc(job_id, doc_type):
-    is_subscribed = current_user.is_subscribed if not current_user.is_anonymous else False
-
-    if not is_subscribed:
-        flash("You need to buy a subscription to use this feature.", "error")
+def generate_doc_download(task_id):
+    """Serves a finished document."""
+    if not _owns_document_task(task_id):
+        flash("Document not found.", "error")
         return redirect(url_for('main.jobs'))
 
-    if not job_id or doc_type not in ['resume', 'cover_letter']:
-        flash("Invalid parameters for document generation.", "error")
+    result = generate_document_task.AsyncResult(task_id)
+    if not result.successful():
+        flash("The document is not ready yet.", "error")
         return redirect(url_for('main.jobs'))
 
-    try:
-        # Fetch job details from the database using the job_id
-        job_response = supabase.table('job_postings').select('*').eq('id', job_id).execute()
-        job_data = job_response.data[0] if job_response.data else None
-        print(job_data)
-
-        if not job_data:
-            raise ValueError("Job not found.")
-
-        # Fetch the resume_template_path from the profiles table for the logged-in user
-        user_id = current_user.id  # Assuming current_user.id gives the logged-in user's ID
-
-
-        # Generate the document based on the type
-        if doc_type == 'resume':
-            document_dir, document_filename = generate_resume(job_data, user_id)
-        elif doc_type == 'cover_letter':
-            document_dir, document_filename = generate_cover_letter(job_data, user_id)
-
-        print(document_dir, document_filename)
-        # Serve the file for download
-        return send_from_directory(
-            directory=document_dir,
-            path=document_filename,
-            as_attachment=True
-        )
-
-    except Exception as e:
-        flash("An error occurred while generating the document.", "error")
-        logger.exception(f"Error generating document for job_id={job_id}: {str(e)}")
-        return redirect(url_for('main.jobs'))
+    return send_from_directory(
+        directory=DOCUMENT_OUTPUT_DIR,
+        path=result.result['filename'],
+        as_attachment=True
+    )
 
@@ -0,0 +1,252 @@
+# app/scrape_archive.py
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import urllib.parse
+from datetime import date, datetime, timedelta, timezone
+from redis.exceptions import RedisError
+from .extensions import config, logger, supabase, redis_client
+
+# Raw ScrapingBee payloads (Hiring Cafe search-jobs bodies, job page texts) are kept gzip-compressed
+# under blobs/<date>/ and their SHA-256, so changed parsing or extraction can be re-applied without
+# scraping again. Each scrape also writes a small manifest entry under manifests/<date>/<kind>/<location>/,
+# so the archive can be replayed by date range and location. Identical payloads scraped on the same
+# day are stored once; whole days are pruned after SCRAPE_ARCHIVE_RETENTION_DAYS.
+#
+# Storage is a local directory (SCRAPE_ARCHIVE_DIR, shared by the workers) or, when
+# SCRAPE_ARCHIVE_BUCKET is set, a Supabase Storage bucket with the same layout.
+SCRAPE_ARCHIVE_ENABLED = config('SCRAPE_ARCHIVE_ENABLED', default=True, cast=bool)
+SCRAPE_ARCHIVE_DIR = config('SCRAPE_ARCHIVE_DIR', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scrape_archive'))
+SCRAPE_ARCHIVE_BUCKET = config('SCRAPE_ARCHIVE_BUCKET', default='')
+SCRAPE_ARCHIVE_RETENTION_DAYS = config('SCRAPE_ARCHIVE_RETENTION_DAYS', default=90, cast=int)
+SCRAPE_ARCHIVE_COMPRESSION_LEVEL = 6
+
+HIRING_CAFE = 'hiring_cafe'  # payload: the search-jobs response body (JSON text), location: the searched location
+PAGE_TEXT = 'page_text'  # payload: text scraped from a job posting page, location: the page's host
+ARCHIVE_KINDS = (HIRING_CAFE, PAGE_TEXT)
+
+ARCHIVE_STATS_KEY = 'scrapearchive:stats'
+# Marks blobs already written today, so deduplication never has to list the storage
+BLOB_MARKER_PREFIX = 'scrapearchive:blob:'
+BLOB_MARKER_TTL = 2 * 86400  # seconds; longer than the day a blob path belongs to
+STORAGE_LIST_LIMIT = 1000
+STORAGE_REMOVE_BATCH = 100
+DATE_FOLDER_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9.-]+", "-", str(value or 'unknown').lower()).strip('-') or 'unknown'
+
+
+def _blob_path(digest, day):
+    return f"blobs/{day}/{digest[:2]}/{digest}.gz"
+
+
+def _record(field, amount=1):
+    try:
+        redis_client.hincrby(ARCHIVE_STATS_KEY, field, amount)
+    except RedisError:
+        pass
+
+
+def _claim_blob(path):
+    """True when the blob still has to be written (first time today), False for a duplicate."""
+    try:
+        return bool(redis_client.set(f"{BLOB_MARKER_PREFIX}{path}", 1, nx=True, ex=BLOB_MARKER_TTL))
+    except RedisError:
+        # Writing again is harmless: blobs are content-addressed and uploads overwrite
+        return True
+
+
+def _release_blob(path):
+    try:
+        redis_client.delete(f"{BLOB_MARKER_PREFIX}{path}")
+    except RedisError:
+        pass
+
+
+# Storage backends: the same relative paths on local disk or in the bucket
+
+
+def _write(path, data, content_type):
+    if SCRAPE_ARCHIVE_BUCKET:
+        supabase.storage.from_(SCRAPE_ARCHIVE_BUCKET).upload(path, data, {'content-type': content_type, 'upsert': 'true'})
+        return
+    full_path = os.path.join(SCRAPE_ARCHIVE_DIR, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    # Write then rename, so a reader never sees a partial file
+    temp_path = f"{full_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, full_path)
+
+
+def _read(path):
+    if SCRAPE_ARCHIVE_BUCKET:
+        return supabase.storage.from_(SCRAPE_ARCHIVE_BUCKET).download(path)
+    with open(os.path.join(SCRAPE_ARCHIVE_DIR, path), 'rb') as f:
+        return f.read()
+
+
+def _list(folder):
+    """Names directly under folder (files and sub-folders)."""
+    if SCRAPE_ARCHIVE_BUCKET:
+        bucket = supabase.storage.from_(SCRAPE_ARCHIVE_BUCKET)
+        names, offset = [], 0
+        while True:
+            items = bucket.list(folder, {'limit': STORAGE_LIST_LIMIT, 'offset': offset, 'sortBy': {'column': 'name', 'order': 'asc'}})
+            names.extend(item['name'] for item in items)
+            if len(items) < STORAGE_LIST_LIMIT:
+                return names
+            offset += STORAGE_LIST_LIMIT
+    full_path = os.path.join(SCRAPE_ARCHIVE_DIR, folder)
+    return sorted(os.listdir(full_path)) if os.path.isdir(full_path) else []
+
+
+def _bucket_files(folder):
+    """Paths of every file under a bucket folder (folders are listed without an id)."""
+    bucket = supabase.storage.from_(SCRAPE_ARCHIVE_BUCKET)
+    paths, offset = [], 0
+    while True:
+        items = bucket.list(folder, {'limit': STORAGE_LIST_LIMIT, 'offset': offset})
+        for item in items:
+            path = f"{folder}/{item['name']}"
+            if item.get('id') is None:
+                paths.extend(_bucket_files(path))
+            else:
+                paths.append(path)
+        if len(items) < STORAGE_LIST_LIMIT:
+            return paths
+        offset += STORAGE_LIST_LIMIT
+
+
+def _remove_folder(folder):
+    if SCRAPE_ARCHIVE_BUCKET:
+        paths = _bucket_files(folder)
+        bucket = supabase.storage.from_(SCRAPE_ARCHIVE_BUCKET)
+        for i in range(0, len(paths), STORAGE_REMOVE_BATCH):
+            bucket.remove(paths[i:i + STORAGE_REMOVE_BATCH])
+        return
+    shutil.rmtree(os.path.join(SCRAPE_ARCHIVE_DIR, folder), ignore_errors=True)
+
+
+def archive_location(kind, source):
+    """Manifest folder name: the searched location for Hiring Cafe, the host for job pages."""
+    if kind == PAGE_TEXT:
+        return _slug(urllib.parse.urlsplit(source).netloc)
+    return _slug(source)
+
+
+def archive_payload(kind, source, payload, scraped_at=None):
+    """
+    Stores a raw payload (str or bytes) and its manifest entry. Returns the payload's digest, or
+    None when archiving is disabled or fails: archiving never fails a scrape.
+
+    :param kind: HIRING_CAFE or PAGE_TEXT
+    :param source: the location searched (Hiring Cafe) or the page URL (job pages)
+    """
+    if not SCRAPE_ARCHIVE_ENABLED or not payload:
+        return None
+    data = payload.encode('utf-8') if isinstance(payload, str) else payload
+    digest = hashlib.sha256(data).hexdigest()
+    scraped_at = scraped_at or datetime.now(timezone.utc)
+    blob_path = _blob_path(digest, scraped_at.date().isoformat())
+    try:
+        stored_size = None
+        if _claim_blob(blob_path):
+            compressed = gzip.compress(data, compresslevel=SCRAPE_ARCHIVE_COMPRESSION_LEVEL)
+            try:
+                _write(blob_path, compressed, 'application/gzip')
+            except Exception:
+                _release_blob(blob_path)
+                raise
+            stored_size = len(compressed)
+            _record('stored_bytes', stored_size)
+        else:
+            _record('deduplicated')
+        entry = {
+            'digest': digest,
+            'blob': blob_path,
+            'kind': kind,
+            'source': source,
+            'location': archive_location(kind, source),
+            'scraped_at': scraped_at.isoformat(),
+            'size': len(data),
+            'stored_size': stored_size,
+        }
+        manifest_path = f"manifests/{scraped_at.date().isoformat()}/{kind}/{entry['location']}/{scraped_at.strftime('%H%M%S%f')}-{digest[:16]}.json"
+        _write(manifest_path, json.dumps(entry).encode('utf-8'), 'application/json')
+        _record('archived')
+        _record('raw_bytes', len(data))
+    except Exception as e:
+        logger.warning(f"Unable to archive {kind} payload for {source}: {e}")
+        _record('failed')
+        return None
+    return digest
+
+
+def load_payload(entry):
+    """The archived payload of a manifest entry (from iter_manifest), as text."""
+    # Entries written before blobs were grouped by day have no 'blob'
+    blob_path = entry.get('blob') or f"blobs/{entry['digest'][:2]}/{entry['digest']}.gz"
+    return gzip.decompress(_read(blob_path)).decode('utf-8')
+
+
+def _date_range(start_date, end_date):
+    start_date = date.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+    end_date = date.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+    end_date = end_date or datetime.now(timezone.utc).date()
+    start_date = start_date or end_date
+    day = start_date
+    while day <= end_date:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def iter_manifest(kind, start_date=None, end_date=None, locations=None):
+    """
+    Manifest entries of one kind between two dates (inclusive, ISO strings or dates; default: today),
+    newest first, optionally limited to some locations (as passed to archive_payload).
+    """
+    wanted = {archive_location(kind, location) if kind == HIRING_CAFE else _slug(location) for location in locations} if locations else None
+    for day in sorted(_date_range(start_date, end_date), reverse=True):
+        for location in _list(f"manifests/{day}/{kind}"):
+            if wanted and location not in wanted:
+                continue
+            folder = f"manifests/{day}/{kind}/{location}"
+            for name in sorted(_list(folder), reverse=True):
+                if name.endswith('.json'):
+                    yield json.loads(_read(f"{folder}/{name}"))
+
+
+def prune_scrape_archive(retention_days=None):
+    """Removes the manifests and blobs of days older than the retention period. Returns the days removed."""
+    retention_days = retention_days if retention_days is not None else SCRAPE_ARCHIVE_RETENTION_DAYS
+    cutoff = (datetime.now(timezone.utc).date() - timedelta(days=retention_days)).isoformat()
+    removed = set()
+    for root in ('manifests', 'blobs'):
+        for day in _list(root):
+            if DATE_FOLDER_PATTERN.match(day) and day < cutoff:
+                _remove_folder(f"{root}/{day}")
+                removed.add(day)
+    if removed:
+        logger.info(f"Pruned {len(removed)} days from the scrape archive (before {cutoff}).")
+        _record('pruned_days', len(removed))
+    return len(removed)
+
+
+def get_scrape_archive_stats():
+    """Payloads archived, duplicates stored once, failures and raw vs stored bytes (compression ratio)."""
+    try:
+        raw = redis_client.hgetall(ARCHIVE_STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read scrape archive stats: {e}")
+        return {}
+    stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+    if stats.get('stored_bytes'):
+        stats['compression_ratio'] = round(stats.get('raw_bytes', 0) / stats['stored_bytes'], 2)
+    return stats
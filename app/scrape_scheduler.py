@@ -0,0 +1,179 @@
+# app/scrape_scheduler.py
+
+import time
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+
+# Each location has its own next-scrape time in a Redis sorted set. After every scrape the interval
+# is recomputed from the location's yield (new jobs per hour, smoothed) so that a scrape finds about
+# HIRING_CAFE_TARGET_NEW_PER_SCRAPE new jobs: busy markets are polled more often, quiet ones less.
+# Intervals stay within [min, max] and are stretched when the projected ScrapingBee spend of all
+# locations exceeds the daily credit budget.
+HIRING_CAFE_MIN_INTERVAL = config('HIRING_CAFE_MIN_INTERVAL', default=600, cast=int)  # seconds; below the old fixed 1440
+HIRING_CAFE_MAX_INTERVAL = config('HIRING_CAFE_MAX_INTERVAL', default=86400, cast=int)  # seconds
+HIRING_CAFE_TARGET_NEW_PER_SCRAPE = config('HIRING_CAFE_TARGET_NEW_PER_SCRAPE', default=10, cast=float)
+# Default: what the previous fixed schedule spent (39 states every 1440 s at 5 credits a scrape)
+HIRING_CAFE_DAILY_CREDIT_BUDGET = config('HIRING_CAFE_DAILY_CREDIT_BUDGET', default=39 * 60 * 5, cast=int)
+HIRING_CAFE_INITIAL_INTERVAL = 1440  # seconds, for locations without history
+YIELD_SMOOTHING = 0.3  # weight of the latest scrape in the smoothed yield and latency
+# A dispatched location is not due again for this long, unless its scrape reports back sooner.
+# Its task renews the lease on every attempt, so waiting for a free slot never lets it lapse.
+DISPATCH_LEASE = 900  # seconds; longer than one location scrape
+# Consecutive failures double the retry interval, starting from the minimum, up to the maximum
+FAILURE_BACKOFF_FACTOR = 2
+
+SCHEDULE_KEY = 'hiringcafe:schedule'
+DAILY_CREDITS_KEY = 'hiringcafe:daily_credits'
+LOCATION_STATS_PREFIX = 'hiringcafe:location:'
+
+# Claims the locations that are due (or were never scheduled) by pushing their next time out by the
+# lease, so a location is never dispatched twice. KEYS[1] schedule zset; ARGV: now, lease, locations...
+CLAIM_DUE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local claimed = {}
+for i = 3, #ARGV do
+    local due = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if not due or tonumber(due) <= now then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[i])
+        table.insert(claimed, ARGV[i])
+    end
+end
+return claimed
+"""
+
+_claim_due = redis_client.register_script(CLAIM_DUE_SCRIPT)
+
+
+def claim_due_locations(locations):
+    """Returns the locations due for a scrape now and marks them as dispatched."""
+    try:
+        claimed = _claim_due(keys=[SCHEDULE_KEY], args=[time.time(), DISPATCH_LEASE, *locations])
+    except RedisError as e:
+        logger.warning(f"Scrape scheduler unavailable, scraping every location: {e}")
+        return list(locations)
+    return [location.decode('utf-8') if isinstance(location, bytes) else location for location in claimed]
+
+
+def renew_dispatch_lease(location):
+    """Keeps a dispatched location from falling due while its task waits for a slot or runs."""
+    try:
+        # XX: only a location that is still scheduled; GT: never pull an already later time forward
+        redis_client.zadd(SCHEDULE_KEY, {location: time.time() + DISPATCH_LEASE}, xx=True, gt=True)
+    except RedisError as e:
+        logger.warning(f"Unable to renew the dispatch lease of {location}: {e}")
+
+
+def _smooth(previous, sample):
+    return sample if previous is None else YIELD_SMOOTHING * sample + (1 - YIELD_SMOOTHING) * previous
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _projected_daily_credits(exclude):
+    """ScrapingBee credits a day at the current intervals of every location except `exclude`."""
+    entries = redis_client.zrange(DAILY_CREDITS_KEY, 0, -1, withscores=True)
+    return sum(score for member, score in entries if member.decode('utf-8') != exclude)
+
+
+def next_interval(new_per_hour, credits, other_daily_credits):
+    """Seconds until the next scrape of a location, given its smoothed yield and cost per scrape."""
+    if new_per_hour <= 0:
+        interval = HIRING_CAFE_MAX_INTERVAL
+    else:
+        interval = HIRING_CAFE_TARGET_NEW_PER_SCRAPE / new_per_hour * 3600
+    interval = min(max(interval, HIRING_CAFE_MIN_INTERVAL), HIRING_CAFE_MAX_INTERVAL)
+    return _within_budget(interval, credits, other_daily_credits)
+
+
+def failure_interval(consecutive_failures, credits, other_daily_credits):
+    """Seconds until a location that keeps failing is tried again: exponential backoff, within the budget."""
+    interval = HIRING_CAFE_MIN_INTERVAL * FAILURE_BACKOFF_FACTOR ** max(consecutive_failures - 1, 0)
+    return _within_budget(min(interval, HIRING_CAFE_MAX_INTERVAL), credits, other_daily_credits)
+
+
+def _within_budget(interval, credits, other_daily_credits):
+    """Stretches an interval when this location would push the projected spend over the daily budget."""
+    remaining_budget = HIRING_CAFE_DAILY_CREDIT_BUDGET - other_daily_credits
+    if credits and remaining_budget > 0 and credits * 86400 / interval > remaining_budget:
+        interval = min(credits * 86400 / remaining_budget, HIRING_CAFE_MAX_INTERVAL)
+    elif credits and remaining_budget <= 0:
+        interval = HIRING_CAFE_MAX_INTERVAL
+    return interval
+
+
+def record_scrape(location, new_jobs, credits, latency, failed=False):
+    """
+    Records one scrape of a location (yield, ScrapingBee credits, latency) and schedules the next.
+    A failed scrape leaves the yield alone and is retried with exponential backoff; its credits
+    count toward the projected daily spend like any other scrape. Returns the seconds until the next scrape.
+    """
+    now = time.time()
+    stats_key = f"{LOCATION_STATS_PREFIX}{location}"
+    try:
+        state = redis_client.hgetall(stats_key)
+        state = {k.decode('utf-8'): v.decode('utf-8') for k, v in state.items()}
+        if failed:
+            consecutive_failures = int(state.get('consecutive_failures') or 0) + 1
+            interval = failure_interval(consecutive_failures, credits, _projected_daily_credits(exclude=location))
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(stats_key, mapping={'consecutive_failures': consecutive_failures, 'interval': round(interval)})
+            pipe.hincrby(stats_key, 'failures', 1)
+            pipe.hincrbyfloat(stats_key, 'credits', credits)
+            if credits:
+                pipe.zadd(DAILY_CREDITS_KEY, {location: credits * 86400 / interval})
+            pipe.zadd(SCHEDULE_KEY, {location: now + interval})
+            pipe.execute()
+            logger.warning(f"Scrape of {location} failed ({consecutive_failures} in a row), retrying in {round(interval)}s")
+            return interval
+
+        last_scraped = _float(state.get('last_scraped'))
+        elapsed_hours = max((now - last_scraped) if last_scraped else HIRING_CAFE_INITIAL_INTERVAL, 60) / 3600
+        new_per_hour = _smooth(_float(state.get('new_per_hour')), new_jobs / elapsed_hours)
+        avg_latency = _smooth(_float(state.get('avg_latency')), latency)
+        interval = next_interval(new_per_hour, credits, _projected_daily_credits(exclude=location))
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(stats_key, mapping={
+            'last_scraped': now,
+            'new_per_hour': round(new_per_hour, 4),
+            'avg_latency': round(avg_latency, 3),
+            'interval': round(interval),
+            'last_new': new_jobs,
+            'consecutive_failures': 0,
+        })
+        pipe.hincrby(stats_key, 'scrapes', 1)
+        pipe.hincrby(stats_key, 'new_jobs', new_jobs)
+        pipe.hincrbyfloat(stats_key, 'credits', credits)
+        pipe.zadd(DAILY_CREDITS_KEY, {location: credits * 86400 / interval})
+        pipe.zadd(SCHEDULE_KEY, {location: now + interval})
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to record the scrape of {location}; it will be scraped on the next pass: {e}")
+        return 0
+    return interval
+
+
+def get_scrape_schedule_stats():
+    """Locations scheduled and due, projected daily credits against the budget, and the shortest/longest intervals."""
+    try:
+        entries = redis_client.zrange(DAILY_CREDITS_KEY, 0, -1, withscores=True)
+        scheduled = redis_client.zcard(SCHEDULE_KEY)
+        due = redis_client.zcount(SCHEDULE_KEY, '-inf', time.time())
+        locations = [member.decode('utf-8') for member, _ in entries]
+        pipe = redis_client.pipeline(transaction=False)
+        for location in locations:
+            pipe.hget(f"{LOCATION_STATS_PREFIX}{location}", 'interval')
+        intervals = {location: int(float(value)) for location, value in zip(locations, pipe.execute()) if value}
+    except RedisError as e:
+        logger.warning(f"Unable to read scrape schedule stats: {e}")
+        return {}
+    return {
+        'scheduled': scheduled,
+        'due': due,
+        'projected_daily_credits': round(sum(score for _, score in entries)),
+        'daily_credit_budget': HIRING_CAFE_DAILY_CREDIT_BUDGET,
+        'shortest_interval': min(intervals.items(), key=lambda item: item[1]) if intervals else None,
+        'longest_interval': max(intervals.items(), key=lambda item: item[1]) if intervals else None,
+    }
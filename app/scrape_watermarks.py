@@ -0,0 +1,78 @@
+# app/scrape_watermarks.py
+
+from datetime import datetime
+from redis.exceptions import RedisError
+from .extensions import config, logger, redis_client
+
+# Per-location high-water mark of the newest publish date (epoch milliseconds) already ingested.
+# Results published at or before (watermark - overlap) are skipped before any parsing or embedding;
+# the overlap re-reads a short window because publish dates are estimates, and the seen-jobs filter
+# drops whatever in that window was already stored.
+WATERMARKS_KEY = 'hiringcafe:watermarks'
+WATERMARK_OVERLAP_SECONDS = config('HIRING_CAFE_WATERMARK_OVERLAP_SECONDS', default=6 * 3600, cast=int)
+
+# Sets the field only if the new value is higher, so concurrent or out-of-order runs never move it back.
+# KEYS[1] watermark hash; ARGV: location, timestamp
+ADVANCE_WATERMARK_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local candidate = tonumber(ARGV[2])
+if candidate > current then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return ARGV[2]
+end
+return tostring(current)
+"""
+
+_advance_watermark = redis_client.register_script(ADVANCE_WATERMARK_SCRIPT)
+
+
+def publish_timestamp(job_data):
+    """Publish time of a Hiring Cafe search result in epoch milliseconds, or None if it has none."""
+    workplace_data = job_data.get('v5_processed_job_data') or {}
+    if workplace_data.get('estimated_publish_date_millis'):
+        return int(workplace_data['estimated_publish_date_millis'])
+    if workplace_data.get('estimated_publish_date'):
+        try:
+            published = datetime.fromisoformat(workplace_data['estimated_publish_date'].replace("Z", "+00:00"))
+            return int(published.timestamp() * 1000)
+        except ValueError:
+            return None
+    return None
+
+
+def get_watermark(location):
+    """The location's watermark in epoch milliseconds (0 when it has never been scraped)."""
+    try:
+        value = redis_client.hget(WATERMARKS_KEY, location)
+    except RedisError as e:
+        logger.warning(f"Unable to read the scrape watermark for {location}, processing every result: {e}")
+        return 0
+    return int(value) if value else 0
+
+
+def filter_after_watermark(location, job_results):
+    """
+    Splits search results into the ones newer than the location's watermark (kept, in order) and
+    the number skipped. Results without a publish date are always kept.
+    """
+    cutoff = get_watermark(location) - WATERMARK_OVERLAP_SECONDS * 1000
+    if cutoff <= 0:
+        return list(job_results), 0
+    kept = []
+    for job_data in job_results:
+        published = publish_timestamp(job_data)
+        if published is None or published > cutoff:
+            kept.append(job_data)
+    return kept, len(job_results) - len(kept)
+
+
+def advance_watermark(location, job_results):
+    """Moves the location's watermark up to the newest publish date in job_results. Call once the page is stored."""
+    timestamps = [ts for ts in (publish_timestamp(job_data) for job_data in job_results) if ts]
+    if not timestamps:
+        return None
+    try:
+        return int(_advance_watermark(keys=[WATERMARKS_KEY], args=[location, max(timestamps)]))
+    except RedisError as e:
+        logger.warning(f"Unable to advance the scrape watermark for {location}: {e}")
+        return None
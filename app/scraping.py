@@ -0,0 +1,148 @@
+# app/scraping.py
+
+import asyncio
+import os
+import time
+import httpx
+from scrapingbee.utils import DEFAULT_HEADERS, process_params
+from .extensions import config, logger, scrapingbee_api_key
+from .rate_limiter import acquire_scrapingbee, acquire_scrapingbee_async, report_throttled, retry_after_from_headers, RATE_LIMIT_MAX_ATTEMPTS
+
+# Requests go straight to the ScrapingBee HTTP API over pooled keep-alive connections instead of
+# ScrapingBeeClient, which opens a new session (and TLS handshake) for every page.
+# Point SCRAPINGBEE_API_URL at a local stub server for tests and benchmarks (see scrapingbee_stub.py).
+SCRAPINGBEE_API_URL = config('SCRAPINGBEE_API_URL', default='https://app.scrapingbee.com/api/v1/')
+# Scrapes in flight per worker process; ScrapingBee plans cap concurrent requests per account as well
+SCRAPINGBEE_CONCURRENCY = config('SCRAPINGBEE_CONCURRENCY', default=10, cast=int)
+# Per-request timeout; pages rendered with JS regularly take 20-60 s on ScrapingBee's side
+SCRAPINGBEE_TIMEOUT = config('SCRAPINGBEE_TIMEOUT', default=140.0, cast=float)
+SCRAPINGBEE_CONNECT_TIMEOUT = 10.0
+SCRAPINGBEE_KEEPALIVE_EXPIRY = 60.0  # seconds an idle pooled connection is kept open
+
+# Parameters for the text of a job posting page
+PAGE_TEXT_PARAMS = {
+    'extract_rules': {"text": "body"},
+    'render_js': True,
+    'wait': 1000
+}
+
+# Clients are created lazily per process (Celery forks its workers after import) and, for the async
+# one, per event loop, since an httpx.AsyncClient can't be shared across loops.
+_sync_client = {'pid': None, 'client': None}
+_async_transport = {'pid': None, 'loop': None, 'client': None, 'semaphore': None, 'own_loop': None, 'own_loop_pid': None}
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=SCRAPINGBEE_CONCURRENCY,
+        max_keepalive_connections=SCRAPINGBEE_CONCURRENCY,
+        keepalive_expiry=SCRAPINGBEE_KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout():
+    return httpx.Timeout(SCRAPINGBEE_TIMEOUT, connect=SCRAPINGBEE_CONNECT_TIMEOUT)
+
+
+def _query(url, params):
+    """Query string parameters for the API, encoded the way ScrapingBeeClient does (extract_rules as JSON, ...)."""
+    return process_params({'api_key': scrapingbee_api_key, 'url': url, **(params or {})})
+
+
+def get_sync_client():
+    if _sync_client['pid'] != os.getpid() or _sync_client['client'] is None:
+        _sync_client['client'] = httpx.Client(limits=_limits(), timeout=_timeout(), headers=DEFAULT_HEADERS)
+        _sync_client['pid'] = os.getpid()
+    return _sync_client['client']
+
+
+def _get_async_transport():
+    """The shared AsyncClient and concurrency semaphore of the running event loop."""
+    loop = asyncio.get_running_loop()
+    if _async_transport['pid'] != os.getpid() or _async_transport['loop'] is not loop:
+        _async_transport.update(
+            pid=os.getpid(),
+            loop=loop,
+            client=httpx.AsyncClient(limits=_limits(), timeout=_timeout(), headers=DEFAULT_HEADERS),
+            semaphore=asyncio.Semaphore(SCRAPINGBEE_CONCURRENCY)
+        )
+    return _async_transport['client'], _async_transport['semaphore']
+
+
+def scrapingbee_get(url, params):
+    """
+    GET through the ScrapingBee API, gated by the cluster-wide ScrapingBee credit bucket.
+
+    A 429 (too many concurrent requests / credits exhausted) tightens the shared bucket for all
+    workers and the request is retried once the bucket allows it, instead of every worker retrying at once.
+    """
+    client = get_sync_client()
+    for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+        acquire_scrapingbee(params)
+        response = client.get(SCRAPINGBEE_API_URL, params=_query(url, params))
+        if response.status_code != 429:
+            return response
+        logger.warning(f"ScrapingBee throttled request for {url} (attempt {attempt}/{RATE_LIMIT_MAX_ATTEMPTS})")
+        report_throttled('scrapingbee:credits', retry_after_from_headers(response.headers))
+    return response
+
+
+async def scrapingbee_get_async(url, params):
+    """
+    Async scrapingbee_get(): at most SCRAPINGBEE_CONCURRENCY requests of the process are in flight
+    and they share one pool of keep-alive connections. Timeouts and connection errors raise httpx errors.
+    """
+    client, semaphore = _get_async_transport()
+    async with semaphore:
+        for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+            await acquire_scrapingbee_async(params)
+            response = await client.get(SCRAPINGBEE_API_URL, params=_query(url, params))
+            if response.status_code != 429:
+                return response
+            logger.warning(f"ScrapingBee throttled request for {url} (attempt {attempt}/{RATE_LIMIT_MAX_ATTEMPTS})")
+            await asyncio.to_thread(report_throttled, 'scrapingbee:credits', retry_after_from_headers(response.headers))
+    return response
+
+
+async def _scrape_or_none(url, params):
+    try:
+        return await scrapingbee_get_async(url, params)
+    except Exception as e:
+        logger.error(f"Error scraping {url}: {e}")
+        return None
+
+
+async def scrapingbee_get_many_async(urls, params):
+    """Scrapes every URL concurrently. Returns one response per URL in input order, None where the request failed."""
+    return await asyncio.gather(*[_scrape_or_none(url, params) for url in urls])
+
+
+def _event_loop():
+    """The process's scraping event loop. It lives as long as the worker process, so pooled
+    connections are reused across batches instead of being closed with each asyncio.run()."""
+    loop = _async_transport.get('own_loop')
+    if _async_transport.get('own_loop_pid') != os.getpid() or loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _async_transport.update(own_loop=loop, own_loop_pid=os.getpid())
+    return loop
+
+
+def scrapingbee_get_many(urls, params):
+    """Synchronous entry point so a single Celery task keeps a whole batch of scrapes in flight."""
+    started = time.monotonic()
+    responses = _event_loop().run_until_complete(scrapingbee_get_many_async(urls, params))
+    succeeded = sum(1 for response in responses if response is not None and response.status_code == 200)
+    logger.info(f"Scraped {succeeded}/{len(urls)} pages in {time.monotonic() - started:.2f}s (concurrency={SCRAPINGBEE_CONCURRENCY})")
+    return responses
+
+
+def page_text_from_response(url, response):
+    """Text extracted with PAGE_TEXT_PARAMS, or None when the scrape failed."""
+    if response is None:
+        return None
+    if response.status_code != 200:
+        logger.warning(f"Failed to scrape {url}. Status code: {response.status_code}")
+        return None
+    text_content = response.json().get('text')
+    logger.info(f"Scraped text from {url}: {(text_content or '')[:100]}")
+    return text_content
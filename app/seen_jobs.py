@@ -0,0 +1,196 @@
+# app/seen_jobs.py
+
+import hashlib
+import re
+import urllib.parse
+from redis.exceptions import RedisError
+from .extensions import logger, supabase, redis_client
+
+# Two Redis sets mirror job_postings so scraped jobs that are already stored are dropped before
+# any scraping, LLM or embedding work: normalised posting URLs, and title|company|location
+# fingerprints (the duplicate definition remove_duplicate_jobs uses)
+SEEN_URLS_KEY = 'seenjobs:urls'
+SEEN_FINGERPRINTS_KEY = 'seenjobs:fingerprints'
+SEEN_STATS_KEY = 'seenjobs:stats'
+REBUILD_PAGE_SIZE = 1000
+# Normalised field values that mean the scrape or extraction didn't find the field
+MISSING_FIELD_VALUES = {'', 'unknown', 'n a', 'none', 'null'}
+
+# Query parameters that only track where a click came from
+TRACKING_PARAM_PATTERN = re.compile(r"^(utm_\w+|gclid|fbclid|msclkid|ref|refid|src|source|trk|trackingid)$", re.IGNORECASE)
+
+
+def normalize_posting_url(url):
+    """Lowercases scheme and host, drops the fragment, tracking parameters and trailing slash."""
+    if not url:
+        return ''
+    parts = urllib.parse.urlsplit(str(url).strip())
+    query = urllib.parse.urlencode(sorted(
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAM_PATTERN.match(key)
+    ))
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+
+
+def _normalize_field(value):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(value or '').lower()).split())
+
+
+def job_fingerprint(job_title, company, location):
+    """
+    None when the fields can't identify a posting (no title, or neither company nor location):
+    those jobs would all share one fingerprint, so only their posting URL is checked.
+    """
+    fields = [_normalize_field(value) for value in (job_title, company, location)]
+    known = [field not in MISSING_FIELD_VALUES for field in fields]
+    if not known[0] or not (known[1] or known[2]):
+        return None
+    return hashlib.sha1("|".join(fields).encode('utf-8')).hexdigest()[:20]
+
+
+def _record(skipped, checked):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(SEEN_STATS_KEY, 'checked', checked)
+        pipe.hincrby(SEEN_STATS_KEY, 'skipped', skipped)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def _seen_flags(key, members):
+    """Membership for each member; all False (treat as new) if Redis is unavailable."""
+    if not members:
+        return []
+    try:
+        return [bool(flag) for flag in redis_client.smismember(key, members)]
+    except RedisError as e:
+        logger.warning(f"Seen-jobs filter unavailable, treating {len(members)} jobs as new: {e}")
+        return [False] * len(members)
+
+
+def filter_new_urls(urls):
+    """Drops posting URLs already in job_postings, and repeats within the list. Order is kept."""
+    normalized = [normalize_posting_url(url) for url in urls]
+    flags = _seen_flags(SEEN_URLS_KEY, normalized)
+    new_urls, batch_seen = [], set()
+    for url, key, seen in zip(urls, normalized, flags):
+        if seen or key in batch_seen:
+            continue
+        batch_seen.add(key)
+        new_urls.append(url)
+    _record(len(urls) - len(new_urls), len(urls))
+    return new_urls
+
+
+def _fingerprint_flags(fingerprints):
+    """_seen_flags for a list that may hold None (no fingerprint), which is never seen."""
+    known = [fingerprint for fingerprint in fingerprints if fingerprint]
+    flags = iter(_seen_flags(SEEN_FINGERPRINTS_KEY, known))
+    return [next(flags) if fingerprint else False for fingerprint in fingerprints]
+
+
+def filter_new_jobs(jobs, url=lambda job: job.get('posting_url'), title=lambda job: job.get('job_title'),
+                    company=lambda job: job.get('company'), location=lambda job: job.get('location')):
+    """
+    Drops jobs whose posting URL or title|company|location fingerprint is already stored, and
+    repeats within the list. The accessors read the fields from each job (defaults: job_postings columns).
+    """
+    url_keys = [normalize_posting_url(url(job)) for job in jobs]
+    fingerprints = [job_fingerprint(title(job), company(job), location(job)) for job in jobs]
+    url_flags = _seen_flags(SEEN_URLS_KEY, url_keys)
+    fingerprint_flags = _fingerprint_flags(fingerprints)
+
+    new_jobs, batch_urls, batch_fingerprints = [], set(), set()
+    for job, url_key, fingerprint, url_seen, fingerprint_seen in zip(jobs, url_keys, fingerprints, url_flags, fingerprint_flags):
+        if url_seen or fingerprint_seen or (url_key and url_key in batch_urls) or (fingerprint and fingerprint in batch_fingerprints):
+            continue
+        if url_key:
+            batch_urls.add(url_key)
+        if fingerprint:
+            batch_fingerprints.add(fingerprint)
+        new_jobs.append(job)
+    _record(len(jobs) - len(new_jobs), len(jobs))
+    return new_jobs
+
+
+def mark_jobs_seen(jobs):
+    """Adds stored job_postings records (posting_url, job_title, company, location) to the filter."""
+    urls = [normalize_posting_url(job.get('posting_url')) for job in jobs if job.get('posting_url')]
+    fingerprints = [fingerprint for fingerprint in (job_fingerprint(job.get('job_title'), job.get('company'), job.get('location'))
+                                                    for job in jobs) if fingerprint]
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        if urls:
+            pipe.sadd(SEEN_URLS_KEY, *urls)
+        if fingerprints:
+            pipe.sadd(SEEN_FINGERPRINTS_KEY, *fingerprints)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to mark {len(jobs)} jobs as seen: {e}")
+
+
+def seen_jobs_filter_ready():
+    """False when the filter has never been built (or Redis lost it), so it should be rebuilt first."""
+    try:
+        return bool(redis_client.exists(SEEN_URLS_KEY, SEEN_FINGERPRINTS_KEY))
+    except RedisError:
+        return True
+
+
+def rebuild_seen_jobs():
+    """
+    Rebuilds both sets from job_postings, so postings removed by the duplicate cleanups or expired
+    stop being filtered. The new sets replace the old ones atomically.
+    """
+    temp_urls, temp_fingerprints = f"{SEEN_URLS_KEY}:rebuild", f"{SEEN_FINGERPRINTS_KEY}:rebuild"
+    redis_client.delete(temp_urls, temp_fingerprints)
+    total, offset = 0, 0
+    while True:
+        rows = supabase.table('job_postings')\
+            .select('id, posting_url, job_title, company, location')\
+            .order('id')\
+            .range(offset, offset + REBUILD_PAGE_SIZE - 1)\
+            .execute().data or []
+        if not rows:
+            break
+        urls = [normalize_posting_url(row['posting_url']) for row in rows if row.get('posting_url')]
+        fingerprints = [fingerprint for fingerprint in (job_fingerprint(row.get('job_title'), row.get('company'), row.get('location'))
+                                                        for row in rows) if fingerprint]
+        pipe = redis_client.pipeline(transaction=False)
+        if urls:
+            pipe.sadd(temp_urls, *urls)
+        if fingerprints:
+            pipe.sadd(temp_fingerprints, *fingerprints)
+        pipe.execute()
+        total += len(rows)
+        offset += REBUILD_PAGE_SIZE
+        if len(rows) < REBUILD_PAGE_SIZE:
+            break
+
+    # A set stays empty (so its temp key doesn't exist) when no row had a URL or a usable fingerprint
+    built = {temp: redis_client.exists(temp) for temp in (temp_urls, temp_fingerprints)}
+    pipe = redis_client.pipeline(transaction=True)
+    for temp, key in ((temp_urls, SEEN_URLS_KEY), (temp_fingerprints, SEEN_FINGERPRINTS_KEY)):
+        if built[temp]:
+            pipe.rename(temp, key)
+        else:
+            pipe.delete(key)
+    pipe.execute()
+    logger.info(f"Rebuilt the seen-jobs filter from {total} job postings.")
+    return total
+
+
+def get_seen_jobs_stats():
+    """Returns jobs checked and skipped by the filter, the skip rate and the current set sizes."""
+    try:
+        raw = redis_client.hgetall(SEEN_STATS_KEY)
+        stats = {k.decode('utf-8'): int(v) for k, v in raw.items()}
+        stats['urls'] = redis_client.scard(SEEN_URLS_KEY)
+        stats['fingerprints'] = redis_client.scard(SEEN_FINGERPRINTS_KEY)
+    except RedisError as e:
+        logger.warning(f"Unable to read seen-jobs stats: {e}")
+        return {}
+    checked = stats.get('checked', 0)
+    stats['skip_rate'] = round(stats.get('skipped', 0) / checked, 4) if checked else 0.0
+    return stats
@@ -1,9 +1,9 @@
 # app/tasks.py
 
 import os
+import time
 import asyncio
 import ast
-import re
 import json
 from bs4 import BeautifulSoup
 import urllib.parse
@@ -14,10 +14,30 @@ from decouple import config
 from typing import List
 from supabase import Client
 from openai import AzureOpenAI
-from .extensions import logger, supabase, scraping_bee_client, llm_client, llm_model_name, embedding_client, text_embedding_model_name
+from .extensions import logger, supabase, llm_client, llm_model_name
 from .jobmatcher import embed_user_preferences, calculate_user_job_fit,calculate_all_job_fits
 from .generate_query import generate_job_keywords #, generate_urls
-from .celery_app import celery, chain, group, chord
+from .celery_app import celery, group, chord
+from .llm_cache import cached_chat_completion, get_llm_cache_stats
+from .embeddings import embed_text, embed_texts, get_embedding_cache_stats
+from .page_text import preprocess_page_text, get_page_text_stats
+from .office_pool import get_office_pool_stats
+from .scraping import scrapingbee_get, scrapingbee_get_many, page_text_from_response, PAGE_TEXT_PARAMS, SCRAPINGBEE_CONCURRENCY
+from .rate_limiter import try_acquire_slot, release_slot, scrapingbee_credit_cost
+from .scrape_scheduler import claim_due_locations, record_scrape, renew_dispatch_lease, get_scrape_schedule_stats
+from .documents import generate_document as build_document, DocumentGenerationError, DOCUMENT_OUTPUT_DIR
+from .document_cache import cleanup_document_storage, get_document_cache_stats
+from .prompt_builder import get_prompt_stats
+from .company_metadata import resolve_company_addresses, COMPANY_METADATA_AT_INGESTION
+from .job_ingest import JobPostingWriter, job_posting_from_details, stored_posting_urls
+from .scrape_watermarks import filter_after_watermark, advance_watermark
+from .payload_store import put_payload, put_payloads, get_payload, get_payloads, drop_payloads, cleanup_payload_store as cleanup_payload_files, get_payload_store_stats
+from .scrape_archive import archive_payload, iter_manifest, load_payload, prune_scrape_archive as prune_scrape_archive_days, get_scrape_archive_stats, HIRING_CAFE, PAGE_TEXT
+from .near_duplicates import filter_near_duplicates, near_duplicate_index_ready, rebuild_near_duplicate_index as rebuild_near_duplicate_index_from_db, get_near_duplicate_stats
+from .seen_jobs import filter_new_urls, filter_new_jobs, rebuild_seen_jobs as rebuild_seen_jobs_filter, seen_jobs_filter_ready, get_seen_jobs_stats
+from .job_digest import digest_job_postings as store_job_digests, JOB_DIGEST_AT_INGESTION
+from .document_stream import make_delta_publisher, publish_event
+from .llm_extraction import run_extraction_batch, parse_llm_json, JOB_DETAILS_SYSTEM_PROMPT, JOB_POST_URLS_SYSTEM_PROMPT, LLM_EXTRACTION_MAX_TOKENS
 from .models import User
 from datetime import datetime, timedelta, timezone
 from scipy.spatial.distance import cosine
@@ -185,52 +205,21 @@ def filter_job_post_urls(self, list_of_urls_scraped_from_job_board_search_result
         logger.warning("Invalid or empty 'list_of_urls_scraped_from_job_board_search_result_pages' passed to 'filter_job_post_urls'.")
         return []  # Return an empty list as default value
     filtered_list_of_job_post_urls = []
-    system_prompt = """
-    Your task is to return a JSON array of strings representing links to job listings from the provided content.
-    If the provided href URLs are relative, reconstruct the absolute URL based on the job board's base URL.
-    Include only links that are actually for job posts. These typically have job titles as anchor text.
-    Exclude unrelated links such as navigation to other parts of the website.
-
-    Output format: Must be a valid JSON array of strings.  Do not include any markdown or backticks.
-    ["url1", "url2", "url3"] 
-    """
-
-    for url in list_of_urls_scraped_from_job_board_search_result_pages:
-        try:
-            response = llm_client.chat.completions.create(
-                model=llm_model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": str(url)}
-                ],
-                temperature=0.2,
-                max_tokens=9999,
-                n=1,
-                stop=None
-            )
-            content = response.choices[0].message.content.strip()
-
-            # Remove backticks and extra whitespace
-            content = content.replace("```json", "").replace("```", "").strip()
-
-            logger.debug(f"Cleaned LLM output from filter_job_post_urls() iteration: {content}") # Log the cleaned content
-
-            try:
-                url_list = json.loads(content)
-
-                if isinstance(url_list, list) and all(isinstance(item, str) for item in url_list):
-                    logger.info(f"Job Post URLS discovered and added: {url_list}")
-                    filtered_list_of_job_post_urls.extend(url_list)
-                else:
-                    logger.error(f"Invalid data type from LLM: {type(url_list)}. Expected a list of strings. Skipping.")
-
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON output from LLM (even after cleaning): {content}. Skipping.")
-
 
-        except Exception as e:
-            logger.error(f"Error processing URL {url}: {e}")
-            continue
+    # All URLs are sent to the LLM concurrently instead of one at a time
+    url_lists = run_extraction_batch(
+        [str(url) for url in list_of_urls_scraped_from_job_board_search_result_pages],
+        llm_model_name,
+        system_prompt=JOB_POST_URLS_SYSTEM_PROMPT,
+        temperature=0.2
+    )
+
+    for url, url_list in zip(list_of_urls_scraped_from_job_board_search_result_pages, url_lists):
+        if isinstance(url_list, list) and all(isinstance(item, str) for item in url_list):
+            logger.info(f"Job Post URLS discovered and added: {url_list}")
+            filtered_list_of_job_post_urls.extend(url_list)
+        else:
+            logger.error(f"Invalid data from LLM for URL {url}: {type(url_list)}. Expected a list of strings. Skipping.")
 
     return filtered_list_of_job_post_urls
     
@@ -283,26 +272,37 @@ def scrape_text_from_page(self,url):
         #return None  # Return None as default value
     logger.info(f"Attempting to scrape page {url}")
     try:
-        response = scraping_bee_client.get(
-            url,
-            params={
-                'extract_rules': {"text": "body"},
-                'render_js': True,
-                'wait': 1000
-            }
-        )
-        if response.status_code == 200:
-            data = response.json()
-            text_content = data.get('text')
-            logger.info(f"Scraped text from {url}: {text_content[:100]}")
-            return text_content
-        else:
-            logger.warning(f"Failed to scrape {url}. Status code: {response.status_code}")
-            return None
+        text_content = page_text_from_response(url, scrapingbee_get(url, params=PAGE_TEXT_PARAMS))
     except Exception as e:
         logger.error(f"Error scraping {url}: {e}")
         return None
-    return scraped_page_text
+    # Kept so extraction changes can be re-applied without scraping again (reprocess_scrape_archive)
+    archive_payload(PAGE_TEXT, url, text_content)
+    return text_content
+
+def scrape_page_texts(urls):
+    """Scrapes a batch of pages concurrently from one process. Returns one text (or None) per URL, in order."""
+    valid_urls = [url for url in urls if isinstance(url, str) and url.startswith('http')]
+    responses = dict(zip(valid_urls, scrapingbee_get_many(valid_urls, PAGE_TEXT_PARAMS)))
+    texts = []
+    for url in urls:
+        try:
+            text_content = page_text_from_response(url, responses.get(url))
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {e}")
+            text_content = None
+        archive_payload(PAGE_TEXT, url, text_content)
+        texts.append(text_content)
+    return texts
+
+@celery.task(bind=True, max_retries=3, queue='scraping_queue')
+def scrape_text_from_pages(self, urls):
+    """Chord header task for process_job_posts. Returns a payload store reference to the batch's page texts."""
+    if not isinstance(urls, list) or not urls:
+        logger.warning("Invalid or empty 'urls' passed to 'scrape_text_from_pages'.")
+        return []
+    # The texts stay out of the result backend and the chord callback's message
+    return put_payload(scrape_page_texts(urls))
 
 @celery.task(bind=True, max_retries=100)
 def filter_details_from_job_page_texts(self,page_text,user_id=None):
@@ -311,51 +311,152 @@ def filter_details_from_job_page_texts(self,page_text,user_id=None):
         raise Exception ("Invalid or empty 'page_text' passed to 'filter_details_from_job_page_texts'.")
         #stop this chain to prevent flow of bad data
         #return {}  # Return an empty dictionary as default value
-    system_prompt = """
-    The user will upload text extracted from a job posting webpage. Based on the text content detail, return a JSON output with values for the following fields: 
-    "Job Title","Company","Location","Remote(Yes/No/Hybrid/Unknown)","Date Posted","Job Description","Job Type","Salary Range".  
-    If you cannot determine the value for a field, use the value "Unknown". 
-
-    Example output:
-    {
-        "Job Title": "Director, Enterprise Applications",
-        "Company": "Lone Star College System",
-        "Location":"The Woodlands, TX",
-        "Remote(Yes/No/Hybrid/Unknown)":"No",
-        "Date Posted":"7/26/2024",
-        "Job Description":"The Director, Enterprise Applications is an integral part...",
-        "Job Type":"Full-time",
-        "Salary Range":"$114,241 - $131,377"
-    }
-    """
+    page_text, _ = preprocess_page_text(page_text)
     try:
-        response = llm_client.chat.completions.create(
+        response = cached_chat_completion(
+            llm_client,
             model=llm_model_name,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": JOB_DETAILS_SYSTEM_PROMPT},
                 {"role": "user", "content": page_text}
             ],
             temperature=0.33,
-            max_tokens=9999,
+            max_tokens=LLM_EXTRACTION_MAX_TOKENS,
             n=1,
-            stop=None
+            validate=parse_llm_json
         )
         content = response.choices[0].message.content.strip()
-        content = content.replace("```json", "").replace("```", "").strip()
-        logger.debug(f"Cleaned LLM output from filter_job_post_urls() iteration: {content}") # Log the cleaned content
-        #Log the raw content for debugging
-        #logger.debug(f"Raw LLM output from filter_details_from_job_page_texts() iteration: {content}")
-
-        try:
-            job_details = json.loads(content)
-            return job_details
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error in filter_details_from_job_pages() iteration: {e}. Continuing...")
-            # Instead of returning {}, raise the exception to stop the chain
+        logger.debug(f"Raw LLM output from filter_details_from_job_page_texts(): {content}")
+        return parse_llm_json(content)
     except Exception as e:
         logger.error(f"Error in filter_details_from_job_page_texts() iteration: {e}")
         # Consider to re-raise the exception to halt the chain
 
+@celery.task(bind=True, max_retries=3)
+def filter_details_from_job_page_texts_batch(self, page_texts):
+    """Extracts job details from a whole batch of page texts concurrently. Returns one dict (or {}) per page, in order."""
+    if not isinstance(page_texts, list) or not page_texts:
+        logger.warning("Invalid or empty 'page_texts' passed to 'filter_details_from_job_page_texts_batch'.")
+        return []
+    # Boilerplate stripping and the token budget are applied before anything is sent to the model
+    page_texts = [preprocess_page_text(text)[0] if isinstance(text, str) and text.strip() else None for text in page_texts]
+    results = run_extraction_batch(page_texts, llm_model_name, system_prompt=JOB_DETAILS_SYSTEM_PROMPT, temperature=0.33)
+    return [details if isinstance(details, dict) else {} for details in results]
+
+@celery.task(bind=True, max_retries=3)
+def process_scraped_job_pages(self, page_texts, job_post_urls, fused=False):
+    """
+    Chord callback for process_job_posts: one concurrent extraction batch, one batched embedding request, one bulk upsert.
+    page_texts holds one entry per header task (payload references or lists of texts). With fused=True
+    everything, fit scores included, runs in this task instead of fanning out.
+    """
+    batch_refs = page_texts
+    # The header scrapes batches of pages: flatten to one text per URL
+    page_texts = [text for batch in get_payloads(batch_refs) for text in (batch if isinstance(batch, list) else [batch])]
+    job_details_list = filter_details_from_job_page_texts_batch.run(page_texts)
+    extracted = [(details, url) for details, url in zip(job_details_list, job_post_urls) if details]
+    logger.info(f"Extracted details for {len(extracted)} of {len(job_post_urls)} scraped job pages.")
+    # The same job listed under another URL is caught by its title|company|location fingerprint before embedding
+    extracted = filter_new_jobs(
+        extracted,
+        url=lambda job: job[1],
+        title=lambda job: job[0].get("Job Title"),
+        company=lambda job: job[0].get("Company"),
+        location=lambda job: job[0].get("Location")
+    )
+    # Reposts with small edits to the description are caught by the near-duplicate index
+    extracted = filter_near_duplicates(
+        extracted,
+        url=lambda job: job[1],
+        text=lambda job: job[0].get("Job Description"),
+        company=lambda job: job[0].get("Company"),
+        location=lambda job: job[0].get("Location")
+    )
+    if not extracted:
+        drop_payloads(batch_refs)
+        return 0
+
+    # One batched embeddings request for every job in the batch instead of one per chain
+    try:
+        embeddings = embed_texts([str(details) for details, _ in extracted], 512)
+    except Exception as e:
+        logger.error(f"Error generating batch embeddings: {e}")
+        raise self.retry(exc=e)
+    for (details, _), embedding in zip(extracted, embeddings):
+        details['Embedding'] = embedding
+
+    records = [job_posting_from_details(details, url) for details, url in extracted]
+    with JobPostingWriter() as writer:
+        writer.add_many(records)
+    drop_payloads(batch_refs)
+    queue_new_job_work(writer, records, fused=fused)
+    if writer.failed_records:
+        # Only the rows that failed are written again (embeddings included), so nothing is scraped or extracted twice
+        logger.warning(f"Retrying {len(writer.failed_records)} of {len(records)} scraped jobs that failed to save.")
+        save_job_postings.apply_async((put_payload(writer.failed_records),), countdown=60)
+    return writer.stats
+
+
+def queue_new_job_work(writer, records, fused=False):
+    """Fit scores, digests and company metadata for the jobs a JobPostingWriter inserted (records carry their embedding)."""
+    embeddings_by_url = {record['posting_url']: record['embedding'] for record in records}
+    if fused:
+        for url in writer.inserted_urls:
+            check_job_fit(writer.ids[url], embeddings_by_url[url])
+    elif writer.inserted_urls:
+        # Each fit task gets a reference to its embedding rather than 512 floats in the message
+        embedding_refs = put_payloads([embeddings_by_url[url] for url in writer.inserted_urls])
+        group(
+            check_job_fit_for_posting.s(writer.ids[url], embedding_ref) for url, embedding_ref in zip(writer.inserted_urls, embedding_refs)
+        ).apply_async()
+    if JOB_DIGEST_AT_INGESTION and writer.inserted_urls:
+        digest_job_postings.delay(writer.inserted_urls)
+    if COMPANY_METADATA_AT_INGESTION:
+        prefetch_company_metadata.delay([record['company'] for record in records if record['posting_url'] in writer.ids])
+
+
+@celery.task(bind=True, max_retries=3, name='save_job_postings')
+def save_job_postings(self, records):
+    """
+    Writes job_postings records that failed in an earlier bulk write, then queues the work for the
+    new jobs. records may be a payload store reference. Each retry only carries the rows still failing.
+    """
+    records_ref = records
+    records = get_payload(records_ref)
+    with JobPostingWriter() as writer:
+        writer.add_many(records)
+    drop_payloads([records_ref])
+    queue_new_job_work(writer, records)
+    if writer.failed_records:
+        failed = writer.failed_records
+        raise self.retry(
+            args=(put_payload(failed),),
+            exc=Exception(f"Unable to save {len(failed)} job postings"),
+            countdown=60 * (self.request.retries + 1)
+        )
+    return writer.stats
+
+
+@celery.task(bind=True, max_retries=3, name='prefetch_company_metadata')
+def prefetch_company_metadata(self, companies):
+    """Stores metadata (mailing address) for companies seen during ingestion, so cover letters never wait on it."""
+    companies = [company for company in companies if company and company != "Unknown"]
+    try:
+        return resolve_company_addresses(companies)
+    except Exception as e:
+        logger.error(f"Error prefetching company metadata: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=60)
+
+
+@celery.task(bind=True, max_retries=3, name='digest_job_postings')
+def digest_job_postings(self, posting_urls):
+    """Stores a compact digest (skills, responsibilities, seniority) for newly saved jobs; see app/job_digest.py."""
+    try:
+        return store_job_digests(posting_urls)
+    except Exception as e:
+        logger.error(f"Error generating job digests: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=60)
+
 
 # to be deleted    
 # @celery.task(bind=True, max_retries=3)
@@ -372,12 +473,7 @@ def generate_embedding(self, details):
     if not isinstance(details, dict) or not details:
         raise Exception("Invalid or empty 'details' passed to 'generate_embedding'.")
     try:
-        response = embedding_client.embeddings.create(
-            input=str(details),
-            model=text_embedding_model_name,
-            dimensions=512
-        )
-        details['Embedding'] = response.data[0].embedding
+        details['Embedding'] = embed_text(str(details), 512)
 
         return details
     except Exception as e:
@@ -389,57 +485,37 @@ def save_job_to_database_and_process_diffs(self, job_details, url):
     if not isinstance(job_details, dict) or not job_details:
         logger.warning("Invalid or empty 'job_details' passed to 'save_job_to_database'.")
         return  # Return None to indicate the task did not process
-    # Robust Date Posted check and handling
-    date_posted_str = job_details.get("Date Posted", "")
-    date_posted = None  # Initialize to None
+    writer = JobPostingWriter()
+    writer.add(job_posting_from_details(job_details, url))
+    writer.flush()
+    if writer.stats['failed']:
+        raise self.retry(exc=Exception(f"Error saving job {url} to database"))
+    job_posting_id = writer.ids.get(url)
+    if not job_posting_id:
+        logger.info(f"Job {url} is already stored, skipping fit calculation.")
+        return
+    logger.info(f"Saved job: {job_details.get('Job Title', 'Unknown')}")
+    #Now the job is saved to the database and we can calculate the diffs for each user.
+    if job_details.get("Embedding"):
+        check_job_fit(job_posting_id, job_details["Embedding"])
+    else:
+        logger.error(f"Unable to Check Job Fit for {url} since embedding not found")
 
-    # Date format check using regular expression
-    date_pattern = r"^\d{4}-\d{2}-\d{2}$"  # YYYY-MM-DD format
-    if re.match(date_pattern, date_posted_str):
-        try:
-            date_posted = datetime.strptime(date_posted_str, "%Y-%m-%d").date()
-            date_posted = date_posted.isoformat()
-        except ValueError:
-            logger.warning(f"Invalid date format: {date_posted_str}. Setting to NULL.")
 
-    elif date_posted_str.lower().find("unknown") != -1: # Handle "unknown" and set to NULL
-        logger.warning(f"Date Posted is 'unknown'. Setting to NULL.")
+@celery.task(bind=True, max_retries=3, name='check_job_fit_for_posting')
+def check_job_fit_for_posting(self, job_posting_id, embedding):
+    """
+    Fit scores of one newly saved job against every user's preferences. embedding may be a payload
+    store reference; if it expired before the task ran (e.g. a long queue backlog) the job's stored
+    embedding is used instead.
+    """
+    job_embedding = get_payload(embedding, fallback=lambda: get_job_embedding_by_id(job_posting_id))
+    if job_embedding is None:
+        logger.error(f"No embedding available for job {job_posting_id}, skipping its fit scores.")
+        return
+    check_job_fit(job_posting_id, job_embedding)
+    drop_payloads([embedding])
 
-    else: # Handle any other non-compliant value and set to NULL
-        logger.warning(f"Non-compliant Date Posted value: {date_posted_str}. Setting to NULL.")
-    try:
-        # Ensure 'posting_url' exists in job_details
-        supabase.table('job_postings').insert({
-            'job_title': job_details.get("Job Title", "Unknown"),
-            'company': job_details.get("Company", "Unknown"),
-            'location': job_details.get("Location", "Unknown"),
-            'remote': job_details.get("Remote(Yes/No/Hybrid/Unknown)", "Unknown"),
-            'date_posted': date_posted,
-            'job_description': job_details.get("Job Description", "Unknown"),
-            'job_type': job_details.get("Job Type", "Unknown"),
-            'salary_range': job_details.get("Salary Range", "Unknown"),
-            'embedding': job_details.get("Embedding", ""),
-            'posting_url': url
-        }).execute()
-        print("Successfully added job to DB.")
-        logger.info(f"Saved job: {job_details.get('Job Title', 'Unknown')}")
-    except Exception as e:
-        logger.error(f"Error saving job to database: {e}")
-        raise self.retry(exc=e)
-    #Now the job is saved to the database and we can calculate the diffs for each user.
-    try:
-        embedding = job_details.get("Embedding")
-        try:
-            job_posting_id = get_job_posting_id(url)
-        except Exception as e:
-            print(f"Error in retrieving id from table job_postings for {url}: {e}")
-        if embedding and job_posting_id:
-            check_job_fit(job_posting_id,embedding)
-        else:
-            raise Exception (f"Unable to Check Job Fit for {url} since embedding or job_posting_id not found") #Abort the chain to prevent flow of bad data.
-    except Exception as e:
-        print(f"Error in generating embeddings for {job_posting_id}: {e}")
-        
 
 def get_job_posting_id(url):
     try:
@@ -549,27 +625,33 @@ def check_job_fit(job_posting_id,job_embedding):
         logger.error(f"Error inserting job fit data: {e}")
 
 
+# Run the whole process_job_posts pipeline in one task (local development, benchmarks) instead of a chord
+INGESTION_FUSED_STAGES = config('INGESTION_FUSED_STAGES', default=False, cast=bool)
+
 @celery.task(bind=True, max_retries=3)
 def process_job_posts(self, job_post_urls, user_id):
     if not isinstance(job_post_urls, list) or not job_post_urls:
         logger.warning(f"Invalid or empty 'job_post_urls' passed to 'process_job_posts' for user {user_id}.")
         return  # Return None to indicate no processing to be done
 
-    logger.info(f"Processing {len(job_post_urls)} job post URLs for user {user_id}")
+    # Postings already in job_postings are dropped before any scraping or extraction
+    new_job_post_urls = filter_new_urls(job_post_urls)
+    logger.info(f"Processing {len(new_job_post_urls)} new of {len(job_post_urls)} job post URLs for user {user_id}")
+    if not new_job_post_urls:
+        return
+    job_post_urls = new_job_post_urls
 
     try:
-        # Use a list comprehension to create the chain for each URL
-        job_post_chains = [
-            chain(
-                scrape_text_from_page.s(url),  
-                filter_details_from_job_page_texts.s(),
-                generate_embedding.s(),
-                save_job_to_database_and_process_diffs.s(url)
-            ) for url in job_post_urls
-        ]
-
-        # Execute the group of chains
-        group(job_post_chains).apply_async()
+        if INGESTION_FUSED_STAGES:
+            # Local runs: scrape, extract, embed, save and score in this task, with nothing passed between tasks
+            return process_scraped_job_pages.run([scrape_page_texts(job_post_urls)], job_post_urls, fused=True)
+
+        # Each header task keeps a batch of scrapes in flight, then details are extracted for all pages in a single task
+        batches = [job_post_urls[i:i + SCRAPINGBEE_CONCURRENCY] for i in range(0, len(job_post_urls), SCRAPINGBEE_CONCURRENCY)]
+        chord(
+            header=[scrape_text_from_pages.s(batch) for batch in batches],
+            body=process_scraped_job_pages.s(job_post_urls)
+        ).apply_async()
 
     except Exception as e:
         logger.error(f"Error in process_job_posts: {e}")
@@ -841,9 +923,112 @@ def process_all_users_job_preferences(self):
         # Retry the task in case of failure
         raise self.retry(exc=e, countdown=60)  # Retry after 60 seconds
 
+@celery.task(name='report_cache_stats')
+def report_cache_stats():
+    """Logs cache hit rates and tokens saved so the effect of the LLM/embedding caches and page text preprocessing is visible."""
+    llm_stats = get_llm_cache_stats()
+    embedding_stats = get_embedding_cache_stats()
+    page_text_stats = get_page_text_stats()
+    logger.info(f"LLM cache stats: {llm_stats}")
+    logger.info(f"Embedding cache stats: {embedding_stats}")
+    office_pool_stats = get_office_pool_stats()
+    document_cache_stats = get_document_cache_stats()
+    logger.info(f"Page text preprocessing stats: {page_text_stats}")
+    logger.info(f"Office conversion stats: {office_pool_stats}")
+    logger.info(f"Document cache stats: {document_cache_stats}")
+    prompt_stats = get_prompt_stats()
+    logger.info(f"Document prompt token stats: {prompt_stats}")
+    seen_jobs_stats = get_seen_jobs_stats()
+    logger.info(f"Seen-jobs filter stats: {seen_jobs_stats}")
+    near_duplicate_stats = get_near_duplicate_stats()
+    logger.info(f"Near-duplicate index stats: {near_duplicate_stats}")
+    scrape_schedule_stats = get_scrape_schedule_stats()
+    logger.info(f"Hiring Cafe scrape schedule: {scrape_schedule_stats}")
+    scrape_archive_stats = get_scrape_archive_stats()
+    logger.info(f"Scrape archive stats: {scrape_archive_stats}")
+    payload_store_stats = get_payload_store_stats()
+    logger.info(f"Payload store stats: {payload_store_stats}")
+    return {
+        'llm': llm_stats,
+        'embedding': embedding_stats,
+        'page_text': page_text_stats,
+        'office_pool': office_pool_stats,
+        'document_cache': document_cache_stats,
+        'prompt': prompt_stats,
+        'seen_jobs': seen_jobs_stats,
+        'near_duplicates': near_duplicate_stats,
+        'scrape_schedule': scrape_schedule_stats,
+        'scrape_archive': scrape_archive_stats,
+        'payload_store': payload_store_stats
+    }
+
+@celery.task(bind=True, max_retries=2, name='generate_document', queue='documents_queue')
+def generate_document(self, job_id, doc_type, user_id, stream=False, profile_fp=None):
+    """
+    Builds a resume or cover letter PDF off the web workers. Runs on documents_queue so document
+    generation is scaled (worker concurrency) independently of page traffic and scraping.
+
+    With stream=True the text is streamed from the model and every fragment is published to the
+    task's Redis stream (see app/document_stream.py) for the SSE endpoint to relay.
+    profile_fp is the profile fingerprint the route already computed for its cache lookup.
+    """
+    task_id = self.request.id
+    on_delta = make_delta_publisher(task_id) if stream else None
+    try:
+        document_dir, document_filename = build_document(job_id, doc_type, user_id, on_delta, profile_fp)
+        logger.info(f"Generated {doc_type} for job_id={job_id}, user_id={user_id}: {document_filename}")
+        if stream:
+            publish_event(task_id, 'done')
+        return {'job_id': job_id, 'doc_type': doc_type, 'user_id': user_id, 'filename': document_filename}
+    except DocumentGenerationError as e:
+        # Missing profile data or template: retrying will not help
+        if stream:
+            publish_event(task_id, 'error', error=str(e))
+        raise
+    except Exception as e:
+        logger.error(f"Error generating {doc_type} for job_id={job_id}: {e}", exc_info=True)
+        if stream:
+            if self.request.retries >= self.max_retries:
+                publish_event(task_id, 'error', error="An error occurred while generating the document.")
+            else:
+                # The retry regenerates the text from scratch
+                publish_event(task_id, 'reset')
+        raise self.retry(exc=e, countdown=10)
+
+@celery.task(bind=True, max_retries=3, name='rebuild_seen_jobs')
+def rebuild_seen_jobs(self):
+    """Rebuilds the seen-jobs filter from job_postings (drops postings deleted since the last rebuild)."""
+    try:
+        return rebuild_seen_jobs_filter()
+    except Exception as e:
+        logger.error(f"Error rebuilding the seen-jobs filter: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=300)
+
+@celery.task(bind=True, max_retries=3, name='rebuild_near_duplicate_index')
+def rebuild_near_duplicate_index(self):
+    """Rebuilds the MinHash/LSH near-duplicate index from job_postings."""
+    try:
+        return rebuild_near_duplicate_index_from_db()
+    except Exception as e:
+        logger.error(f"Error rebuilding the near-duplicate index: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=300)
+
+@celery.task(name='cleanup_generated_documents')
+def cleanup_generated_documents():
+    """Applies the generated document retention policy (age and total size) to the output directory."""
+    return cleanup_document_storage(DOCUMENT_OUTPUT_DIR)
+
+@celery.task(name='cleanup_payload_store')
+def cleanup_payload_store():
+    """Removes expired task payloads kept on disk (PAYLOAD_STORE_BACKEND=disk); Redis expires its own."""
+    return cleanup_payload_files()
+
 @celery.task(bind=True,max_retries=3,name='remove_duplicate_embeddings')
 def remove_duplicate_embeddings(self):
-    """Remove job postings with duplicate embeddings, keeping the most recent entries."""
+    """
+    Remove job postings with duplicate embeddings, keeping the most recent entries.
+    No longer scheduled: duplicates are dropped at ingestion (app/near_duplicates.py). Kept for one-off cleanups.
+    """
     try:
         # First, delete related entries in user_job_fit
         duplicate_ids_query = """
@@ -887,7 +1072,10 @@ def remove_duplicate_embeddings(self):
     
 @celery.task(bind=True, max_retries=3, name='remove_duplicate_jobs')
 def remove_duplicate_jobs(self):
-    """Remove duplicate job postings with same title, company and location, keeping the most recent entries."""
+    """
+    Remove duplicate job postings with same title, company and location, keeping the most recent entries.
+    No longer scheduled: duplicates are dropped at ingestion (app/seen_jobs.py). Kept for one-off cleanups.
+    """
     try:
         # First identify duplicates using PostgreSQL function
         duplicates = supabase.rpc(
@@ -1043,178 +1231,387 @@ def build_hiring_cafe_url(base_url, location):
 TEST_PREFERRED_LOCATIONS = list(states.keys())
 
 
+def parse_hiring_cafe_job(job_data):
+    """Maps one Hiring Cafe search result onto a job_postings record (without the embedding)."""
+    job_info = job_data.get('job_information', {})
+    company_data = job_data.get('v5_processed_company_data', {})
+    workplace_data = job_data.get('v5_processed_job_data', {})
+
+    # ✅ Extract and format date_posted
+    date_posted = workplace_data.get('estimated_publish_date')
+    if date_posted:
+        date_posted = datetime.fromisoformat(date_posted.replace("Z", "+00:00"))
+        date_posted = date_posted.isoformat()  # ✅ Convert to string before saving
+    elif workplace_data.get('estimated_publish_date_millis'):
+        date_posted = datetime.utcfromtimestamp(workplace_data['estimated_publish_date_millis'] / 1000)
+        date_posted = date_posted.isoformat()  # ✅ Convert to string before saving
+    else:
+        date_posted = None  # Ensure None if no date is found
+
+    # ✅ Extract and properly format location (Remove duplicates)
+    workplace_cities = workplace_data.get('workplace_cities', [])
+    workplace_states = workplace_data.get('workplace_states', [])
+
+    # Remove duplicates by converting to a set
+    location_parts = list(dict.fromkeys(workplace_cities + workplace_states))  # Keeps order but removes dupes
+    location = ", ".join(location_parts) if location_parts else workplace_data.get('formatted_workplace_location', None)
+
+    # ✅ Extract and clean job description (Remove HTML tags)
+    raw_description = job_info.get('description', "")
+    job_description = BeautifulSoup(raw_description, "html.parser").get_text(separator=" ").strip()
+
+    # ✅ Fix Remote Status Detection
+    workplace_type = job_data.get('workplace_type') or workplace_data.get('workplace_type')  # Check both levels
+    if workplace_type:
+        workplace_type = workplace_type.strip().lower()  # Normalize case and trim spaces
+
+    if workplace_type == 'onsite':
+        remote = 'No'
+    elif workplace_type == 'remote':
+        remote = 'Yes'
+    elif workplace_type == 'hybrid':
+        remote = 'Hybrid'
+    else:
+        remote = 'Unknown'  # Handle unexpected values
+
+    logger.debug(f"Debug: workplace_type received: {workplace_type}")
+
+    # ✅ Extract salary range (Format properly)
+    min_salary = workplace_data.get('yearly_min_compensation')
+    max_salary = workplace_data.get('yearly_max_compensation')
+    salary_range = f"${min_salary:,} - ${max_salary:,}" if min_salary and max_salary else None
+
+    # ✅ Prepare data for Supabase
+    return {
+        "date_posted": date_posted,
+        "posting_url": job_data.get('apply_url', None),
+        "company": company_data.get('name', None),
+        "location": location,
+        "job_description": job_description,
+        "remote": remote,
+        "salary_range": salary_range,
+        "job_title": job_info.get('title', None)
+    }
+
+def hiring_cafe_embedding_text(job_record):
+    return f"{job_record['job_title']} {job_record['company']} {job_record['location']} {job_record['job_description']}"
+
+
+# Per-location scrapes run concurrently, at most HIRING_CAFE_CONCURRENCY at a time across all workers
+HIRING_CAFE_CONCURRENCY = config('HIRING_CAFE_CONCURRENCY', default=5, cast=int)
+HIRING_CAFE_SLOT_LEASE = 600  # seconds; longer than any single location scrape
+HIRING_CAFE_SLOT_RETRY_DELAY = 10  # seconds a location waits before trying for a free slot again
+HIRING_CAFE_REQUEST_PARAMS = {
+    "render_js": True,
+    "wait": 1000,
+    "json_response": True
+}
+
+
+def scrape_hiring_cafe_for_location(location):
+    """
+    Scrapes one location's Hiring Cafe search results, embeds and saves the jobs.
+    Returns counts for the sweep summary: jobs found, skipped as older than the location's
+    watermark, already seen, new, duplicates and failed saves.
+    """
+    stats = {'location': location, 'found': 0, 'old': 0, 'seen': 0, 'new': 0, 'duplicates': 0, 'failed': 0, 'error': None,
+             'credits': 0, 'latency': 0}
+    url = build_hiring_cafe_url(HIRING_CAFE_BASE_URL, location)
+    logger.info(f"Built URL: {url}")
+
+    # Making the API request
+    params = HIRING_CAFE_REQUEST_PARAMS
+    # One request per location task: the fan-out across tasks (bounded by the slot limiter) gives the
+    # concurrency, so this uses app/scraping.py's pooled keep-alive client rather than an event loop
+    request_started = time.monotonic()
+    response = scrapingbee_get(url, params=params)
+    stats['latency'] = round(time.monotonic() - request_started, 2)
+    stats['credits'] = scrapingbee_credit_cost(params)
+
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch API response for {location}, status code: {response.status_code}")
+        stats['error'] = f"status code {response.status_code}"
+        return stats
+
+    logger.info(f"Successfully intercepted API response for {location}")
+    try:
+        # Parse JSON response
+        api_responses = response.json()
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to decode JSON response for {location}: {e}")
+        stats['error'] = "invalid JSON response"
+        return stats
+
+    # Ensure "xhr" key exists
+    if "xhr" not in api_responses or not isinstance(api_responses["xhr"], list):
+        logger.warning(f"No valid 'xhr' key in the API response for {location}")
+        stats['error'] = "no xhr in response"
+        return stats
+
+    search_jobs_response = None
+    for req in api_responses["xhr"]:
+        if isinstance(req, dict) and req.get("url") == 'https://hiring.cafe/api/search-jobs':
+            raw_body = req.get("body", "{}")
+            logger.debug(f"Raw 'body' content for {location}: {raw_body[:500]}...")
+            try:
+                search_jobs_response = json.loads(raw_body)
+            except json.JSONDecodeError as e:
+                # If JSONDecodeError happens, log it and continue
+                logger.error(f"JSON Decode Error while parsing body for {location}: {e}")
+                continue  # Skip to next response
+            break
+
+    if not search_jobs_response:
+        logger.warning(f"No 'search-jobs' API response found for {location}")
+        stats['error'] = "no search-jobs response"
+        return stats
+    # The raw body is kept so changes to parse_hiring_cafe_job can be re-applied without scraping again
+    archive_payload(HIRING_CAFE, location, raw_body)
+
+    # Extract information from the response
+    job_results = search_jobs_response.get('results', [])
+    stats['found'] = len(job_results)
+    # Results published before the location's watermark were handled by an earlier run
+    new_results, stats['old'] = filter_after_watermark(location, job_results)
+    job_records = [parse_hiring_cafe_job(job_data) for job_data in new_results]  # 🔁 Loop over all job postings
+    # Only jobs not already stored (or near duplicates of stored jobs) go on to embedding and saving
+    job_records = filter_near_duplicates(filter_new_jobs(job_records))
+    stats['seen'] = len(new_results) - len(job_records)
+    if not job_records:
+        advance_watermark(location, job_results)
+        return stats
+
+    # Generate text embeddings for the whole page in batched requests
+    job_embeddings = embed_texts([hiring_cafe_embedding_text(job_record) for job_record in job_records], 512)
+    logger.info(f"Generated {len(job_embeddings)} job embeddings for {location}")
+
+    for job_record, job_embedding in zip(job_records, job_embeddings):
+        job_record["embedding512"] = job_embedding
+
+    # ✅ Save to Supabase in one bulk upsert (existing postings are skipped)
+    with JobPostingWriter() as writer:
+        writer.add_many(job_records)
+    stats['new'] = writer.stats['inserted']
+    stats['duplicates'] = writer.stats['skipped']
+    stats['failed'] = writer.stats['failed']
+    logger.info(f"✅ Saved {stats['new']} new job postings for {location}")
+    # The page is stored: later runs can skip everything up to its newest posting
+    if not stats['failed']:
+        advance_watermark(location, job_results)
+
+    if COMPANY_METADATA_AT_INGESTION:
+        prefetch_company_metadata.delay([job_record["company"] for job_record in job_records])
+    if JOB_DIGEST_AT_INGESTION and writer.inserted_urls:
+        digest_job_postings.delay(writer.inserted_urls)
+    return stats
+
+
+@celery.task(bind=True, max_retries=None, name='scrape_hiring_cafe_location', queue='scraping_queue')
+def scrape_hiring_cafe_location(self, location):
+    """
+    One location of a Hiring Cafe sweep. Records the scrape's yield and cost with the scheduler,
+    which sets when the location is due next. Always returns its stats so the sweep summary runs.
+    """
+    renew_dispatch_lease(location)
+    holder = try_acquire_slot('hiringcafe', HIRING_CAFE_CONCURRENCY, HIRING_CAFE_SLOT_LEASE)
+    if holder is None:
+        # Every slot is taken: wait for one without holding a worker process
+        raise self.retry(countdown=HIRING_CAFE_SLOT_RETRY_DELAY)
+    try:
+        stats = scrape_hiring_cafe_for_location(location)
+    except Exception as e:
+        logger.error(f"Request failed for {location}: {e}")
+        # The request may have been made (and charged) before it failed: count it against the budget
+        stats = {'location': location, 'found': 0, 'old': 0, 'seen': 0, 'new': 0, 'duplicates': 0, 'failed': 0, 'error': str(e),
+                 'credits': scrapingbee_credit_cost(HIRING_CAFE_REQUEST_PARAMS), 'latency': 0}
+    finally:
+        release_slot('hiringcafe', holder)
+    stats['next_interval'] = round(record_scrape(
+        location, stats['new'], stats['credits'], stats['latency'], failed=bool(stats['error'] or stats['failed'])
+    ))
+    return stats
+
+
+@celery.task(name='summarize_hiring_cafe_sweep')
+def summarize_hiring_cafe_sweep(results, started_at=None):
+    """Chord callback: logs jobs found, new and failed per location and for the whole sweep."""
+    totals = {'locations': len(results), 'found': 0, 'old': 0, 'seen': 0, 'new': 0, 'duplicates': 0, 'failed': 0, 'errors': 0}
+    for stats in results:
+        if not stats:
+            continue
+        for field in ('found', 'old', 'seen', 'new', 'duplicates', 'failed'):
+            totals[field] += stats.get(field, 0)
+        if stats.get('error'):
+            totals['errors'] += 1
+        logger.info(
+            f"Hiring Cafe {stats['location']}: {stats['found']} found, {stats.get('old', 0)} older than the watermark, {stats.get('seen', 0)} already seen, {stats['new']} new, "
+            f"{stats['duplicates']} duplicates, {stats['failed']} failed, next scrape in {stats.get('next_interval', 0)}s"
+            f"{', error: ' + stats['error'] if stats.get('error') else ''}"
+        )
+    if started_at:
+        totals['duration_seconds'] = round(datetime.now(timezone.utc).timestamp() - started_at, 1)
+    logger.info(f"Hiring Cafe sweep finished: {totals}")
+    return totals
+
+
 @celery.task(bind=True, name='scrape_hiring_cafe')
 def scrape_hiring_cafe(self):
-    """Fetches job listings from Hiring Cafe API via ScrapingBee and extracts response correctly."""
-    
-    logger.info("Starting scrape for Hiring Cafe")
-
-    for location in TEST_PREFERRED_LOCATIONS:
-        url = build_hiring_cafe_url(HIRING_CAFE_BASE_URL, location)
-        logger.info(f"Built URL: {url}")
-        print(f"Built URL: {url}")
+    """
+    Scheduler tick: fans out one task per location that is due (see app/scrape_scheduler.py);
+    the sweep takes about as long as its slowest location. A location already in flight is not due.
+    """
+    locations = claim_due_locations(TEST_PREFERRED_LOCATIONS)
+    if not locations:
+        logger.debug("No Hiring Cafe locations due.")
+        return 0
 
+    if not seen_jobs_filter_ready():
         try:
-            # Making the API request
-            response = scraping_bee_client.get(
-                url,
-                params={
-                    "render_js": True,
-                    "wait": 1000,
-                    "json_response": True
-                }
-            )
+            rebuild_seen_jobs_filter()
+        except Exception as e:
+            logger.warning(f"Unable to build the seen-jobs filter, every scraped job will be treated as new: {e}")
+    if not near_duplicate_index_ready():
+        try:
+            rebuild_near_duplicate_index_from_db()
+        except Exception as e:
+            logger.warning(f"Unable to build the near-duplicate index: {e}")
+
+    logger.info(f"Starting scrape for Hiring Cafe: {len(locations)} of {len(TEST_PREFERRED_LOCATIONS)} locations due")
+    started_at = datetime.now(timezone.utc).timestamp()
+    chord(
+        header=[scrape_hiring_cafe_location.s(location) for location in locations],
+        body=summarize_hiring_cafe_sweep.s(started_at=started_at)
+    ).apply_async()
+    return len(locations)
+
+
+def _reprocess_hiring_cafe_records(job_records, writer, only_existing):
+    stored = stored_posting_urls([job_record['posting_url'] for job_record in job_records])
+    new_records = [job_record for job_record in job_records if job_record['posting_url'] not in stored]
+    job_records = [job_record for job_record in job_records if job_record['posting_url'] in stored]
+    if not only_existing:
+        # Postings that are not stored yet pass the same filters as live ingestion
+        job_records += filter_near_duplicates(filter_new_jobs(new_records))
+    if not job_records:
+        return 0
+    job_embeddings = embed_texts([hiring_cafe_embedding_text(job_record) for job_record in job_records], 512)
+    for job_record, job_embedding in zip(job_records, job_embeddings):
+        job_record["embedding512"] = job_embedding
+        job_record["digest"] = None  # regenerated from the new description on first use
+    writer.add_many(job_records)
+    return len(job_records)
+
+
+def _reprocess_page_texts(pages, writer, only_existing):
+    stored = stored_posting_urls([url for url, _ in pages])
+    if only_existing:
+        pages = [(url, text) for url, text in pages if url in stored]
+    else:
+        new_urls = set(filter_new_urls([url for url, _ in pages if url not in stored]))
+        pages = [(url, text) for url, text in pages if url in stored or url in new_urls]
+    if not pages:
+        return 0
+    job_details_list = filter_details_from_job_page_texts_batch.run([text for _, text in pages])
+    extracted = [(details, url) for details, (url, _) in zip(job_details_list, pages) if details]
+    new_jobs = [(details, url) for details, url in extracted if url not in stored]
+    if new_jobs:
+        # Postings that are not stored yet pass the same filters as process_scraped_job_pages
+        new_jobs = filter_near_duplicates(
+            filter_new_jobs(
+                new_jobs,
+                url=lambda job: job[1],
+                title=lambda job: job[0].get("Job Title"),
+                company=lambda job: job[0].get("Company"),
+                location=lambda job: job[0].get("Location")
+            ),
+            url=lambda job: job[1],
+            text=lambda job: job[0].get("Job Description"),
+            company=lambda job: job[0].get("Company"),
+            location=lambda job: job[0].get("Location")
+        )
+    extracted = [(details, url) for details, url in extracted if url in stored] + new_jobs
+    if not extracted:
+        return 0
+    embeddings = embed_texts([str(details) for details, _ in extracted], 512)
+    for (details, _), embedding in zip(extracted, embeddings):
+        details['Embedding'] = embedding
+    writer.add_many({**job_posting_from_details(details, url), 'digest': None} for details, url in extracted)
+    return len(extracted)
+
+
+@celery.task(bind=True, max_retries=3, name='reprocess_scrape_archive')
+def reprocess_scrape_archive(self, kind=HIRING_CAFE, start_date=None, end_date=None, locations=None, only_existing=True):
+    """
+    Re-runs archived scrapes (see app/scrape_archive.py) through the current parsing, extraction and
+    embedding and updates the stored postings, without any ScrapingBee requests.
+
+    :param kind: HIRING_CAFE (parse_hiring_cafe_job) or PAGE_TEXT (LLM extraction)
+    :param start_date: first scrape date (ISO), default: today
+    :param end_date: last scrape date (ISO), default: today
+    :param locations: Hiring Cafe locations or job board hosts to limit the run to
+    :param only_existing: only update postings already in job_postings (default), or also insert the rest
+    """
+    started = time.monotonic()
+    stats = {'kind': kind, 'payloads': 0, 'unreadable': 0, 'jobs': 0}
+    processed_urls = set()
+    pending = []
 
-            if response.status_code == 200:
-                logger.info(f"Successfully intercepted API response for {location}")
-                print(f"Successfully intercepted API response for {location}")
+    def flush_pending(writer):
+        if not pending:
+            return
+        if kind == HIRING_CAFE:
+            stats['jobs'] += _reprocess_hiring_cafe_records(pending, writer, only_existing)
+        else:
+            stats['jobs'] += _reprocess_page_texts(pending, writer, only_existing)
+        pending.clear()
 
+    try:
+        with JobPostingWriter(update_existing=True) as writer:
+            # Newest payloads first: a posting scraped several times is rebuilt from its latest version
+            for entry in iter_manifest(kind, start_date, end_date, locations):
                 try:
-                    # Parse JSON response
-                    api_responses = response.json()
-
-                    # Ensure "xhr" key exists
-                    if "xhr" in api_responses and isinstance(api_responses["xhr"], list):
-                        search_jobs_response = None
-
-                        for req in api_responses["xhr"]:
-                            if isinstance(req, dict) and req.get("url") == 'https://hiring.cafe/api/search-jobs':
-                                # Debugging: Check raw body
-                                raw_body = req.get("body", "{}")
-                                print(f"Raw 'body' content for {location}: {raw_body[:500]}...")  # Print first 500 chars
-                                
-                                # Ensure that the raw body content is correctly formatted
-                                try:
-                                    # Replace single quotes with double quotes (not ideal for all cases, better validation needed)
-                                    formatted_body = raw_body
-
-                                    # Try parsing the formatted body to JSON
-                                    search_jobs_response = json.loads(formatted_body)
-
-                                except json.JSONDecodeError as e:
-                                    # If JSONDecodeError happens, output it and continue
-                                    print(f"JSON Decode Error while parsing body for {location}: {e}")
-                                    continue  # Skip to next response
-
-                                break
-
-                        # Extract information from the response
-                        if search_jobs_response:
-                            job_results = search_jobs_response.get('results', [])
-
-                            for job_data in job_results:  # 🔁 Loop over all job postings
-                                job_info = job_data.get('job_information', {})
-                                company_data = job_data.get('v5_processed_company_data', {})
-                                workplace_data = job_data.get('v5_processed_job_data', {})
-
-                                # ✅ Extract and format date_posted
-                                date_posted = workplace_data.get('estimated_publish_date')
-                                if date_posted:
-                                    date_posted = datetime.fromisoformat(date_posted.replace("Z", "+00:00"))
-                                    date_posted = date_posted.isoformat()  # ✅ Convert to string before saving
-                                elif workplace_data.get('estimated_publish_date_millis'):
-                                    date_posted = datetime.utcfromtimestamp(workplace_data['estimated_publish_date_millis'] / 1000)
-                                    date_posted = date_posted.isoformat()  # ✅ Convert to string before saving
-                                    
-                                else:
-                                    date_posted = None  # Ensure None if no date is found
-
-                                # ✅ Extract and properly format location (Remove duplicates)
-                                workplace_cities = workplace_data.get('workplace_cities', [])
-                                workplace_states = workplace_data.get('workplace_states', [])
-                                
-                                # Remove duplicates by converting to a set
-                                location_parts = list(dict.fromkeys(workplace_cities + workplace_states))  # Keeps order but removes dupes
-                                location = ", ".join(location_parts) if location_parts else workplace_data.get('formatted_workplace_location', None)
-
-                                # ✅ Extract and clean job description (Remove HTML tags)
-                                raw_description = job_info.get('description', "")
-                                job_description = BeautifulSoup(raw_description, "html.parser").get_text(separator=" ").strip()
-
-                                # ✅ Fix Remote Status Detection
-                                workplace_type = job_data.get('workplace_type') or workplace_data.get('workplace_type')  # Check both levels
-                                if workplace_type:
-                                    workplace_type = workplace_type.strip().lower()  # Normalize case and trim spaces
-
-                                if workplace_type == 'onsite':
-                                    remote = 'No'
-                                elif workplace_type == 'remote':
-                                    remote = 'Yes'
-                                elif workplace_type == 'hybrid':
-                                    remote = 'Hybrid'
-                                else:
-                                    remote = 'Unknown'  # Handle unexpected values
-
-                                # ✅ Debugging: Log what values are being received
-                                logger.warning(f"Debug: workplace_type received: {workplace_type}")  
-
-
-                                # ✅ Extract salary range (Format properly)
-                                min_salary = workplace_data.get('yearly_min_compensation')
-                                max_salary = workplace_data.get('yearly_max_compensation')
-                                salary_range = f"${min_salary:,} - ${max_salary:,}" if min_salary and max_salary else None
-
-                                # ✅ Extract other job details
-                                job_title = job_info.get('title', None)
-                                posting_url = job_data.get('apply_url', None)
-                                company = company_data.get('name', None)
-
-                                # Generate text embedding
-                                embedding_text = f"{job_title} {company} {location} {job_description}"
-                                job_embedding = generate_embedding_job(embedding_text, 512)
-                                logger.info("Generated job embedding")
-
-
-                                # ✅ Prepare data for Supabase
-                                job_record = {
-                                    "date_posted": date_posted,
-                                    "posting_url": posting_url,
-                                    "company": company,
-                                    "location": location,
-                                    "job_description": job_description,
-                                    "remote": remote,
-                                    "salary_range": salary_range,
-                                    "job_title": job_title,
-                                    "embedding512": job_embedding
-                                }
-
-                                # ✅ Save to Supabase (Handle duplicates)
-                                try:
-                                    supabase.table('job_postings').insert(job_record).execute()
-                                    logger.info(f"✅ Job posting saved for {company} at {location}")
-                                    print(f"✅ Job posting saved for {company} at {location}")
-                                except Exception as e:
-                                    logger.error(f"⚠️ Error saving job {posting_url}: {e}")
-                                    print(f"⚠️ Error saving job {posting_url}: {e}")
-
-                        else:
-                            print(f"⚠️ No 'search-jobs' API response found")
-
-
+                    payload = load_payload(entry)
+                    if kind == HIRING_CAFE:
+                        job_records = [parse_hiring_cafe_job(job_data) for job_data in json.loads(payload).get('results', [])]
                     else:
-                        print(f"⚠️ No valid 'xhr' key in the API response for {location}")
+                        job_records = [{'posting_url': entry['source'], 'text': payload}]
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable archived payload {entry.get('digest')}: {e}")
+                    stats['unreadable'] += 1
+                    continue
+                stats['payloads'] += 1
+                for job_record in job_records:
+                    url = job_record.get('posting_url')
+                    if not url or url in processed_urls:
+                        continue
+                    processed_urls.add(url)
+                    pending.append(job_record if kind == HIRING_CAFE else (url, job_record['text']))
+                if len(pending) >= writer.batch_size:
+                    flush_pending(writer)
+            flush_pending(writer)
+    except Exception as e:
+        logger.error(f"Error reprocessing the scrape archive: {e}", exc_info=True)
+        raise self.retry(exc=e)
 
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to decode JSON response for {location}: {e}")
-                    print(f"Failed to decode JSON response for {location}: {e}")
+    stats.update(writer.stats)
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    logger.info(f"Reprocessed the scrape archive: {stats}")
+    return stats
 
-            else:
-                logger.error(f"Failed to fetch API response for {location}, status code: {response.status_code}")
-                print(f"Failed to fetch API response for {location}, status code: {response.status_code}")
 
-        except Exception as e:
-            logger.error(f"Request failed for {location}: {e}")
-            print(f"Request failed for {location}: {e}")
+@celery.task(bind=True, max_retries=3, name='prune_scrape_archive')
+def prune_scrape_archive(self):
+    """Drops archived scrapes older than SCRAPE_ARCHIVE_RETENTION_DAYS."""
+    try:
+        return prune_scrape_archive_days()
+    except Exception as e:
+        logger.error(f"Error pruning the scrape archive: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=600)
 
-def generate_embedding_job(client, text, dimensionality=512):
-    """Generates a text embedding using Azure OpenAI API."""
+def generate_embedding_job(text, dimensionality=512):
+    """Generates a text embedding using Azure OpenAI API, reusing cached vectors for previously seen texts."""
     try:
-        response = embedding_client.embeddings.create(
-            input=str(text),
-            model='text-embedding-3-small',
-            dimensions=dimensionality
-        )
-        return response.data[0].embedding
+        return embed_text(text, dimensionality)
     except Exception as e:
         print(f"Error generating embedding: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,251 @@
+"""
+End-to-end ingestion benchmark against the record/replay proxies in app/replay.py.
+
+Runs the pipeline stages in this process (Celery tasks execute eagerly) with ScrapingBee, Azure
+OpenAI and Supabase served by local proxies, then prints wall time and throughput per stage, time
+per Celery task and request latency per service.
+
+Stages:
+    hiring_cafe  scrape_hiring_cafe_for_location() for each --locations entry (--workers at a time)
+    job_posts    process_job_posts() over --urls-file, or --num-urls generated posting URLs
+    job_fits     calculate_all_job_fits() for --user-pref-id (seeded automatically in synthetic mode)
+
+Modes:
+    synthetic  no fixtures or credentials needed; every service is generated locally
+    record     real services through the proxies, exchanges saved under --fixtures (needs .dev.env)
+    replay     recorded exchanges served from --fixtures, unrecorded requests answered synthetically
+
+Needs a local Redis and the app's env file (.dev.env; it may be empty in synthetic mode). The
+caches, seen-jobs filter and rate limiter state live in --redis-url (default database 15), which
+is flushed first unless --keep-redis.
+
+Usage:
+    python bench_ingestion.py synthetic --num-urls 50 --locations Florida,Texas
+    python bench_ingestion.py record --fixtures fixtures/ingestion --urls-file urls.txt --user-pref-id 12
+    python bench_ingestion.py replay --fixtures fixtures/ingestion --urls-file urls.txt --user-pref-id 12 --error-rate 0.05
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Load the proxies without importing the app: its settings must point at them before it is imported
+spec = importlib.util.spec_from_file_location('replay', os.path.join(base_dir, 'app', 'replay.py'))
+replay = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(replay)
+
+# Environment variable holding each service's URL, and its default when unset
+SERVICE_URLS = {
+    'scrapingbee': ('SCRAPINGBEE_API_URL', 'https://app.scrapingbee.com/api/v1/'),
+    'openai': ('AZURE_OPENAI_ENDPOINT_COVER_LETTER', None),
+    'embeddings': ('AZURE_OPENAI_EMBEDDING_ENDPOINT', None),
+    'jobmatcher': ('JOBMATCHER_EMBEDDING_ENDPOINT', 'https://cognibly-jobs-ai-service.openai.azure.com/openai/deployments/text-embedding-3-small/embeddings?api-version=2023-05-15'),
+    'supabase': ('SUPABASE_URL', None),
+}
+PLACEHOLDER_URLS = {
+    'openai': 'https://replay-openai.invalid',
+    'embeddings': 'https://replay-embeddings.invalid',
+    'supabase': 'https://replay-supabase.invalid',
+}
+# Credentials the app requires at import; placeholders are only used when nothing real is configured
+PLACEHOLDER_SETTINGS = {
+    'SUPABASE_KEY': 'replay.replay.replay',
+    'SCRAPINGBEE_API_KEY': 'replay',
+    'AZURE_CLIENT_ID': 'replay', 'AZURE_TENANT_ID': 'replay', 'AZURE_CLIENT_SECRET': 'replay',
+    'AZURE_OPENAI_API_KEY_COVER_LETTER': 'replay', 'AZURE_OPENAI_TEXT_EMBEDDING_KEY': 'replay', 'AZURE_OPENAI_KEY': 'replay',
+    'STRIPE_ENDPOINT_SECRET': 'replay', 'STRIPE_TEST_SECRET_KEY': 'replay', 'STRIPE_SUBSCRIPTION_TEST_PRICE_ID': 'replay',
+    'STRIPE_SECRET_KEY': 'replay', 'STRIPE_SUBSCRIPTION_PRICE_ID': 'replay',
+}
+# Rate limits high enough that the benchmark measures the pipeline, not the request budgets
+UNTHROTTLED_SETTINGS = {
+    'SCRAPINGBEE_CREDITS_PER_MINUTE': '1000000', 'LLM_RPM_LIMIT': '1000000', 'LLM_TPM_LIMIT': '1000000000',
+    'EMBEDDING_RPM_LIMIT': '1000000', 'EMBEDDING_TPM_LIMIT': '1000000000',
+}
+
+
+def configured_settings():
+    """Settings from the environment, then the app's env file (what app.extensions would read)."""
+    settings = {}
+    environment = os.getenv('FLASK_ENV', 'development')
+    env_file = os.path.join(base_dir, '.env' if environment == 'production' else '.dev.env')
+    if os.path.exists(env_file):
+        from decouple import RepositoryEnv
+        settings.update(RepositoryEnv(env_file).data)
+    settings.update(os.environ)
+    return settings
+
+
+def proxied_url(original, proxy_url):
+    """The original service URL with its scheme and host replaced by the proxy's."""
+    parts = urlsplit(original)
+    return f"{proxy_url}{parts.path}" + (f"?{parts.query}" if parts.query else '')
+
+
+def upstream_origin(original):
+    parts = urlsplit(original)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def summarize(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        'count': len(samples),
+        'mean': round(statistics.fmean(samples), 3),
+        'p50': round(ordered[len(ordered) // 2], 3),
+        'p95': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        'total': round(sum(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=['synthetic', 'record', 'replay'])
+    parser.add_argument('--fixtures', default=os.path.join(base_dir, 'fixtures', 'ingestion'))
+    parser.add_argument('--stages', default='hiring_cafe,job_posts,job_fits')
+    parser.add_argument('--locations', default='Florida,Texas,Ohio')
+    parser.add_argument('--workers', type=int, default=5, help='locations scraped at a time (HIRING_CAFE_CONCURRENCY)')
+    parser.add_argument('--urls-file', help='job posting URLs, one per line')
+    parser.add_argument('--num-urls', type=int, default=30, help='generated posting URLs when no --urls-file')
+    parser.add_argument('--user-pref-id', type=int, help='user_job_preferences id for job_fits')
+    parser.add_argument('--port', type=int, default=8701, help='first proxy port; one port per service')
+    parser.add_argument('--latency', action='append', help='fixed latency per service, e.g. scrapingbee=2.5')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='multiplier for recorded latencies')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--strict', action='store_true', help='fail unrecorded requests in replay mode')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    parser.add_argument('--keep-redis', action='store_true')
+    parser.add_argument('--keep-rate-limits', action='store_true', help='keep the production request budgets')
+    parser.add_argument('--json', dest='json_output', help='also write the report to this file')
+    args = parser.parse_args()
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+
+    settings = configured_settings()
+    services, originals = {}, {}
+    for offset, (service, (variable, default)) in enumerate(SERVICE_URLS.items()):
+        original = settings.get(variable) or default or PLACEHOLDER_URLS[service]
+        if args.mode == 'record' and original == PLACEHOLDER_URLS.get(service):
+            sys.exit(f"Recording needs {variable} (set it in the environment or .dev.env)")
+        originals[service] = original
+        services[service] = (args.port + offset, upstream_origin(original) if args.mode == 'record' else None)
+
+    servers = replay.start_proxies(
+        services, args.mode, fixtures_dir=None if args.mode == 'synthetic' else args.fixtures,
+        latencies=replay.service_values(args.latency, float), jitter=args.jitter, latency_scale=args.latency_scale,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, strict=args.strict
+    )
+
+    # Point the app at the proxies before it is imported
+    for service, proxy_url in servers.urls().items():
+        os.environ[SERVICE_URLS[service][0]] = proxied_url(originals[service], proxy_url)
+    if args.mode != 'record':
+        for name, value in PLACEHOLDER_SETTINGS.items():
+            os.environ.setdefault(name, settings.get(name) or value)
+    if not args.keep_rate_limits:
+        os.environ.update(UNTHROTTLED_SETTINGS)
+    os.environ['REDIS_URL'] = args.redis_url
+
+    from celery.signals import task_prerun, task_postrun
+    from app.celery_app import celery
+    from app.extensions import redis_client, supabase
+    from app import tasks
+    from app.jobmatcher import calculate_all_job_fits
+    from app.embeddings import embed_text
+
+    if not args.keep_redis:
+        redis_client.flushdb()
+    celery.conf.task_always_eager = True
+    celery.conf.task_eager_propagates = False
+
+    task_started, task_times = {}, {}
+
+    @task_prerun.connect(weak=False)
+    def on_prerun(task_id=None, task=None, **kwargs):
+        task_started[task_id] = time.monotonic()
+
+    @task_postrun.connect(weak=False)
+    def on_postrun(task_id=None, task=None, **kwargs):
+        if task_id in task_started:
+            task_times.setdefault(task.name.split('.')[-1], []).append(time.monotonic() - task_started.pop(task_id))
+
+    def count_rows(table):
+        return supabase.table(table).select('id', count='exact').limit(1).execute().count or 0
+
+    report = {'mode': args.mode, 'stages': {}}
+
+    def run_stage(name, items, work):
+        print(f"Running {name} over {items} items...")
+        started = time.monotonic()
+        detail = work()
+        elapsed = time.monotonic() - started
+        report['stages'][name] = {'items': items, 'seconds': round(elapsed, 2),
+                                  'items_per_second': round(items / elapsed, 2) if elapsed else None, **(detail or {})}
+
+    if 'hiring_cafe' in stages:
+        locations = [location.strip() for location in args.locations.split(',') if location.strip()]
+
+        def scrape_locations():
+            latencies = []
+
+            def scrape(location):
+                started = time.monotonic()
+                stats = tasks.scrape_hiring_cafe_for_location(location)
+                latencies.append(time.monotonic() - started)
+                return stats
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                results = list(pool.map(scrape, locations))
+            totals = {field: sum(result.get(field) or 0 for result in results) for field in ('found', 'old', 'seen', 'new', 'failed')}
+            return {'per_location': summarize(latencies), **totals,
+                    'errors': [result['error'] for result in results if result.get('error')]}
+        run_stage('hiring_cafe', len(locations), scrape_locations)
+
+    if 'job_posts' in stages:
+        if args.urls_file:
+            with open(args.urls_file, encoding='utf-8') as f:
+                urls = [line.strip() for line in f if line.strip()]
+        else:
+            urls = [f"https://jobs.example.com/postings/{i}" for i in range(args.num_urls)]
+
+        def process_posts():
+            before = count_rows('job_postings')
+            tasks.process_job_posts.apply(args=(urls, 'bench'))
+            return {'stored': count_rows('job_postings') - before}
+        run_stage('job_posts', len(urls), process_posts)
+
+    if 'job_fits' in stages:
+        user_pref_id = args.user_pref_id
+        if user_pref_id is None and args.mode == 'synthetic':
+            embedding = embed_text("Senior data analyst, SQL, Python, forecasting, Austin TX", 512)
+            user_pref_id = supabase.table('user_job_preferences').insert({'embedding512': embedding}).execute().data[0]['id']
+        if user_pref_id is None:
+            print("Skipping job_fits: pass --user-pref-id")
+        else:
+            jobs = count_rows('job_postings')
+
+            def job_fits():
+                scores = calculate_all_job_fits(user_pref_id)
+                return {'scored': 0 if scores is None else len(scores)}
+            run_stage('job_fits', jobs, job_fits)
+
+    report['tasks'] = {name: summarize(samples) for name, samples in sorted(task_times.items())}
+    report['services'] = servers.stats()
+    servers.stop()
+
+    print(json.dumps(report, indent=2))
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
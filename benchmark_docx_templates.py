@@ -0,0 +1,126 @@
+"""
+Render-time benchmark for the resume and cover letter templates.
+
+Compares the previous approach (parse the template with Document() on every request and rescan
+every paragraph once per placeholder) with app/docx_templates.py (parse once, deep-copy the tree,
+fill the indexed slots), and checks both produce the same document XML.
+
+Usage: python benchmark_docx_templates.py [iterations]
+"""
+import copy
+import importlib.util
+import os
+import sys
+import time
+from docx import Document
+from docx.shared import Pt
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+docs_dir = os.path.join(base_dir, 'app', 'docs')
+
+# Load the module directly so the benchmark doesn't need the app's environment (Supabase, Azure keys, ...)
+spec = importlib.util.spec_from_file_location('docx_templates', os.path.join(base_dir, 'app', 'docx_templates.py'))
+docx_templates = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(docx_templates)
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+resume_values = {
+    "$FULLNAME": "Jordan Example",
+    "$POSTNOMIAL": "MBA",
+    "$CONTACTDETAILS": "Austin, TX · jordan@example.com · 555-0100",
+    "$SUMMARY": "Operations leader with ten years of experience scaling customer support and logistics teams. " * 3,
+    "$SKILLS": "Leadership, Budgeting, SQL, Process Improvement, Vendor Management, Forecasting",
+}
+cover_letter_values = {
+    '$FULLNAME': "Jordan Example",
+    '$POSTNOMIAL': "MBA",
+    '$CONTACTDETAILS': "Austin, TX • 555-0100 • jordan@example.com",
+    '$DATETIME': "01-01-2025",
+    '$COMPANY_LOCATION': "Example Corp\n1 Main Street\nAustin, TX 78701",
+    '$USER_LOCATION': "Austin, TX",
+    '$SUMMARY': "Dear Hiring Committee,\n" + "I am excited to apply for the Operations Manager role. " * 20,
+    '$EMAIL': "jordan@example.com",
+    '$PHONENUMBER': "555-0100",
+}
+
+
+def legacy_replace_placeholders(paragraphs, replacements):
+    # Previous run-by-run replacement: every paragraph rescanned once per placeholder
+    for paragraph in paragraphs:
+        for placeholder, value in replacements.items():
+            if value is None:
+                value = ''
+            if placeholder == '$FULLNAME':
+                postnomial = replacements.get('$POSTNOMIAL', '')
+                value = value + (', ' + postnomial if postnomial else '')
+            for run in paragraph.runs:
+                if placeholder in run.text:
+                    run.text = run.text.replace(placeholder, value)
+                    run.font.size = docx_templates.PLACEHOLDER_FONT_SIZES.get(placeholder, Pt(10))
+
+
+def legacy_resume(values):
+    document = Document(os.path.join(docs_dir, 'resume_template.docx'))
+    for section in document.sections:
+        legacy_replace_placeholders(section.header.paragraphs, values)
+        legacy_replace_placeholders(section.footer.paragraphs, values)
+        legacy_replace_placeholders(document.paragraphs, values)
+    # Anchor lookup for the section placeholders, as add_section_to_template did
+    for heading in ('$WORKEXPERIENCE', '$EDUCATION', '$CERTIFICATIONS'):
+        next(para for para in document.paragraphs if heading in para.text)
+    return document
+
+
+def legacy_cover_letter(values):
+    document = Document(os.path.join(docs_dir, 'cover_letter_template.docx'))
+    for paragraph in document.paragraphs:
+        for placeholder, value in values.items():
+            if value is None:
+                value = ''
+            if placeholder in paragraph.text:
+                paragraph.text = paragraph.text.replace(placeholder, value)
+            for run in paragraph.runs:
+                run.font.size = Pt(10)
+    for section in document.sections:
+        legacy_replace_placeholders(section.header.paragraphs, values)
+    return document
+
+
+def compiled_resume(values):
+    rendered = docx_templates.render_template(os.path.join(docs_dir, 'resume_template.docx'), values)
+    for heading in ('$WORKEXPERIENCE', '$EDUCATION', '$CERTIFICATIONS'):
+        rendered.anchor(heading)
+    return rendered.document
+
+
+def compiled_cover_letter(values):
+    return docx_templates.render_template(
+        os.path.join(docs_dir, 'cover_letter_template.docx'), values, body_mode='paragraphs', body_font_size=Pt(10)
+    ).document
+
+
+def xml_of(document):
+    parts = [document.element.xml]
+    for section in document.sections:
+        parts.append(section.header.part.element.xml)
+        parts.append(section.footer.part.element.xml)
+    return parts
+
+
+def time_it(render, values):
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        render(copy.copy(values))
+    return (time.perf_counter() - start_time) / iterations * 1000
+
+
+for name, legacy, compiled, values in (
+    ('resume', legacy_resume, compiled_resume, resume_values),
+    ('cover_letter', legacy_cover_letter, compiled_cover_letter, cover_letter_values),
+):
+    same_output = xml_of(legacy(values)) == xml_of(compiled(values))
+    legacy_ms = time_it(legacy, values)
+    compiled_ms = time_it(compiled, values)
+    print(f"{name}: legacy {legacy_ms:.2f} ms, compiled {compiled_ms:.2f} ms per render "
+          f"({legacy_ms / compiled_ms:.1f}x faster), identical output: {same_output}")
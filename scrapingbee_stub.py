@@ -0,0 +1,69 @@
+"""
+Local stand-in for the ScrapingBee HTTP API, for tests and scraping benchmarks.
+
+Answers GET /api/v1/ after a fixed delay (plus jitter), like a JS-rendered scrape:
+- extract_rules requests get {"text": ...} with a generated job posting
+- json_response requests get an "xhr" list holding an empty Hiring Cafe search-jobs response
+- anything else gets a small HTML page
+A share of requests can be answered with 429 or 500 to exercise the retry and throttling paths.
+
+Usage:
+    python scrapingbee_stub.py [--port 8765] [--latency 2.0] [--jitter 0.5] [--throttle-rate 0] [--error-rate 0]
+    SCRAPINGBEE_API_URL=http://127.0.0.1:8765/api/v1/ celery -A app.celery_app worker -Q scraping_queue
+"""
+import argparse
+import asyncio
+import json
+import random
+from aiohttp import web
+
+JOB_TEXT = (
+    "Senior Data Analyst\nExample Corp\nAustin, TX (Hybrid)\nPosted 2025-01-15\n"
+    "We are looking for a data analyst to build dashboards and forecasting models. "
+    "Requirements: 5+ years of SQL, Python and stakeholder management.\nSalary: $95,000 - $120,000\n"
+)
+
+
+def make_app(latency, jitter, throttle_rate, error_rate):
+    stats = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    async def scrape(request):
+        stats['requests'] += 1
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            roll = random.random()
+            if roll < throttle_rate:
+                return web.json_response({'message': 'Too many concurrent requests'}, status=429, headers={'Retry-After': '1'})
+            if roll < throttle_rate + error_rate:
+                return web.json_response({'message': 'Internal error'}, status=500)
+
+            url = request.query.get('url', '')
+            if request.query.get('extract_rules'):
+                return web.json_response({'text': f"{JOB_TEXT}Apply at {url}"})
+            if request.query.get('json_response') in ('True', 'true'):
+                body = json.dumps({'results': []})
+                return web.json_response({'body': '', 'xhr': [{'url': 'https://hiring.cafe/api/search-jobs', 'body': body}]})
+            return web.Response(text=f"<html><body><h1>Stub page</h1><p>{url}</p></body></html>", content_type='text/html')
+        finally:
+            stats['in_flight'] -= 1
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get('/api/v1/', scrape)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.5, help='+/- seconds added to the latency')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 500')
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.jitter, args.throttle_rate, args.error_rate), host='127.0.0.1', port=args.port)
@@ -7,6 +7,8 @@ cleanup() {
     echo "Ctrl-C detected. Shutting down..."
     kill $FLOWER_PID
     kill $WORKER_PID
+    kill $SCRAPING_WORKER_PID
+    kill $DOCUMENTS_WORKER_PID
     kill $BEAT_PID
     kill $FLASK_PID
     return 1
@@ -38,6 +40,14 @@ FLOWER_PID=$!
 FLASK_ENV=development celery -A app.celery_app.celery worker --loglevel=info &
 WORKER_PID=$!
 
+# Start the ScrapingBee worker; its concurrency caps in-flight scrapes per host
+FLASK_ENV=development celery -A app.celery_app.celery worker -Q scraping_queue -n scraping@%h --concurrency=5 --loglevel=info &
+SCRAPING_WORKER_PID=$!
+
+# Start the document generation worker (resumes / cover letters: LLM calls + LibreOffice)
+FLASK_ENV=development celery -A app.celery_app.celery worker -Q documents_queue -n documents@%h --concurrency=4 --loglevel=info &
+DOCUMENTS_WORKER_PID=$!
+
 # Start Beat worker in the background
 FLASK_ENV=development celery -A app.celery_app.celery beat --loglevel=info &
 BEAT_PID=$!
@@ -46,4 +56,4 @@ FLASK_ENV=development flask run --debug &
 FLASK_PID=$!
 
 # Wait for both processes
-wait $FLOWER_PID $WORKER_PID $BEAT_PID $FLASK_PID
+wait $FLOWER_PID $WORKER_PID $SCRAPING_WORKER_PID $DOCUMENTS_WORKER_PID $BEAT_PID $FLASK_PID
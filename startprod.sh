@@ -5,6 +5,8 @@ cleanup() {
     echo "Ctrl-C detected. Shutting down..."
     kill $FLOWER_PID
     kill $WORKER_PID
+    kill $SCRAPING_WORKER_PID
+    kill $DOCUMENTS_WORKER_PID
     kill $BEAT_PID
     kill $FLASK_PID
     return 1
@@ -36,6 +38,14 @@ FLOWER_PID=$!
 celery -A app.celery_app.celery worker --loglevel=info &
 WORKER_PID=$!
 
+# Start the ScrapingBee worker; its concurrency caps in-flight scrapes per host
+celery -A app.celery_app.celery worker -Q scraping_queue -n scraping@%h --concurrency=5 --loglevel=info &
+SCRAPING_WORKER_PID=$!
+
+# Start the document generation worker (resumes / cover letters: LLM calls + LibreOffice)
+celery -A app.celery_app.celery worker -Q documents_queue -n documents@%h --concurrency=4 --loglevel=info &
+DOCUMENTS_WORKER_PID=$!
+
 # Start Beat worker in the background
 celery -A app.celery_app.celery beat --loglevel=info &
 BEAT_PID=$!
@@ -44,4 +54,4 @@ flask run &
 FLASK_PID=$!
 
 # Wait for both processes
-wait $FLOWER_PID $WORKER_PID $BEAT_PID $FLASK_PID
+wait $FLOWER_PID $WORKER_PID $SCRAPING_WORKER_PID $DOCUMENTS_WORKER_PID $BEAT_PID $FLASK_PID
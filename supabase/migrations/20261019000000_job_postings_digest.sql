@@ -0,0 +1,4 @@
+-- Compact per-job summary (skills, responsibilities, seniority) written by app/job_digest.py and
+-- reused by every resume and cover letter generated for the job. NULL until first generated.
+alter table public.job_postings
+    add column if not exists digest jsonb;
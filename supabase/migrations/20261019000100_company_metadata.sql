@@ -0,0 +1,8 @@
+-- Per-company metadata (mailing address for cover letters) read and written by app/company_metadata.py.
+-- normalized_name is the upsert on_conflict key, so it must carry a unique constraint.
+create table if not exists public.company_metadata (
+    normalized_name text primary key,
+    name text not null,
+    address text,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,109 @@
+# tests/conftest.py
+"""
+Test doubles for app.extensions, which connects to Supabase, Azure OpenAI and Redis when it is
+imported. The modules under test get a fakeredis client and an in-memory Supabase table store
+instead, so these tests need no credentials or running services. app/__init__.py (the Flask app
+factory) is not executed either: the app package is registered by path.
+
+Install the test dependencies with: pip install -r requirements-test.txt
+"""
+import logging
+import os
+import sys
+import types
+
+import fakeredis
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+class FakeQuery:
+    """The subset of the postgrest query builder the pipeline uses, over a list of dict rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.bounds = None
+
+    def select(self, *columns):
+        return self
+
+    def order(self, column, desc=False):
+        self.filters.append(lambda rows: sorted(rows, key=lambda row: row[column], reverse=desc))
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda rows: [row for row in rows if row.get(column) == value])
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda rows: [row for row in rows if row.get(column) in values])
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        rows = list(self.rows)
+        for apply in self.filters:
+            rows = apply(rows)
+        if self.bounds:
+            rows = rows[self.bounds[0]:self.bounds[1] + 1]
+        return types.SimpleNamespace(data=rows)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return FakeQuery(self.tables.setdefault(name, []))
+
+
+def _config(name, default=None, cast=None):
+    value = os.environ.get(name, default)
+    if cast is bool and isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return cast(value) if cast and value is not None else value
+
+
+def _install_extensions():
+    package = types.ModuleType('app')
+    package.__path__ = [os.path.join(ROOT, 'app')]
+    sys.modules['app'] = package
+
+    extensions = types.ModuleType('app.extensions')
+    extensions.config = _config
+    extensions.logger = logging.getLogger('cognibly_app')
+    extensions.redis_client = fakeredis.FakeRedis()
+    extensions.supabase = FakeSupabase()
+    extensions.llm_client = None
+    extensions.embedding_client = None
+    extensions.llm_model_name = 'test-chat-model'
+    extensions.text_embedding_model_name = 'test-embedding-model'
+    extensions.api_key = 'test-key'
+    extensions.azure_endpoint = 'http://127.0.0.1:9'
+    extensions.scrapingbee_api_key = 'test-key'
+    sys.modules['app.extensions'] = extensions
+    return extensions
+
+
+extensions = _install_extensions()
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    """The shared fake Redis, emptied before each test."""
+    extensions.redis_client.flushall()
+    return extensions.redis_client
+
+
+@pytest.fixture
+def supabase():
+    """The in-memory Supabase; tests fill supabase.tables['job_postings'] etc. with rows."""
+    extensions.supabase.tables.clear()
+    return extensions.supabase
@@ -0,0 +1,74 @@
+import types
+import zlib
+
+import numpy as np
+import pytest
+
+from app import embeddings
+from app.embeddings import embed_text, embed_texts, get_embedding_cache_stats
+
+
+def vector_for(text, dimensions):
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    return rng.standard_normal(dimensions).tolist()
+
+
+class FakeEmbeddingClient:
+    """embeddings.create() returning deterministic vectors, in reverse order as the API may, and recording inputs."""
+
+    def __init__(self):
+        self.requests = []
+        self.embeddings = types.SimpleNamespace(create=self.create)
+
+    def create(self, input, model, dimensions):
+        self.requests.append(list(input))
+        data = [types.SimpleNamespace(index=i, embedding=vector_for(text, dimensions)) for i, text in enumerate(input)]
+        return types.SimpleNamespace(data=list(reversed(data)))
+
+
+@pytest.fixture
+def client():
+    return FakeEmbeddingClient()
+
+
+def test_vectors_follow_input_order(client):
+    texts = ['data analyst', 'software engineer', 'nurse']
+    vectors = embed_texts(texts, 8, client=client, model='m')
+    for text, vector in zip(texts, vectors):
+        assert vector == pytest.approx(vector_for(text, 8), rel=1e-6)
+
+
+def test_repeats_are_embedded_once(client):
+    vectors = embed_texts(['data analyst', 'nurse', 'data   analyst\n'], 8, client=client, model='m')
+    assert client.requests == [['data analyst', 'nurse']]
+    assert vectors[0] == vectors[2]
+
+
+def test_cached_texts_skip_the_api(client):
+    embed_texts(['data analyst', 'nurse'], 8, client=client, model='m')
+    embed_texts(['nurse', 'pilot', 'data analyst'], 8, client=client, model='m')
+    assert client.requests == [['data analyst', 'nurse'], ['pilot']]
+    stats = get_embedding_cache_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 3
+
+
+def test_cache_is_keyed_by_model_and_dimensions(client):
+    embed_text('nurse', 8, client=client, model='m')
+    embed_text('nurse', 16, client=client, model='m')
+    embed_text('nurse', 8, client=client, model='other')
+    assert len(client.requests) == 3
+
+
+def test_hits_and_misses_return_the_same_values(client):
+    fresh = embed_text('data analyst', 8, client=client, model='m')
+    cached = embed_text('data analyst', 8, client=client, model='m')
+    assert len(client.requests) == 1
+    assert fresh == cached
+
+
+def test_requests_are_split_into_bounded_batches(client, monkeypatch):
+    monkeypatch.setattr(embeddings, 'EMBEDDING_BATCH_MAX_ITEMS', 2)
+    texts = [f'job {i}' for i in range(5)]
+    vectors = embed_texts(texts, 8, client=client, model='m')
+    assert [len(request) for request in client.requests] == [2, 2, 1]
+    assert vectors[4] == pytest.approx(vector_for('job 4', 8), rel=1e-6)
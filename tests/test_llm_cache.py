@@ -0,0 +1,127 @@
+import asyncio
+import json
+import types
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from app import llm_cache
+from app.llm_cache import acached_chat_completion, cached_chat_completion, get_llm_cache_stats
+
+MESSAGES = [{"role": "system", "content": "Extract the job title."}, {"role": "user", "content": "Senior Data Analyst at Acme"}]
+
+
+def completion(content, finish_reason='stop'):
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'test-chat-model',
+        'choices': [{'index': 0, 'finish_reason': finish_reason, 'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': 20, 'completion_tokens': 5, 'total_tokens': 25}
+    })
+
+
+class FakeChatClient:
+    """Answers chat.completions.create() with the given replies in turn and counts the calls."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        return self.replies[min(self.calls, len(self.replies)) - 1]
+
+
+class FakeAsyncChatClient(FakeChatClient):
+    async def create(self, **request):
+        return FakeChatClient.create(self, **request)
+
+
+@pytest.fixture(autouse=True)
+def empty_local_cache():
+    llm_cache.local_cache.clear()
+
+
+def test_repeated_prompt_is_served_from_cache():
+    client = FakeChatClient(completion('{"title": "Senior Data Analyst"}'))
+    first = cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    second = cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    assert client.calls == 1
+    assert second.choices[0].message.content == first.choices[0].message.content
+    stats = get_llm_cache_stats()
+    assert stats['misses'] == 1 and stats['hits_local'] == 1
+
+
+def test_redis_tier_is_shared_between_processes():
+    client = FakeChatClient(completion('Senior Data Analyst'))
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    llm_cache.local_cache.clear()  # another worker: empty in-process tier
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    assert client.calls == 1
+    assert get_llm_cache_stats()['hits_redis'] == 1
+
+
+def test_different_prompts_and_high_temperatures_miss():
+    client = FakeChatClient(completion('Senior Data Analyst'))
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    cached_chat_completion(client, 'test-chat-model', MESSAGES[:1] + [{"role": "user", "content": "Engineer"}], temperature=0)
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0.9)
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0.9)
+    assert client.calls == 4
+
+
+@pytest.mark.parametrize('reply', [completion(''), completion('{"title": "Sen', finish_reason='length'), completion('Sorry, I can\'t help with that.')])
+def test_unusable_replies_are_not_cached(reply):
+    client = FakeChatClient(reply, completion('{"title": "Senior Data Analyst"}'))
+    for _ in range(3):
+        response = cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0, validate=json.loads)
+    assert client.calls == 2
+    assert json.loads(response.choices[0].message.content) == {"title": "Senior Data Analyst"}
+
+
+def test_cached_reply_the_parser_now_rejects_is_refetched():
+    client = FakeChatClient(completion('Senior Data Analyst'), completion('{"title": "Senior Data Analyst"}'))
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0, validate=json.loads)
+    assert client.calls == 2
+    assert get_llm_cache_stats()['rejected'] == 1
+
+
+def test_size_bound_evicts_least_recently_used(monkeypatch, redis_client):
+    monkeypatch.setattr(llm_cache, 'LLM_CACHE_MAX_ENTRIES', 2)
+    client = FakeChatClient(completion('Senior Data Analyst'))
+    for title in ('A', 'B', 'C'):
+        cached_chat_completion(client, 'test-chat-model', [{"role": "user", "content": title}], temperature=0)
+    assert redis_client.zcard(llm_cache.CACHE_INDEX_KEY) == 2
+    assert get_llm_cache_stats()['evictions'] == 1
+
+
+def test_async_completion_shares_the_cache():
+    client = FakeAsyncChatClient(completion('Senior Data Analyst'))
+
+    async def run():
+        await acached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+        llm_cache.local_cache.clear()
+        return await acached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+
+    assert asyncio.run(run()).choices[0].message.content == 'Senior Data Analyst'
+    assert client.calls == 1
+
+
+def test_unreadable_cache_entry_counts_as_a_miss(redis_client):
+    key = llm_cache.cache_key('test-chat-model', MESSAGES, 0)
+    redis_client.set(llm_cache.CACHE_PREFIX + key, '{"not": "a completion"}')
+    redis_client.zadd(llm_cache.CACHE_INDEX_KEY, {key: 1})
+    client = FakeChatClient(completion('Senior Data Analyst'))
+    response = cached_chat_completion(client, 'test-chat-model', MESSAGES, temperature=0)
+    assert response.choices[0].message.content == 'Senior Data Analyst'
+    assert client.calls == 1
+    assert get_llm_cache_stats()['rejected'] == 1
+    # Replaced by the fresh reply
+    assert 'Senior Data Analyst' in redis_client.get(llm_cache.CACHE_PREFIX + key).decode('utf-8')
+
+
+def test_conversations_differing_only_in_roles_get_different_keys():
+    asked = [{"role": "user", "content": "Is this remote?"}, {"role": "assistant", "content": "Yes."}]
+    answered = [{"role": "assistant", "content": "Is this remote?"}, {"role": "user", "content": "Yes."}]
+    assert llm_cache.cache_key('m', asked, 0) != llm_cache.cache_key('m', answered, 0)
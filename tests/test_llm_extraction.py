@@ -0,0 +1,46 @@
+import asyncio
+import types
+
+from openai.types.chat import ChatCompletion
+
+from app import llm_cache, rate_limiter
+from app.llm_extraction import extract_batch
+
+
+class FakeAsyncChatClient:
+    """Replies with the user content wrapped as JSON and records each request's options."""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.requests.append(request)
+        content = '{"title": "%s"}' % request['messages'][-1]['content']
+        return ChatCompletion.model_validate({
+            'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}]
+        })
+
+    async def close(self):
+        pass
+
+
+def test_results_keep_input_order_and_skip_empty_pages():
+    llm_cache.local_cache.clear()
+    client = FakeAsyncChatClient()
+    results = asyncio.run(extract_batch(['a', '', 'c'], 'm', client=client, concurrency=2))
+    assert results == [{'title': 'a'}, None, {'title': 'c'}]
+
+
+def test_rate_limiter_wait_does_not_count_against_the_request_timeout(monkeypatch):
+    llm_cache.local_cache.clear()
+
+    async def slow_bucket(bucket, amount, per_minute, max_wait=None):
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setattr(rate_limiter, 'acquire_async', slow_bucket)
+    client = FakeAsyncChatClient()
+    results = asyncio.run(extract_batch(['slow page'], 'm', client=client, timeout=0.05))
+    assert results == [{'title': 'slow page'}]
+    assert client.requests[0]['timeout'] == 0.05
@@ -0,0 +1,67 @@
+from app import near_duplicates
+from app.near_duplicates import filter_near_duplicates, index_jobs
+
+DESCRIPTION = (
+    "We are looking for a senior data analyst to join our analytics team in Austin. You will build "
+    "dashboards, own the forecasting models for our retail business and work with finance, product and "
+    "operations stakeholders. Requirements: five or more years of SQL and Python, experience with dbt and "
+    "Looker, and strong written communication. We offer a hybrid schedule, health insurance and a yearly "
+    "learning budget."
+)
+
+
+def job(url, description=DESCRIPTION, company='Acme', location='Austin, TX', id=None):
+    return {'id': id, 'posting_url': url, 'job_description': description, 'company': company, 'location': location}
+
+
+def reposted(description=DESCRIPTION):
+    # The same posting with a changed last sentence, as job boards re-list it
+    return description.replace("and a yearly learning budget.", "and a generous yearly learning budget.")
+
+
+def build_index(supabase, jobs):
+    supabase.tables['job_postings'] = [dict(j, id=i) for i, j in enumerate(jobs)]
+    return near_duplicates.rebuild_near_duplicate_index()
+
+
+def test_near_duplicate_of_a_stored_job_is_dropped(supabase):
+    build_index(supabase, [job('https://x.com/1')])
+    jobs = [job('https://x.com/2', reposted()), job('https://x.com/3', "A completely different role " * 20)]
+    assert filter_near_duplicates(jobs) == jobs[1:]
+
+
+def test_same_text_at_another_company_is_kept(supabase):
+    build_index(supabase, [job('https://x.com/1')])
+    other = job('https://y.com/1', reposted(), company='Globex')
+    assert filter_near_duplicates([other]) == [other]
+
+
+def test_near_duplicates_within_a_batch_are_dropped(supabase):
+    build_index(supabase, [])
+    jobs = [job('https://x.com/1'), job('https://x.com/2', reposted())]
+    assert filter_near_duplicates(jobs) == jobs[:1]
+
+
+def test_jobs_indexed_after_ingestion_are_found(supabase):
+    build_index(supabase, [])
+    index_jobs([job('https://x.com/1')])
+    assert filter_near_duplicates([job('https://x.com/2', reposted())]) == []
+    # A job is never its own duplicate (reprocessing a stored posting)
+    assert filter_near_duplicates([job('https://x.com/1')])
+
+
+def test_rebuild_swaps_generations_and_drops_deleted_postings(supabase, redis_client):
+    build_index(supabase, [job('https://x.com/1')])
+    old_generation = near_duplicates._live_generation()
+
+    assert build_index(supabase, [job('https://x.com/2', "Another role entirely " * 20)]) == 1
+    assert near_duplicates._live_generation() != old_generation
+    assert not list(redis_client.scan_iter(match=f"neardup:{old_generation}:*"))
+    reposting = job('https://x.com/3', reposted())
+    assert filter_near_duplicates([reposting]) == [reposting]
+
+
+def test_rebuild_is_skipped_while_another_one_holds_the_lock(supabase, redis_client):
+    redis_client.set(near_duplicates.REBUILD_LOCK_KEY, 'other-worker')
+    assert build_index(supabase, [job('https://x.com/1')]) is None
+    assert not near_duplicates.near_duplicate_index_ready()
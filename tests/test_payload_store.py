@@ -0,0 +1,62 @@
+import os
+import random
+import time
+
+import pytest
+
+from app import payload_store
+from app.payload_store import drop_payloads, get_payload, get_payloads, is_payload_ref, put_payload, put_payloads
+
+
+def large_value():
+    # Random floats don't compress below the inline limit, like a real embedding
+    return [random.random() for _ in range(512)]
+
+
+def test_small_values_travel_inline():
+    assert put_payload({'url': 'https://x.com/1'}) == {'url': 'https://x.com/1'}
+
+
+def test_large_values_are_stored_and_resolved():
+    values = [large_value(), 'short', large_value()]
+    refs = put_payloads(values)
+    assert is_payload_ref(refs[0]) and refs[1] == 'short' and is_payload_ref(refs[2])
+    assert get_payloads(refs) == values
+
+
+def test_dropped_or_expired_reference_raises_key_error(redis_client):
+    dropped, expired = put_payloads([large_value(), large_value()])
+    drop_payloads([dropped])
+    redis_client.pexpire(expired['payload_ref'], 1)
+    time.sleep(0.01)
+    for ref in (dropped, expired):
+        with pytest.raises(KeyError):
+            get_payload(ref)
+    assert payload_store.get_payload_store_stats()['missing'] == 2
+
+
+def test_expired_reference_falls_back_to_reloading():
+    value = large_value()
+    ref = put_payload(value)
+    drop_payloads([ref])
+    assert get_payload(ref, fallback=lambda: value) == value
+    assert payload_store.get_payload_store_stats()['reloaded'] == 1
+
+
+def test_payloads_carry_a_ttl(redis_client):
+    ref = put_payload(large_value())
+    assert 0 < redis_client.ttl(ref['payload_ref']) <= payload_store.PAYLOAD_TTL
+
+
+def test_disk_backend_and_cleanup(monkeypatch, tmp_path):
+    monkeypatch.setattr(payload_store, 'PAYLOAD_STORE_BACKEND', 'disk')
+    monkeypatch.setattr(payload_store, 'PAYLOAD_STORE_DIR', str(tmp_path))
+    value = large_value()
+    old, fresh = put_payloads([large_value(), value])
+    old_path = payload_store._disk_path(old['payload_ref'])
+    os.utime(old_path, (time.time() - payload_store.PAYLOAD_TTL - 60,) * 2)
+
+    assert payload_store.cleanup_payload_store() == 1
+    assert get_payload(fresh) == value
+    with pytest.raises(KeyError):
+        get_payload(old)
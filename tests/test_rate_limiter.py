@@ -0,0 +1,83 @@
+import types
+
+import pytest
+
+from app import rate_limiter
+from app.rate_limiter import BUCKET_PREFIX, RECOVERY_PER_SECOND
+
+
+def take(bucket, amount, per_minute, now):
+    """Runs the token bucket script at a given time; returns the seconds to wait (0 when granted)."""
+    return float(rate_limiter._token_bucket(
+        keys=[BUCKET_PREFIX + bucket],
+        args=[per_minute, per_minute / 60.0, amount, now, RECOVERY_PER_SECOND]
+    ))
+
+
+def penalize(bucket, now, retry_after):
+    return float(rate_limiter._penalize(
+        keys=[BUCKET_PREFIX + bucket],
+        args=[now, retry_after, rate_limiter.BACKOFF_FACTOR, rate_limiter.MIN_SCALE, RECOVERY_PER_SECOND]
+    ))
+
+
+def test_token_bucket_grants_up_to_capacity_then_asks_to_wait():
+    assert [take('llm:rpm:m', 1, 60, 1000.0) for _ in range(60)] == [0.0] * 60
+    # 60 per minute refills one token per second
+    assert take('llm:rpm:m', 1, 60, 1000.0) == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_over_time():
+    assert take('llm:tpm:m', 600, 600, 1000.0) == 0.0
+    assert take('llm:tpm:m', 100, 600, 1000.0) == pytest.approx(10.0)
+    assert take('llm:tpm:m', 100, 600, 1010.0) == 0.0
+
+
+def test_token_bucket_caps_requests_larger_than_capacity():
+    # A single request bigger than the bucket waits for a full bucket instead of forever
+    assert take('llm:tpm:m', 5000, 600, 1000.0) == 0.0
+    assert take('llm:tpm:m', 5000, 600, 1000.0) == pytest.approx(60.0)
+
+
+def test_penalize_blocks_until_retry_after():
+    penalize('llm:rpm:m', 1000.0, 5)
+    assert take('llm:rpm:m', 1, 60, 1002.0) == pytest.approx(3.0)
+
+
+def test_penalize_empties_the_bucket_and_halves_the_rate():
+    assert penalize('llm:rpm:m', 1000.0, 0) == pytest.approx(0.5)
+    # Refilling at half the rate: one token every two seconds
+    assert take('llm:rpm:m', 1, 60, 1000.0) == pytest.approx(2.0)
+
+
+def test_penalize_never_goes_below_the_minimum_scale():
+    for _ in range(10):
+        scale = penalize('llm:rpm:m', 1000.0, 1)
+    assert scale == pytest.approx(rate_limiter.MIN_SCALE)
+
+
+def test_report_deployment_throttled_backs_off_both_buckets(redis_client):
+    error = types.SimpleNamespace(response=types.SimpleNamespace(headers={'retry-after': '30'}))
+    rate_limiter.report_deployment_throttled('llm', 'm', error)
+    for bucket in ('llm:rpm:m', 'llm:tpm:m'):
+        state = redis_client.hgetall(BUCKET_PREFIX + bucket)
+        assert float(state[b'scale']) == pytest.approx(0.5)
+        assert rate_limiter._try_acquire(bucket, 1, 600) > 25
+
+
+def test_retry_after_from_headers_prefers_milliseconds():
+    assert rate_limiter.retry_after_from_headers({'retry-after-ms': '1500', 'retry-after': '9'}) == 1.5
+    assert rate_limiter.retry_after_from_headers({'retry-after': 'soon'}) is None
+    assert rate_limiter.retry_after_from_headers(None) is None
+
+
+def test_slots_are_limited_and_released():
+    holders = [rate_limiter.try_acquire_slot('scrape', 2, 60) for _ in range(3)]
+    assert holders[0] and holders[1] and holders[2] is None
+    rate_limiter.release_slot('scrape', holders[0])
+    assert rate_limiter.try_acquire_slot('scrape', 2, 60)
+
+
+def test_expired_slot_leases_are_reclaimed(redis_client):
+    redis_client.zadd(rate_limiter.SLOT_PREFIX + 'scrape', {'dead-worker': 1.0})
+    assert rate_limiter.try_acquire_slot('scrape', 1, 60)
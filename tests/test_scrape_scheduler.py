@@ -0,0 +1,33 @@
+import pytest
+
+from app import scrape_scheduler
+from app.scrape_scheduler import DAILY_CREDITS_KEY, HIRING_CAFE_MIN_INTERVAL, claim_due_locations, record_scrape
+
+
+def test_due_locations_are_claimed_once():
+    assert claim_due_locations(['Texas', 'Ohio']) == ['Texas', 'Ohio']
+    assert claim_due_locations(['Texas', 'Ohio']) == []
+
+
+def test_consecutive_failures_back_off_exponentially():
+    intervals = [record_scrape('Texas', 0, 5, 1.0, failed=True) for _ in range(4)]
+    assert intervals == [HIRING_CAFE_MIN_INTERVAL * 2 ** i for i in range(4)]
+
+
+def test_success_resets_the_failure_backoff():
+    record_scrape('Texas', 0, 5, 1.0, failed=True)
+    record_scrape('Texas', 0, 5, 1.0, failed=True)
+    record_scrape('Texas', 30, 5, 1.0)
+    assert record_scrape('Texas', 0, 5, 1.0, failed=True) == HIRING_CAFE_MIN_INTERVAL
+
+
+def test_failed_scrapes_count_toward_the_daily_budget(redis_client):
+    interval = record_scrape('Texas', 0, 5, 1.0, failed=True)
+    assert redis_client.zscore(DAILY_CREDITS_KEY, 'Texas') == pytest.approx(5 * 86400 / interval)
+
+
+def test_failures_are_stretched_to_stay_within_the_budget(monkeypatch, redis_client):
+    monkeypatch.setattr(scrape_scheduler, 'HIRING_CAFE_DAILY_CREDIT_BUDGET', 100)
+    redis_client.zadd(DAILY_CREDITS_KEY, {'Ohio': 90})
+    # 10 credits a day left for Texas at 5 credits a scrape: at most two scrapes a day
+    assert record_scrape('Texas', 0, 5, 1.0, failed=True) == pytest.approx(43200)
@@ -0,0 +1,59 @@
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+from aiohttp import web
+
+import scrapingbee_stub
+from app import scraping
+
+STUB_LATENCY = 0.2
+
+
+@pytest.fixture(scope='module')
+def stub_url():
+    """scrapingbee_stub.py served from a background thread on a free local port."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(scrapingbee_stub.make_app(STUB_LATENCY, 0.0, 0.0, 0.0))
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{port}"
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(runner.cleanup())
+
+
+@pytest.fixture(autouse=True)
+def point_at_stub(monkeypatch, stub_url):
+    monkeypatch.setattr(scraping, 'SCRAPINGBEE_API_URL', f"{stub_url}/api/v1/")
+
+
+def test_batch_scrapes_run_concurrently(stub_url):
+    urls = [f'https://jobs.example.com/{i}' for i in range(8)]
+    started = time.monotonic()
+    responses = scraping.scrapingbee_get_many(urls, scraping.PAGE_TEXT_PARAMS)
+    elapsed = time.monotonic() - started
+
+    texts = [scraping.page_text_from_response(url, response) for url, response in zip(urls, responses)]
+    assert all(text.endswith(f"Apply at {url}") for url, text in zip(urls, texts))
+    assert elapsed < len(urls) * STUB_LATENCY / 2
+    assert httpx.get(f"{stub_url}/stats").json()['max_in_flight'] > 1
+
+
+def test_sync_get_returns_hiring_cafe_xhr():
+    response = scraping.scrapingbee_get('https://hiring.cafe/?searchState=x', {'render_js': True, 'json_response': True})
+    assert response.status_code == 200
+    assert response.json()['xhr'][0]['url'] == 'https://hiring.cafe/api/search-jobs'
+
+
+def test_failed_scrape_gives_no_text():
+    assert scraping.page_text_from_response('https://x.com/1', None) is None
+    assert scraping.page_text_from_response('https://x.com/1', httpx.Response(500)) is None
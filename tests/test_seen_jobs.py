@@ -0,0 +1,51 @@
+from app import seen_jobs
+from app.seen_jobs import filter_new_jobs, filter_new_urls, job_fingerprint, mark_jobs_seen, normalize_posting_url
+
+
+def job(url, title='Data Analyst', company='Acme', location='Austin, TX'):
+    return {'posting_url': url, 'job_title': title, 'company': company, 'location': location}
+
+
+def test_normalize_posting_url_drops_tracking_and_layout_differences():
+    assert normalize_posting_url('HTTPS://Jobs.Example.com/a/1/?utm_source=x&b=2&a=1#apply') == \
+        normalize_posting_url('https://jobs.example.com/a/1?a=1&b=2&gclid=z')
+
+
+def test_filter_new_jobs_drops_stored_urls_and_fingerprints():
+    mark_jobs_seen([job('https://x.com/1'), job('https://x.com/2', title='Engineer')])
+    jobs = [
+        job('https://x.com/1?utm_medium=email', title='Other'),  # stored URL
+        job('https://x.com/9', title='Engineer'),  # stored title|company|location
+        job('https://x.com/3', title='Designer'),
+    ]
+    assert filter_new_jobs(jobs) == jobs[2:]
+
+
+def test_filter_new_jobs_drops_repeats_within_the_batch():
+    jobs = [job('https://x.com/1'), job('https://x.com/1/'), job('https://x.com/2')]
+    assert filter_new_jobs(jobs) == jobs[:1]
+
+
+def test_jobs_without_identifying_fields_are_checked_by_url_only():
+    assert job_fingerprint('Unknown', 'Unknown', 'Unknown') is None
+    assert job_fingerprint('Data Analyst', None, 'N/A') is None
+    unknown = [job(f'https://x.com/{i}', 'Unknown', 'Unknown', 'Unknown') for i in range(3)]
+    mark_jobs_seen(unknown[:1])
+    assert filter_new_jobs(unknown) == unknown[1:]
+
+
+def test_filter_new_urls_keeps_order():
+    mark_jobs_seen([job('https://x.com/1')])
+    assert filter_new_urls(['https://x.com/3', 'https://x.com/1', 'https://x.com/2', 'https://x.com/3#top']) == \
+        ['https://x.com/3', 'https://x.com/2']
+
+
+def test_rebuild_replaces_the_filter_with_stored_postings(supabase):
+    mark_jobs_seen([job('https://x.com/deleted', title='Removed')])
+    supabase.tables['job_postings'] = [dict(job(f'https://x.com/{i}', title=f'Role {i}'), id=i) for i in range(2500)]
+
+    assert seen_jobs.rebuild_seen_jobs() == 2500
+    assert seen_jobs.seen_jobs_filter_ready()
+    assert filter_new_jobs([job('https://x.com/deleted', title='Removed')])
+    assert not filter_new_jobs([job('https://x.com/2499', title='Role 2499')])
+    assert seen_jobs.get_seen_jobs_stats()['urls'] == 2500